@@ -1,38 +1,237 @@
 import os
 import json
 import random
-import requests
-from typing import Dict, List, Any, Optional
+import time
+import asyncio
+import threading
+import importlib.util
+import httpx
+from contextlib import aclosing
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 from datetime import datetime
+from meal_index import MealIndex
+from nutrition_matrix import NUTRIENTS, Recipe
+from food_table import nutrition_matrix_from_env
+from meal_repository import has_structured_catalog, find_recommended_meals
+from route_optimizer import solve_route, solve_fleet, build_schedule
+from llm_parsing import JSONArrayStream, extract_json, salvage_items, validate_object
+from llm_schemas import NutritionFacts, MealSuggestion, MenuItem
+from metrics import llm_request_duration, llm_tokens, llm_json_failures, llm_followups, ai_outcomes, ai_fallbacks
+from concurrency import SingleFlight
+from microbatch import MicroBatcher
+from resilience import CircuitBreaker, latency_budgets_from_env
+from scheduler import OutboundScheduler, QueueDeadlineExceeded, QueueTimer, INTERACTIVE, BACKGROUND, priorities_from_env, priority_override
+from precompute import RecommendationPrecomputer, recommendation_key
+from semantic_cache import SemanticMenuCache
+from cache import ResponseCache, CacheMode, CACHE_USE, CACHE_BYPASS, CACHE_REFRESH, make_cache_key
 
 # Classe para integração com a API do Groq
 class GroqClient:
-    def __init__(self, api_key):
+    def __init__(self, api_key,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive: Optional[int] = None):
         self.api_key = api_key
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
+        # Configurável para apontar para um servidor local (ex: benchmark/fake_groq.py)
+        self.api_url = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Timeouts e tamanho do pool configuráveis via .env
+        connect_timeout = connect_timeout or float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+        read_timeout = read_timeout or float(os.getenv("GROQ_READ_TIMEOUT", "30"))
+        max_connections = max_connections or int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+        max_keepalive = max_keepalive or int(os.getenv("GROQ_MAX_KEEPALIVE", "20"))
+        
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+        )
+        # HTTP/2 só quando o extra h2 do httpx estiver instalado
+        self.http2 = importlib.util.find_spec("h2") is not None
+        
+        # O cliente é criado sob demanda e reaproveitado entre chamadas,
+        # mantendo as conexões abertas (keep-alive) com a API
+        self._async_client: Optional[httpx.AsyncClient] = None
+        
+        # Limites de requisições/tokens por minuto e fila por prioridade
+        self.scheduler = OutboundScheduler.from_env()
     
-    def generate_text(self, prompt, model="llama3-8b-8192", temperature=0.7, max_tokens=1000):
-        """Gera texto usando a API do Groq"""
-        payload = {
+    def _build_payload(self, prompt, model, temperature, max_tokens):
+        return {
             "model": model,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
             "max_tokens": max_tokens
         }
+    
+    def _observe(self, model, mode, started, status, usage=None):
+        """Registra duração, status e tokens de uma chamada nas métricas"""
+        llm_request_duration.observe(time.perf_counter() - started, model=model, mode=mode, status=status)
+        if usage:
+            llm_tokens.inc(usage.get("prompt_tokens") or 0, model=model, kind="prompt")
+            llm_tokens.inc(usage.get("completion_tokens") or 0, model=model, kind="completion")
+    
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+        """Estimativa reservada no agendador (~4 caracteres por token de prompt)"""
+        return len(prompt) // 4 + max_tokens
+    
+    def _settle(self, reserved: int, usage: Optional[Dict[str, Any]] = None, error: Optional[Exception] = None):
+        """Informa ao agendador o resultado da chamada (uso real de tokens ou 429)"""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                self.scheduler.record_rate_limited(float(retry_after) if retry_after else None)
+            except ValueError:
+                self.scheduler.record_rate_limited()
+        elif error is not None:
+            # Falha de rede ou da API: os tokens reservados não foram consumidos
+            self.scheduler.settle(reserved, 0)
+        else:
+            self.scheduler.record_success()
+            self.scheduler.settle(reserved, (usage or {}).get("total_tokens"))
+    
+    @staticmethod
+    def _error_status(error: Exception) -> str:
+        if isinstance(error, httpx.HTTPStatusError):
+            return str(error.response.status_code)
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        return "error"
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+        return self._async_client
+    
+    async def agenerate_text(self, prompt, model="llama3-8b-8192", temperature=0.7, max_tokens=1000, priority=INTERACTIVE):
+        """
+        Gera texto usando a API do Groq sem bloquear o event loop
+        
+        Passa antes pelo agendador; QueueDeadlineExceeded é propagada para que
+        quem chamou use o fallback.
+        """
+        payload = self._build_payload(prompt, model, temperature, max_tokens)
+        reserved = self._estimate_tokens(prompt, max_tokens)
+        await self.scheduler.acquire(reserved, priority)
+        started = time.perf_counter()
         
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            response = await self._get_async_client().post(self.api_url, json=payload)
             response.raise_for_status()
             
             response_data = response.json()
-            return response_data["choices"][0]["message"]["content"]
+            content = response_data["choices"][0]["message"]["content"]
+            self._observe(model, "complete", started, "ok", response_data.get("usage"))
+            self._settle(reserved, response_data.get("usage"))
+            return content
         except Exception as e:
+            self._observe(model, "complete", started, self._error_status(e))
+            self._settle(reserved, error=e)
             print(f"Erro ao chamar a API do Groq: {str(e)}")
             return None
+    
+    async def astream_text(self, prompt, model="llama3-8b-8192", temperature=0.7, max_tokens=1000,
+                           priority=INTERACTIVE) -> AsyncIterator[str]:
+        """
+        Gera texto em streaming usando a API do Groq
+        
+        Produz os pedaços de texto (deltas) à medida que chegam. Erros de rede ou
+        da API (e QueueDeadlineExceeded do agendador) são propagados para quem
+        está consumindo o stream.
+        """
+        payload = self._build_payload(prompt, model, temperature, max_tokens)
+        payload["stream"] = True
+        reserved = self._estimate_tokens(prompt, max_tokens)
+        await self.scheduler.acquire(reserved, priority)
+        started = time.perf_counter()
+        usage = None
+        status = "ok"
+        error = None
+        completed = False
+        
+        try:
+            async with self._get_async_client().stream("POST", self.api_url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    # O Groq envia o uso de tokens no último pedaço (em x_groq)
+                    usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+                    choices = chunk.get("choices") or []
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+            completed = True
+        except Exception as e:
+            status = self._error_status(e)
+            error = e
+            raise
+        finally:
+            if error is None and not completed:
+                # Quem consumia parou no meio (cancelamento ou GeneratorExit):
+                # devolve a reserva sem contar a chamada como sucesso
+                status = "cancelled"
+                self.scheduler.settle(reserved, (usage or {}).get("total_tokens") or 0)
+            else:
+                self._settle(reserved, usage, error)
+            self._observe(model, "stream", started, status, usage)
+    
+    async def warm_up(self, connections: int = 1) -> bool:
+        """
+        Abre conexões (TCP + TLS) com a API antes da primeira requisição real
+        
+        Qualquer resposta HTTP conta como sucesso: o objetivo é deixar as
+        conexões no pool, não validar a chave.
+        
+        Args:
+            connections: Conexões abertas em paralelo (limitado ao keep-alive)
+        
+        Returns:
+            True se ao menos uma conexão foi estabelecida
+        """
+        client = self._get_async_client()
+        count = max(1, min(connections, self.limits.max_keepalive_connections or connections))
+        results = await asyncio.gather(*(client.get(self.api_url) for _ in range(count)), return_exceptions=True)
+        return any(isinstance(result, httpx.Response) for result in results)
+    
+    async def aclose(self):
+        """Fecha o pool de conexões"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuit breaker do Groq está aberto"""
+
+
+def _assign_unique_ids(items: List[Dict[str, Any]], reserved: List[Any] = ()) -> None:
+    """Dá um novo id aos itens sem id ou com id repetido (inclusive em reserved)"""
+    used = set(reserved)
+    next_id = max([value for value in used if isinstance(value, int)] +
+                  [item["id"] for item in items if isinstance(item.get("id"), int)] + [0]) + 1
+    for item in items:
+        if item.get("id") is None or item["id"] in used:
+            item["id"] = next_id
+            next_id += 1
+        used.add(item["id"])
+
 
 # Simulamos a integração com uma API de IA
 # Em um ambiente real, isso seria uma chamada a uma API como OpenAI, Azure ou outra solução
@@ -43,10 +242,36 @@ class AIService:
         self.api_key = os.getenv("GROQ_API_KEY", "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")
         self.model = os.getenv("GROQ_MODEL", "llama3-8b-8192")
         self.temperature = float(os.getenv("AI_TEMPERATURE", "0.7"))
+        # Orçamento de latência (segundos) de cada endpoint antes de usar o fallback
+        self.latency_budgets = latency_budgets_from_env()
         
         # Inicializar cliente Groq
         self.groq_client = GroqClient(self.api_key)
         
+        # Cache das respostas do LLM (LRU com TTL + camada SQLite opcional)
+        self.cache = ResponseCache.from_env()
+        
+        # Cardápios já gerados servem a preferências parecidas (sem chamar o Groq)
+        self.menu_semantic_cache = SemanticMenuCache.from_env()
+        
+        # Chamadas idênticas simultâneas compartilham a mesma requisição ao Groq
+        self.singleflight = SingleFlight()
+        
+        # Evita chamar o Groq enquanto ele estiver falhando ou lento
+        self.circuit_breaker = CircuitBreaker.from_env()
+        # Classe de prioridade de cada endpoint na fila do agendador do Groq
+        self.priorities = priorities_from_env()
+        # Explicações de requisições simultâneas vão ao Groq em um único prompt numerado
+        self.explanation_batcher = MicroBatcher(
+            self._explain_batch,
+            "explanations",
+            max_wait=float(os.getenv("EXPLANATION_BATCH_WAIT_MS", "10")) / 1000,
+            max_items=int(os.getenv("EXPLANATION_BATCH_MAX_ITEMS", "16"))
+        )
+        # Recomendações das tuplas mais pedidas calculadas nos períodos ociosos
+        self.precomputer = RecommendationPrecomputer.from_env()
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        
         # Dados mock para demonstração
         self._load_mock_data()
     
@@ -144,18 +369,239 @@ class AIService:
             "sem_nozes": [],
             "low_carb": ["batata_doce", "quinoa", "grao_de_bico", "arroz_integral"]
         }
+        
+        # Índice das refeições para o fallback de recomendações
+        self.meal_index = MealIndex(self.meals_db, self.dietary_restrictions)
+        # Tabela de composição (FOOD_TABLE_CSV) com resolução aproximada de nomes
+        self.nutrition_matrix = nutrition_matrix_from_env(self.ingredients_db)
+    
+    def _record_outcome(self, endpoint: str, outcome: str):
+        """Contabiliza se o endpoint foi atendido pelo LLM ou pelo fallback"""
+        counters = self._outcomes.setdefault(
+            endpoint, {"local": 0, "llm": 0, "cache": 0, "precomputed": 0, "deadline": 0, "queue_timeout": 0, "circuit_open": 0, "error": 0, "empty": 0}
+        )
+        counters[outcome] += 1
+        ai_outcomes.inc(endpoint=endpoint, outcome=outcome)
+        if outcome not in ("local", "llm", "cache", "precomputed"):
+            ai_fallbacks.inc(endpoint=endpoint)
+    
+    def _priority(self, endpoint: str) -> int:
+        override = priority_override.get()
+        if override is not None:
+            return override
+        return self.priorities.get(endpoint, INTERACTIVE)
     
-    def analyze_nutritional_data(self, ingredients: List[str]) -> Dict[str, Any]:
+    async def _call_upstream(self, producer):
+        """Executa o producer protegido pelo circuit breaker"""
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError()
+        
+        started = time.perf_counter()
+        try:
+            # A espera na fila do agendador não conta como lentidão do Groq
+            with QueueTimer() as queued:
+                result = await producer()
+        except (asyncio.CancelledError, QueueDeadlineExceeded):
+            self.circuit_breaker.release()
+            raise
+        except Exception:
+            self.circuit_breaker.record_failure()
+            raise
+        
+        if result is None:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success(time.perf_counter() - started - queued.seconds)
+        return result
+    
+    async def _await_within_budget(self, endpoint: str, key: str, produce) -> Optional[Any]:
+        """
+        Aguarda a chamada compartilhada até o orçamento de latência do endpoint
+        
+        Se o prazo estourar, retorna None para que o chamador use o fallback. A
+        chamada ao Groq continua em segundo plano e, se concluir, alimenta o cache.
+        """
+        try:
+            result = await asyncio.wait_for(
+                self.singleflight.do(key, produce),
+                timeout=self.latency_budgets.get(endpoint)
+            )
+        except asyncio.TimeoutError:
+            self._record_outcome(endpoint, "deadline")
+            return None
+        except QueueDeadlineExceeded:
+            self._record_outcome(endpoint, "queue_timeout")
+            return None
+        except CircuitOpenError:
+            self._record_outcome(endpoint, "circuit_open")
+            return None
+        except Exception:
+            self._record_outcome(endpoint, "error")
+            raise
+        
+        self._record_outcome(endpoint, "llm" if result is not None else "empty")
+        return result
+    
+    async def _run_llm(self, endpoint: str, key_payload: Any, producer, cache_mode: CacheMode = CACHE_USE) -> Optional[Any]:
+        """
+        Executa uma chamada ao LLM passando pelo cache de respostas
+        
+        Args:
+            endpoint: Nome lógico do endpoint (usado nas chaves e nas métricas)
+            key_payload: Entradas que determinam a resposta (serão canonicalizadas)
+            producer: Corrotina sem argumentos que chama o LLM e retorna o resultado já
+                interpretado, ou None quando não houver resposta válida
+            cache_mode: "use", "bypass" ou "refresh"
+            
+        Returns:
+            Resultado do cache ou do producer (None se o LLM falhar, estiver com o
+            circuito aberto ou não responder dentro do orçamento de latência)
+        """
+        cache_mode = self.cache.resolve_mode(endpoint, cache_mode)
+        key = make_cache_key(endpoint, key_payload, self.model, self.temperature)
+        
+        if cache_mode == CACHE_USE:
+            cached = await self.cache.get(endpoint, key)
+            if cached is not None:
+                self._record_outcome(endpoint, "cache")
+                return cached
+        elif cache_mode == CACHE_BYPASS:
+            self.cache.record_bypass(endpoint)
+        
+        async def produce():
+            # Com vários workers, só um chama o Groq por chave; os outros aguardam
+            # o resultado na camada compartilhada do cache
+            if cache_mode == CACHE_USE and not await self.cache.claim(key):
+                shared = await self.cache.wait_for_peer(endpoint, key)
+                if shared is not None:
+                    return shared
+                if not await self.cache.claim(key):
+                    return None
+            try:
+                result = await self._call_upstream(producer)
+                if result is not None and cache_mode != CACHE_BYPASS:
+                    await self.cache.set(endpoint, key, result)
+                return result
+            finally:
+                if cache_mode == CACHE_USE:
+                    await self.cache.release(key)
+        
+        return await self._await_within_budget(endpoint, key, produce)
+    
+    async def _generate_text(self, prompt: str, endpoint: str, max_tokens: int = 1000) -> Optional[str]:
+        """
+        Chama o Groq com o modelo configurado, agrupando prompts idênticos simultâneos
+        
+        Retorna None se o circuito estiver aberto ou o orçamento do endpoint estourar.
+        """
+        key = make_cache_key("text", {"prompt": prompt, "max_tokens": max_tokens}, self.model, self.temperature)
+        
+        async def produce():
+            return await self._call_upstream(
+                lambda: self.groq_client.agenerate_text(
+                    prompt,
+                    model=self.model,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens,
+                    priority=self._priority(endpoint)
+                )
+            )
+        
+        return await self._await_within_budget(endpoint, key, produce)
+    
+    async def _generate_items(self,
+                              endpoint: str,
+                              schema,
+                              build_prompt,
+                              count: int,
+                              max_tokens: int = 1000) -> Optional[List[Dict[str, Any]]]:
+        """
+        Gera uma lista de itens validando cada um contra o esquema
+        
+        Itens válidos de uma resposta parcialmente quebrada são aproveitados e
+        apenas os faltantes são pedidos de novo, em um único prompt complementar.
+        
+        Args:
+            endpoint: Nome lógico (métricas)
+            schema: Modelo Pydantic de cada item
+            build_prompt: Função (quantidade, nomes a não repetir) -> prompt
+            count: Número de itens desejado
+            max_tokens: Limite de tokens da resposta completa
+            
+        Returns:
+            Até count itens válidos, ou None se nenhum pôde ser aproveitado
+        """
+        priority = self._priority(endpoint)
+        result = await self.groq_client.agenerate_text(
+            build_prompt(count, []), model=self.model, temperature=self.temperature,
+            max_tokens=max_tokens, priority=priority
+        )
+        if not result:
+            return None
+        
+        items = salvage_items(result, schema, endpoint)[:count]
+        missing = count - len(items)
+        if missing > 0:
+            llm_followups.inc(endpoint=endpoint)
+            try:
+                extra = await self.groq_client.agenerate_text(
+                    build_prompt(missing, [item["name"] for item in items]),
+                    model=self.model,
+                    temperature=self.temperature,
+                    max_tokens=max(200, max_tokens * missing // count),
+                    priority=priority
+                )
+            except QueueDeadlineExceeded:
+                # Fica com os itens já válidos; o restante vem do fallback
+                extra = None
+            if extra:
+                items.extend(salvage_items(extra, schema, endpoint)[:missing])
+        
+        _assign_unique_ids(items)
+        return items or None
+    
+    async def invalidate_cache(self, endpoint: Optional[str] = None):
+        """Limpa o cache de respostas de um endpoint (ou todos), incluindo o cache semântico do cardápio"""
+        await self.cache.invalidate(endpoint)
+        if endpoint in (None, "menu"):
+            self.menu_semantic_cache.clear()
+        if endpoint in (None, "recommendations"):
+            self.precomputer.invalidate()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas internas do serviço para monitoramento"""
+        return {
+            "model": self.model,
+            "cache": self.cache.stats(),
+            "coalescing": self.singleflight.stats(),
+            "batching": {"explanations": self.explanation_batcher.stats()},
+            "semantic_cache": {"menu": self.menu_semantic_cache.stats()},
+            "precompute": {"recommendations": self.precomputer.stats()},
+            "circuit_breaker": self.circuit_breaker.stats(),
+            "scheduler": self.groq_client.scheduler.stats() if self.groq_client else None,
+            "latency_budgets": self.latency_budgets,
+            "outcomes": {endpoint: dict(counters) for endpoint, counters in self._outcomes.items()}
+        }
+    
+    async def analyze_nutritional_data(self, ingredients: List[str], cache_mode: CacheMode = CACHE_USE) -> Dict[str, Any]:
         """
         Analisa os dados nutricionais de um conjunto de ingredientes
         
         Args:
             ingredients: Lista de ingredientes para análise
+            cache_mode: Controle do cache de respostas ("use", "bypass" ou "refresh")
             
         Returns:
             Dados nutricionais calculados
         """
-        # Primeiro tenta usar a API do Groq para análise
+        # Tabela de alimentos local (100 g por ingrediente), sem acentos e por nome aproximado
+        totals, unknown = self.nutrition_matrix.totals([ingredients])
+        local_nutrition = dict(zip(NUTRIENTS, totals[0].round(2).tolist()))
+        if not unknown[0]:
+            self._record_outcome("nutrition", "local")
+            return local_nutrition
+        
+        # Há ingredientes desconhecidos: tenta usar a API do Groq para análise
         if self.groq_client:
             prompt = f"""
             Analise os seguintes ingredientes e forneça informações nutricionais detalhadas:
@@ -172,36 +618,53 @@ class AIService:
             Retorne apenas o JSON, sem explicações adicionais.
             """
             
-            try:
-                result = self.groq_client.generate_text(prompt)
+            async def call_groq():
+                result = await self.groq_client.agenerate_text(
+                    prompt, model=self.model, temperature=self.temperature,
+                    max_tokens=200, priority=self._priority("nutrition")
+                )
                 if result:
                     # Extrair apenas o JSON da resposta
-                    json_start = result.find('{')
-                    json_end = result.rfind('}') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = result[json_start:json_end]
-                        return json.loads(json_str)
+                    return validate_object(extract_json(result, "{", endpoint="nutrition"), NutritionFacts, "nutrition")
+                return None
+            
+            try:
+                # A soma independe da ordem dos ingredientes, mas não das repetições
+                key_payload = {"ingredients": sorted(i.strip().lower() for i in ingredients)}
+                nutrition = await self._run_llm("nutrition", key_payload, call_groq, cache_mode)
+                if nutrition is not None:
+                    return nutrition
             except Exception as e:
                 print(f"Erro ao analisar dados nutricionais com Groq: {str(e)}")
                 
-        # Fallback para os dados mock
-        nutrition = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
+        # Fallback: apenas os ingredientes encontrados na tabela
+        return local_nutrition
+    
+    async def analyze_nutrition_batch(self, recipes: List[Recipe]) -> List[Dict[str, Any]]:
+        """
+        Calcula os dados nutricionais de várias receitas de uma vez
         
-        for ingredient in ingredients:
-            if ingredient in self.ingredients_db:
-                data = self.ingredients_db[ingredient]
-                nutrition["calories"] += data["calories"]
-                nutrition["protein"] += data["protein"]
-                nutrition["carbs"] += data["carbs"]
-                nutrition["fat"] += data["fat"]
+        Usa apenas a tabela de ingredientes (sem LLM), para lotes grandes de
+        planejamento de cozinha.
         
-        return nutrition
+        Args:
+            recipes: Receitas como lista de ingredientes (100 g cada) ou mapa ingrediente -> gramas
+            
+        Returns:
+            Totais por receita, na ordem recebida, com os ingredientes não encontrados
+        """
+        # Lotes grandes são calculados fora do event loop
+        if len(recipes) > 256:
+            return await asyncio.to_thread(self.nutrition_matrix.analyze, recipes)
+        return self.nutrition_matrix.analyze(recipes)
     
-    def get_meal_recommendations(self, 
+    async def get_meal_recommendations(self, 
                                preferences: Dict[str, Any], 
                                restrictions: List[str],
                                calories_range: List[int],
-                               limit: int = 3) -> List[Dict[str, Any]]:
+                               limit: int = 3,
+                               cache_mode: CacheMode = CACHE_USE,
+                               db=None) -> List[Dict[str, Any]]:
         """
         Gera recomendações de refeições com base nas preferências e restrições do usuário
         
@@ -210,14 +673,163 @@ class AIService:
             restrictions: Lista de restrições alimentares (sem glúten, vegetariano, etc)
             calories_range: Faixa de calorias desejada [min, max]
             limit: Número máximo de recomendações a retornar
+            cache_mode: Controle do cache de respostas ("use", "bypass" ou "refresh")
+            db: Sessão assíncrona do banco; se o catálogo tiver dados estruturados,
+                o fallback é resolvido por consulta SQL
             
         Returns:
             Lista de refeições recomendadas
         """
+        # As tuplas mais pedidas são lidas da tabela pré-calculada
+        snapshot_key = None
+        resolved_mode = self.cache.resolve_mode("recommendations", cache_mode)
+        if db is not None and self.precomputer.enabled:
+            snapshot_key, params = recommendation_key(preferences, restrictions, calories_range, limit)
+            self.precomputer.record(snapshot_key, params)
+            if resolved_mode == CACHE_USE:
+                snapshot = await self.precomputer.lookup(db, snapshot_key)
+                if snapshot is not None:
+                    self._record_outcome("recommendations", "precomputed")
+                    return snapshot
+        
+        with self.precomputer.live():
+            recommendations, complete = await self._compute_recommendations(
+                preferences, restrictions, calories_range, limit, cache_mode, db
+            )
+        
+        if snapshot_key is not None and complete and resolved_mode == CACHE_REFRESH:
+            try:
+                await self.precomputer.store(db, snapshot_key, params, recommendations)
+            except Exception as e:
+                print(f"Erro ao gravar recomendações pré-calculadas: {str(e)}")
+        return recommendations
+    
+    async def precompute_recommendations(self, db, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Calcula as recomendações de uma tupla popular para a tabela pré-calculada
+        
+        As chamadas ao Groq entram na fila como segundo plano.
+        
+        Args:
+            db: Sessão assíncrona do banco
+            params: Parâmetros normalizados por recommendation_key
+            
+        Returns:
+            Recomendações, ou None se o LLM não respondeu (o fallback não é gravado)
+        """
+        token = priority_override.set(BACKGROUND)
+        try:
+            recommendations, complete = await self._compute_recommendations(
+                params["preferences"], params["restrictions"], params["calories_range"], params["limit"], CACHE_USE, db
+            )
+        finally:
+            priority_override.reset(token)
+        return recommendations if complete else None
+    
+    async def _compute_recommendations(self,
+                                       preferences: Dict[str, Any],
+                                       restrictions: List[str],
+                                       calories_range: List[int],
+                                       limit: int,
+                                       cache_mode: CacheMode,
+                                       db) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Calcula as recomendações (LLM com fallback pelo catálogo)
+        
+        Returns:
+            (recomendações, False se o Groq está configurado mas não respondeu)
+        """
+        complete = True
         # Tentar usar a API do Groq para recomendações personalizadas
+        llm_meals: List[Dict[str, Any]] = []
         if self.groq_client:
-            prompt = f"""
-            Crie {limit} recomendações de refeições personalizadas com as seguintes especificações:
+            def build_prompt(count: int, exclude: List[str]) -> str:
+                return self._recommendations_prompt(preferences, restrictions, calories_range, count, exclude)
+            
+            async def call_groq():
+                recommendations = await self._generate_items("recommendations", MealSuggestion, build_prompt, limit)
+                if recommendations:
+                    # Adicionar imagens de fallback (pois a API não gera imagens)
+                    for meal in recommendations:
+                        if not meal.get("image"):
+                            meal_name = meal["name"].lower().replace(" ", "-")
+                            meal["image"] = f"https://source.unsplash.com/random/800x600/?{meal_name}"
+                        if not meal.get("price"):
+                            meal["price"] = 25 + random.random() * 20
+                        if not meal.get("ai_explanation"):
+                            meal["ai_explanation"] = self._fallback_explanation(meal)
+                    return recommendations
+                return None
+            
+            try:
+                key_payload = {
+                    "cuisine_type": preferences.get("cuisine_type"),
+                    "meal_type": preferences.get("meal_type"),
+                    "spice_level": preferences.get("spice_level"),
+                    "preferred_protein": set(preferences.get("preferred_protein") or []),
+                    "restrictions": set(restrictions),
+                    "calories_range": list(calories_range),
+                    "limit": limit
+                }
+                recommendations = await self._run_llm("recommendations", key_payload, call_groq, cache_mode)
+                if recommendations is not None:
+                    if len(recommendations) >= limit:
+                        return recommendations[:limit], complete
+                    llm_meals = recommendations
+                else:
+                    complete = False
+            except Exception as e:
+                complete = False
+                print(f"Erro ao obter recomendações com Groq: {str(e)}")
+        
+        # Fallback: filtra por restrições, faixa de calorias e relevância pelas
+        # proteínas preferidas. Em um cenário real, usaríamos um modelo de ML para ranquear
+        if db is not None and await has_structured_catalog(db):
+            # Catálogo real: a consulta é resolvida pelos índices do banco
+            excluded = {
+                ingredient
+                for restriction in restrictions
+                for ingredient in self.dietary_restrictions.get(restriction, [])
+            }
+            recommendations = await find_recommended_meals(
+                db,
+                calories_range=calories_range,
+                excluded_ingredients=sorted(excluded),
+                preferred_ingredients=preferences.get("preferred_protein"),
+                limit=limit
+            )
+        else:
+            # Dados mock, consultando o índice pré-calculado
+            recommendations = self.meal_index.recommend(
+                restrictions=restrictions,
+                calories_range=calories_range,
+                preferred_ingredients=preferences.get("preferred_protein"),
+                limit=limit
+            )
+        
+        # O LLM gerou só parte das refeições: completa com as do catálogo
+        recommendations = recommendations[:limit - len(llm_meals)]
+        
+        # Adicionamos uma explicação de IA para cada recomendação (uma única chamada)
+        explanations = await self._generate_explanations(recommendations, preferences, restrictions)
+        for meal in recommendations:
+            meal["ai_explanation"] = explanations[meal["id"]]
+        
+        if llm_meals:
+            llm_meals = [dict(meal) for meal in llm_meals]
+            _assign_unique_ids(llm_meals, reserved=[meal["id"] for meal in recommendations])
+        return llm_meals + recommendations, complete
+    
+    def _recommendations_prompt(self,
+                                preferences: Dict[str, Any],
+                                restrictions: List[str],
+                                calories_range: List[int],
+                                count: int,
+                                exclude: Optional[List[str]] = None) -> str:
+        """Monta o prompt de recomendações (exclude lista refeições já sugeridas)"""
+        avoid = f"\n            Não repita estas refeições: {', '.join(exclude)}\n" if exclude else ""
+        return f"""
+            Crie {count} recomendações de refeições personalizadas com as seguintes especificações:
             
             Preferências do usuário:
             - Tipo de cozinha: {preferences.get('cuisine_type', 'qualquer')}
@@ -228,7 +840,7 @@ class AIService:
             Restrições alimentares: {', '.join(restrictions) if restrictions else 'nenhuma'}
             
             Faixa de calorias: {calories_range[0]} - {calories_range[1]} kcal
-            
+            {avoid}
             Forneça as refeições no seguinte formato JSON:
             [
               {{
@@ -249,106 +861,92 @@ class AIService:
             
             Retorne apenas o JSON, sem explicações adicionais.
             """
-            
-            try:
-                result = self.groq_client.generate_text(prompt)
-                if result:
-                    # Extrair apenas o JSON da resposta
-                    json_start = result.find('[')
-                    json_end = result.rfind(']') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = result[json_start:json_end]
-                        recommendations = json.loads(json_str)
-                        # Adicionar imagens de fallback (pois a API não gera imagens)
-                        for meal in recommendations:
-                            if "name" in meal and not meal.get("image"):
-                                meal_name = meal["name"].lower().replace(" ", "-")
-                                meal["image"] = f"https://source.unsplash.com/random/800x600/?{meal_name}"
-                            if not meal.get("price"):
-                                meal["price"] = 25 + random.random() * 20
-                        return recommendations
-            except Exception as e:
-                print(f"Erro ao obter recomendações com Groq: {str(e)}")
-        
-        # Fallback para os dados mock
-        recommendations = []
-        
-        # Filtrar refeições que respeitam as restrições alimentares
-        filtered_meals = self.meals_db.copy()
-        
-        # Filtrar por restrições
-        for restriction in restrictions:
-            if restriction in self.dietary_restrictions:
-                forbidden_ingredients = self.dietary_restrictions[restriction]
-                filtered_meals = [
-                    meal for meal in filtered_meals 
-                    if not any(ingredient in forbidden_ingredients for ingredient in meal["ingredients"])
-                ]
-        
-        # Filtrar por faixa de calorias
-        min_cal, max_cal = calories_range
-        filtered_meals = [
-            meal for meal in filtered_meals 
-            if min_cal <= meal["nutrition"]["calories"] <= max_cal
-        ]
+    
+    async def _generate_explanations(self, meals: List[Dict[str, Any]], preferences: Dict[str, Any], restrictions: List[str]) -> Dict[Any, str]:
+        """
+        Gera as explicações das refeições recomendadas
         
-        # Ordenar por relevância (simulação)
-        # Em um cenário real, usaríamos um modelo de ML para ranquear
+        Cada refeição entra no micro-lote de explicações, que junta os itens de
+        requisições simultâneas em um único prompt ao Groq.
         
-        # Se temos preferências de proteína
-        if "preferred_protein" in preferences and preferences["preferred_protein"]:
-            preferred = preferences["preferred_protein"]
-            
-            # Para cada refeição, calculamos um score baseado nas preferências
-            for meal in filtered_meals:
-                score = 0
-                for ingredient in meal["ingredients"]:
-                    if ingredient in preferred:
-                        score += 1
-                meal["relevance_score"] = score
+        Args:
+            meals: Refeições recomendadas
+            preferences: Preferências do usuário
+            restrictions: Restrições alimentares do usuário
             
-            # Ordenamos por score
-            filtered_meals.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-        
-        # Selecionamos as top N refeições
-        recommendations = filtered_meals[:limit]
+        Returns:
+            Dicionário id da refeição -> explicação. Refeições sem resposta do Groq
+            dentro do prazo recebem a explicação genérica.
+        """
+        explanations = {}
         
-        # Adicionamos uma explicação de IA para cada recomendação
-        for meal in recommendations:
-            meal["ai_explanation"] = self._generate_explanation(meal, preferences, restrictions)
+        if self.groq_client and meals:
+            profile = (
+                f"cozinha {preferences.get('cuisine_type', 'qualquer')}; "
+                f"refeição {preferences.get('meal_type', 'qualquer')}; "
+                f"tempero {preferences.get('spice_level', 3)}/5; "
+                f"proteínas {', '.join(preferences.get('preferred_protein', ['qualquer']))}; "
+                f"restrições {', '.join(restrictions) if restrictions else 'nenhuma'}"
+            )
+            results = await asyncio.gather(*(
+                self.explanation_batcher.submit({"meal": meal, "profile": profile}) for meal in meals
+            ))
+            explanations = {meal["id"]: text for meal, text in zip(meals, results) if text}
         
-        return recommendations
+        return {
+            meal["id"]: explanations.get(meal["id"]) or self._fallback_explanation(meal)
+            for meal in meals
+        }
     
-    def _generate_explanation(self, meal: Dict[str, Any], preferences: Dict[str, Any], restrictions: List[str]) -> str:
-        """Gera uma explicação de IA para a recomendação usando Groq"""
-        if self.groq_client:
-            prompt = f"""
-            Crie uma explicação curta e personalizada de por que esta refeição é recomendada para o usuário.
+    async def _explain_batch(self, items: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Explica um lote de pares (refeição, perfil do usuário) em um único prompt numerado
+        
+        Args:
+            items: Itens do micro-lote, possivelmente de requisições diferentes
             
-            Refeição: {meal["name"]}
-            Descrição: {meal["description"]}
-            Tags: {', '.join(meal.get("tags", []))}
-            Nutrição: {meal["nutrition"]} calorias
+        Returns:
+            Explicação de cada item, na mesma ordem (None quando faltar resposta)
+        """
+        # Itens idênticos (mesma refeição e mesmo perfil) viram uma única entrada
+        lines = [
+            f"{item['meal']['name']} | {item['meal']['description']} | "
+            f"Tags: {', '.join(item['meal'].get('tags', []))} | Nutrição: {item['meal']['nutrition']} "
+            f"|| Usuário: {item['profile']}"
+            for item in items
+        ]
+        numbers: Dict[str, int] = {}
+        for line in lines:
+            numbers.setdefault(line, len(numbers) + 1)
+        entries = "\n".join(f"{number}. {line}" for line, number in numbers.items())
+        
+        prompt = f"""
+            Crie uma explicação curta e personalizada de por que cada refeição abaixo é recomendada para o usuário descrito na mesma linha.
             
-            Preferências do usuário:
-            - Tipo de cozinha: {preferences.get('cuisine_type', 'qualquer')}
-            - Tipo de refeição: {preferences.get('meal_type', 'qualquer')}
-            - Nível de tempero (0-5): {preferences.get('spice_level', 3)}
-            - Proteínas preferidas: {', '.join(preferences.get('preferred_protein', ['qualquer']))}
+            Itens (refeição || usuário):
+            {entries}
             
-            Restrições alimentares: {', '.join(restrictions) if restrictions else 'nenhuma'}
+            Forneça uma explicação concisa (máximo 150 caracteres) para cada item no seguinte formato JSON:
+            {{
+              "número do item": "explicação"
+            }}
             
-            Forneça uma explicação concisa (máximo 150 caracteres) e personalizada sobre por que esta refeição é ideal para o usuário.
+            Retorne apenas o JSON, sem explicações adicionais.
             """
-            
-            try:
-                explanation = self.groq_client.generate_text(prompt, max_tokens=100)
-                if explanation:
-                    return explanation.strip()
-            except:
-                pass
         
-        # Fallback para explicações genéricas
+        result = await self._generate_text(prompt, "explanations", max_tokens=100 * len(numbers))
+        data = extract_json(result, "{", endpoint="explanations") if result else None
+        if not isinstance(data, dict):
+            return [None] * len(items)
+        
+        answers = []
+        for line in lines:
+            explanation = data.get(str(numbers[line]))
+            answers.append(explanation.strip() if isinstance(explanation, str) and explanation.strip() else None)
+        return answers
+    
+    def _fallback_explanation(self, meal: Dict[str, Any]) -> str:
+        """Gera uma explicação genérica para a recomendação"""
         explanations = [
             f"Esta refeição é ideal para você porque contém {meal['nutrition']['protein']}g de proteína e apenas {meal['nutrition']['fat']}g de gordura.",
             f"Recomendamos esta opção porque se alinha com suas preferências alimentares e oferece um bom equilíbrio nutricional.",
@@ -359,140 +957,299 @@ class AIService:
         
         return random.choice(explanations)
     
-    def optimize_delivery_route(self, delivery_points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def optimize_delivery_route(self,
+                                      delivery_points: List[Dict[str, Any]],
+                                      starting_point: Optional[Dict[str, float]] = None,
+                                      departure_time: Optional[datetime] = None,
+                                      annotate: bool = False) -> Dict[str, Any]:
         """
-        Otimiza rotas para entrega usando a API Groq quando disponível
+        Otimiza rotas para entrega (TSP com vizinho mais próximo + 2-opt/Or-opt)
         
         Args:
             delivery_points: Lista de pontos de entrega com coordenadas e informações
+            starting_point: Coordenadas do restaurante {lat, lng}; se ausente, parte do primeiro ponto
+            departure_time: Horário de saída do entregador (padrão: agora)
+            annotate: Se deve pedir ao Groq observações sobre a rota calculada
             
         Returns:
-            Lista ordenada de pontos de entrega com estimativas de tempo
+            Rota ordenada com estimativas de chegada, distância total e duração
         """
-        # Em um sistema real, usaríamos algoritmos como:
-        # - Problema do Caixeiro Viajante (TSP)
-        # - Algoritmos de otimização com restrições de tempo
-        # - Integração com APIs como Google Maps ou similares
+        points = [dict(point) for point in delivery_points]
+        if not points:
+            return {"optimized_route": [], "total_distance_km": 0.0, "total_duration_minutes": 0.0}
         
-        if self.groq_client and len(delivery_points) > 0:
-            # Preparar dados dos pontos para o prompt
-            points_data = []
-            for i, point in enumerate(delivery_points):
-                points_data.append(f"Ponto {i+1}: {point['address']} (Lat: {point['lat']}, Lng: {point['lng']})")
-            
+        depot = starting_point or {"lat": points[0]["lat"], "lng": points[0]["lng"]}
+        departure = departure_time or datetime.now()
+        
+        # O cálculo é CPU-bound, então roda fora do event loop
+        solution = await asyncio.to_thread(solve_route, depot, points)
+        route = build_schedule(points, solution, departure=departure)
+        
+        result = {
+            "optimized_route": route,
+            "total_distance_km": round(solution["total_distance_km"], 3),
+            "total_duration_minutes": route[-1]["elapsed_minutes"],
+            "estimated_completion": route[-1]["estimated_arrival"]
+        }
+        
+        # O LLM apenas comenta a rota, a ordem vem sempre do otimizador
+        if annotate and self.groq_client:
+            stops = "\n".join(
+                f"{point['sequence']}. {point['address']} - chegada {point['estimated_arrival']}"
+                for point in route
+            )
             prompt = f"""
-            Otimize a rota de entrega para os seguintes pontos, começando do restaurante:
-            
-            {', '.join(points_data)}
-            
-            Considere a distância entre os pontos e forneça:
-            1. A ordem ideal dos pontos para minimizar a distância total
-            2. Um tempo estimado de viagem entre cada ponto (em minutos)
+            A rota de entrega abaixo já foi otimizada ({result['total_distance_km']} km no total):
             
-            Retorne apenas o resultado no seguinte formato JSON:
-            [
-              {{
-                "address": "endereço do ponto",
-                "lat": latitude,
-                "lng": longitude,
-                "order_id": id do pedido,
-                "customer_name": nome do cliente,
-                "estimated_arrival": "HH:MM" (horário estimado de chegada),
-                "travel_time_minutes": tempo estimado de viagem em minutos
-              }}
-            ]
+            {stops}
             
-            Organize os pontos na ordem ótima para a entrega.
+            Escreva uma observação curta (máximo 200 caracteres) para o entregador sobre esta rota.
             """
             
             try:
-                result = self.groq_client.generate_text(prompt)
-                if result:
-                    # Extrair apenas o JSON da resposta
-                    json_start = result.find('[')
-                    json_end = result.rfind(']') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = result[json_start:json_end]
-                        return json.loads(json_str)
+                notes = await self._generate_text(prompt, "route_notes", max_tokens=120)
+                if notes:
+                    result["ai_notes"] = notes.strip()
             except Exception as e:
-                print(f"Erro ao otimizar rota com Groq: {str(e)}")
+                print(f"Erro ao anotar rota com Groq: {str(e)}")
         
-        # Para esta simulação, apenas adicionamos tempos estimados aleatórios (fallback)
-        optimized_route = delivery_points.copy()
-        
-        now = datetime.now()
-        current_time = now
+        return result
+    
+    async def optimize_fleet_routes(self,
+                                    couriers: List[Dict[str, Any]],
+                                    orders: List[Dict[str, Any]],
+                                    departure_time: Optional[datetime] = None,
+                                    time_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Distribui e sequencia pedidos entre vários entregadores
         
-        for point in optimized_route:
-            # Tempo de viagem entre 5 e 15 minutos
-            travel_time = random.randint(5, 15)
-            current_time = current_time.replace(minute=current_time.minute + travel_time)
-            
-            point["estimated_arrival"] = current_time.strftime("%H:%M")
-            point["travel_time_minutes"] = travel_time
+        Args:
+            couriers: Entregadores com ponto de partida, capacidade e cozinha
+            orders: Pedidos com coordenadas, horário de preparo e janela prometida
+            departure_time: Horário de referência (padrão: agora)
+            time_budget_ms: Tempo máximo de processamento
             
-        return optimized_route
+        Returns:
+            Rotas por entregador e pedidos não atribuídos
+        """
+        return await asyncio.to_thread(
+            solve_fleet,
+            couriers,
+            orders,
+            departure=departure_time,
+            time_budget_ms=time_budget_ms
+        )
     
-    def generate_custom_menu(self, user_preferences: str, item_count: int = 4) -> List[Dict[str, Any]]:
+    async def generate_custom_menu(self, user_preferences: str, item_count: int = 4, cache_mode: CacheMode = CACHE_USE) -> List[Dict[str, Any]]:
         """
         Gera um cardápio personalizado com base nas preferências do usuário
         
         Args:
             user_preferences: Descrição das preferências do usuário
             item_count: Número de itens a serem gerados
+            cache_mode: Controle do cache de respostas ("use", "bypass" ou "refresh")
             
         Returns:
             Lista de refeições personalizadas
         """
+        menu_items: List[Dict[str, Any]] = []
         if self.groq_client:
-            prompt = f"""
-            Baseado nas seguintes preferências do usuário: "{user_preferences}", 
-            gere {item_count} opções de refeições personalizadas.
+            resolved_mode = self.cache.resolve_mode("menu", cache_mode)
+            if resolved_mode == CACHE_USE:
+                similar = self.menu_semantic_cache.lookup(user_preferences, item_count)
+                if similar is not None:
+                    self._record_outcome("menu", "cache")
+                    return similar
             
-            Para cada refeição, forneça o seguinte formato JSON:
-            [
-              {{
-                "id": número único,
-                "name": "nome da refeição",
-                "description": "descrição detalhada e apetitosa",
-                "price": preço em reais (número),
-                "tags": ["tag1", "tag2", "..."],
-                "nutrition": {{
-                  "calories": número de calorias,
-                  "protein": gramas de proteína,
-                  "carbs": gramas de carboidratos,
-                  "fat": gramas de gordura
-                }}
-              }}
-            ]
+            def build_prompt(count: int, exclude: List[str]) -> str:
+                return self._custom_menu_prompt(user_preferences, count, exclude)
             
-            Baseie-se nas preferências do usuário para escolher refeições que atendam às suas necessidades.
-            Garanta que as refeições sejam variadas e adequadas ao perfil descrito.
-            Retorne apenas o JSON, sem explicações adicionais.
-            """
+            async def call_groq():
+                items = await self._generate_items("menu", MenuItem, build_prompt, item_count, max_tokens=2000)
+                if items:
+                    # Adicionar imagens de placeholder para os itens
+                    for item in items:
+                        self._add_menu_image(item)
+                    if resolved_mode != CACHE_BYPASS:
+                        self.menu_semantic_cache.store(user_preferences, items)
+                    return items
+                return None
             
             try:
-                result = self.groq_client.generate_text(prompt, max_tokens=2000)
-                if result:
-                    # Extrair apenas o JSON da resposta
-                    json_start = result.find('[')
-                    json_end = result.rfind(']') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = result[json_start:json_end]
-                        menu_items = json.loads(json_str)
-                        
-                        # Adicionar imagens de placeholder para os itens
-                        for item in menu_items:
-                            if "name" in item and not item.get("image"):
-                                item_name = item["name"].lower().replace(" ", "-")
-                                item["image"] = f"https://source.unsplash.com/random/800x600/?{item_name}-food"
-                        
-                        return menu_items
+                key_payload = {"preferences": user_preferences, "item_count": item_count}
+                menu_items = await self._run_llm("menu", key_payload, call_groq, cache_mode) or []
+                if len(menu_items) >= item_count:
+                    return menu_items[:item_count]
             except Exception as e:
                 print(f"Erro ao gerar cardápio personalizado: {str(e)}")
         
-        # Fallback para itens estáticos se a API falhar
-        return self._generate_static_menu_items(user_preferences, item_count)
+        # Fallback para itens estáticos se a API falhar ou gerar menos itens
+        menu_items = [dict(item) for item in menu_items]
+        static_items = [dict(item) for item in self._generate_static_menu_items(user_preferences, item_count)[len(menu_items):]]
+        _assign_unique_ids(static_items, reserved=[item["id"] for item in menu_items])
+        return menu_items + static_items
+    
+    def _custom_menu_prompt(self, user_preferences: str, item_count: int, exclude: Optional[List[str]] = None) -> str:
+        """Monta o prompt de geração de cardápio personalizado (exclude lista itens já gerados)"""
+        avoid = f"Não repita estas refeições: {', '.join(exclude)}." if exclude else ""
+        return f"""
+        Baseado nas seguintes preferências do usuário: "{user_preferences}", 
+        gere {item_count} opções de refeições personalizadas. {avoid}
+        
+        Para cada refeição, forneça o seguinte formato JSON:
+        [
+          {{
+            "id": número único,
+            "name": "nome da refeição",
+            "description": "descrição detalhada e apetitosa",
+            "price": preço em reais (número),
+            "tags": ["tag1", "tag2", "..."],
+            "nutrition": {{
+              "calories": número de calorias,
+              "protein": gramas de proteína,
+              "carbs": gramas de carboidratos,
+              "fat": gramas de gordura
+            }}
+          }}
+        ]
+        
+        Baseie-se nas preferências do usuário para escolher refeições que atendam às suas necessidades.
+        Garanta que as refeições sejam variadas e adequadas ao perfil descrito.
+        Retorne apenas o JSON, sem explicações adicionais.
+        """
+    
+    def _add_menu_image(self, item: Dict[str, Any]):
+        """Adiciona uma imagem de placeholder ao item de cardápio"""
+        if "name" in item and not item.get("image"):
+            item_name = item["name"].lower().replace(" ", "-")
+            item["image"] = f"https://source.unsplash.com/random/800x600/?{item_name}-food"
+    
+    async def stream_custom_menu(self, user_preferences: str, item_count: int = 4, cache_mode: CacheMode = CACHE_USE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera um cardápio personalizado em streaming
+        
+        Cada item é produzido assim que seu objeto JSON se fecha no stream do
+        Groq. Se o stream falhar antes de produzir itens, usa o cardápio estático.
+        
+        Args:
+            user_preferences: Descrição das preferências do usuário
+            item_count: Número de itens a serem gerados
+            cache_mode: Controle do cache de respostas ("use", "bypass" ou "refresh")
+            
+        Yields:
+            Itens do cardápio
+        """
+        emitted_ids: List[Any] = []
+        if self.groq_client:
+            cache_mode = self.cache.resolve_mode("menu", cache_mode)
+            key = make_cache_key("menu", {"preferences": user_preferences, "item_count": item_count}, self.model, self.temperature)
+            cached = await self.cache.get("menu", key) if cache_mode == CACHE_USE else None
+            if cached is None and cache_mode == CACHE_USE:
+                # Cardápio gerado para preferências parecidas
+                cached = self.menu_semantic_cache.lookup(user_preferences, item_count)
+            
+            if cached is not None:
+                for item in cached:
+                    emitted_ids.append(item.get("id"))
+                    yield item
+            else:
+                parser = JSONArrayStream()
+                menu_items = []
+                started = time.perf_counter()
+                recorded = False
+                try:
+                    if not self.circuit_breaker.allow():
+                        recorded = True
+                        raise CircuitOpenError()
+                    # A espera na fila do agendador não conta como lentidão do Groq
+                    with QueueTimer() as queued:
+                        tokens = self.groq_client.astream_text(
+                            self._custom_menu_prompt(user_preferences, item_count),
+                            model=self.model,
+                            temperature=self.temperature,
+                            max_tokens=2000,
+                            priority=self._priority("menu")
+                        )
+                        # aclosing encerra a conexão assim que o array termina
+                        async with aclosing(tokens):
+                            async for token in tokens:
+                                for value in parser.feed(token):
+                                    # Itens fora do esquema são descartados sem interromper o stream
+                                    item = validate_object(value, MenuItem, "menu")
+                                    if item is None or len(menu_items) >= item_count:
+                                        continue
+                                    _assign_unique_ids([item], reserved=emitted_ids)
+                                    self._add_menu_image(item)
+                                    menu_items.append(item)
+                                    emitted_ids.append(item["id"])
+                                    yield dict(item)
+                                if parser.finished:
+                                    break
+                        if parser.failures:
+                            llm_json_failures.inc(parser.failures, endpoint="menu")
+                    
+                        # Pede ao LLM só os itens que faltaram (inválidos ou não gerados)
+                        missing = item_count - len(menu_items)
+                        if 0 < missing < item_count:
+                            for item in await self._request_missing_menu_items(user_preferences, menu_items, missing):
+                                _assign_unique_ids([item], reserved=emitted_ids)
+                                self._add_menu_image(item)
+                                menu_items.append(item)
+                                emitted_ids.append(item["id"])
+                                yield dict(item)
+                    recorded = True
+                    if menu_items:
+                        if cache_mode != CACHE_BYPASS:
+                            await self.cache.set("menu", key, menu_items)
+                            self.menu_semantic_cache.store(user_preferences, menu_items)
+                        self.circuit_breaker.record_success(time.perf_counter() - started - queued.seconds)
+                        self._record_outcome("menu", "llm")
+                    else:
+                        self.circuit_breaker.record_failure()
+                        self._record_outcome("menu", "empty")
+                except CircuitOpenError:
+                    self._record_outcome("menu", "circuit_open")
+                except QueueDeadlineExceeded:
+                    self._record_outcome("menu", "queue_timeout")
+                except Exception as e:
+                    recorded = True
+                    self.circuit_breaker.record_failure()
+                    self._record_outcome("menu", "error")
+                    print(f"Erro ao gerar cardápio personalizado em streaming: {str(e)}")
+                finally:
+                    # Cliente desconectou no meio do stream: não conta como falha do Groq
+                    if not recorded:
+                        self.circuit_breaker.release()
+        
+        # Completa com itens estáticos se a API falhar ou gerar menos itens
+        if len(emitted_ids) < item_count:
+            static_items = self._generate_static_menu_items(user_preferences, item_count)
+            for item in static_items[len(emitted_ids):]:
+                item = dict(item)
+                _assign_unique_ids([item], reserved=emitted_ids)
+                emitted_ids.append(item["id"])
+                yield item
+    
+    async def _request_missing_menu_items(self,
+                                          user_preferences: str,
+                                          menu_items: List[Dict[str, Any]],
+                                          missing: int) -> List[Dict[str, Any]]:
+        """Prompt complementar (sem streaming) para os itens que faltaram no cardápio"""
+        llm_followups.inc(endpoint="menu")
+        try:
+            result = await asyncio.wait_for(
+                self.groq_client.agenerate_text(
+                    self._custom_menu_prompt(user_preferences, missing, [item["name"] for item in menu_items]),
+                    model=self.model,
+                    temperature=self.temperature,
+                    max_tokens=max(200, 500 * missing),
+                    priority=self._priority("menu")
+                ),
+                timeout=self.latency_budgets.get("menu")
+            )
+        except (asyncio.TimeoutError, QueueDeadlineExceeded):
+            return []
+        return salvage_items(result, MenuItem, "menu")[:missing] if result else []
     
     def _generate_static_menu_items(self, preferences: str, count: int) -> List[Dict[str, Any]]:
         """Gera itens estáticos de cardápio se a API falhar"""
@@ -611,5 +1368,20 @@ class AIService:
         
         return result_items
 
-# Instância singleton para uso em toda a aplicação
-ai_service = AIService() 
\ No newline at end of file
+# Instância única, criada no primeiro uso e não na importação do módulo
+_ai_service: Optional[AIService] = None
+_ai_service_lock = threading.Lock()
+
+def get_ai_service() -> AIService:
+    """Retorna o AIService da aplicação, construindo-o (dados mock, tabela de alimentos) na primeira chamada"""
+    global _ai_service
+    if _ai_service is None:
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
+    return _ai_service
+
+async def close_ai_service():
+    """Fecha o pool de conexões com o Groq, se o serviço chegou a ser criado"""
+    if _ai_service is not None and _ai_service.groq_client:
+        await _ai_service.groq_client.aclose()
@@ -0,0 +1,118 @@
+"""
+Benchmark da API do DeliverIA contra um servidor local que imita o Groq
+
+Uso (a partir de backend/):
+    python -m benchmark --concurrency 1,8,32 --requests 200 --output bench.json
+    python -m benchmark --scenarios recommendations,menu_custom_stream --latency-ms 800 --error-rate 0.05
+    python -m benchmark --compare bench-anterior.json
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+from benchmark.scenarios import build_scenarios
+from benchmark.runner import (
+    free_port, seed_database, start_process, wait_until_ready, stop_process,
+    run_scenarios, compare, metadata,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark reproduzível da API do DeliverIA")
+    parser.add_argument("--scenarios", help="Cenários separados por vírgula (padrão: todos)")
+    parser.add_argument("--concurrency", default="1,8,32", help="Níveis de concorrência (ex: 1,8,32)")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições medidas por cenário e nível")
+    parser.add_argument("--warmup", type=int, default=5, help="Requisições de aquecimento (não medidas)")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout de cada requisição (s)")
+    parser.add_argument("--cache", choices=["use", "bypass", "refresh"], default="bypass",
+                        help="Modo de cache enviado aos endpoints com LLM")
+    parser.add_argument("--meals", type=int, default=200, help="Refeições semeadas no banco")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="Resultado anterior para comparar p95 e req/s")
+    parser.add_argument("--app-url", help="Usar uma API já em execução em vez de iniciar uma")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn da API")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar a saída da API e do servidor falso")
+    parser.add_argument("--groq-rpm", type=float, default=0,
+                        help="Limite de requisições/min do agendador da API (0 = sem limite)")
+    parser.add_argument("--groq-tpm", type=float, default=0,
+                        help="Limite de tokens/min do agendador da API (0 = sem limite)")
+    # Servidor falso do Groq
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--payloads", help="Arquivo JSON com respostas fixas por tipo de prompt")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    concurrency_levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    scenarios = build_scenarios(cache_mode=args.cache, meal_count=args.meals)
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(",")}
+        unknown = wanted - {scenario.name for scenario in scenarios}
+        if unknown:
+            sys.exit(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+        scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    groq_process = app_process = None
+
+    with tempfile.TemporaryDirectory(prefix="deliveria-bench-") as workdir:
+        try:
+            base_url = args.app_url
+            if base_url is None:
+                groq_port = free_port()
+                groq_args = [
+                    "-m", "benchmark.fake_groq", "--port", str(groq_port),
+                    "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                    "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+                    "--seed", str(args.seed),
+                ]
+                if args.payloads:
+                    groq_args += ["--payloads", os.path.abspath(args.payloads)]
+                groq_process = start_process(groq_args, {}, args.verbose)
+                wait_until_ready(f"http://127.0.0.1:{groq_port}/stats", groq_process)
+
+                database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+                seed_database(database_url, args.meals, args.seed)
+
+                app_port = free_port()
+                app_process = start_process(
+                    ["-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+                     "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+                    {
+                        "DATABASE_URL": database_url,
+                        "GROQ_API_URL": f"http://127.0.0.1:{groq_port}/openai/v1/chat/completions",
+                        "GROQ_API_KEY": "benchmark",
+                        "AI_CACHE_SQLITE_PATH": "",
+                        "GROQ_REQUESTS_PER_MINUTE": str(args.groq_rpm),
+                        "GROQ_TOKENS_PER_MINUTE": str(args.groq_tpm),
+                    },
+                    args.verbose,
+                )
+                base_url = f"http://127.0.0.1:{app_port}"
+                wait_until_ready(f"{base_url}/ready", app_process)
+
+            results = asyncio.run(run_scenarios(
+                base_url, scenarios, concurrency_levels, args.requests, args.warmup, args.seed, args.timeout
+            ))
+        finally:
+            stop_process(app_process)
+            stop_process(groq_process)
+
+    report = {"meta": metadata(config), "results": results}
+    if args.compare:
+        report["comparison"] = {"baseline": args.compare, "changes": compare(results, args.compare)}
+
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Servidor local que imita o endpoint de chat completions do Groq
+
+Uso:
+    python -m benchmark.fake_groq --port 8100 --latency-ms 300 --jitter-ms 100 --error-rate 0.02
+"""
+import re
+import json
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+MEAL_NAMES = [
+    "Bowl de Quinoa com Legumes",
+    "Frango Grelhado com Batata Doce",
+    "Salmão ao Molho de Ervas",
+    "Curry de Grão-de-Bico",
+    "Wrap de Tofu Defumado",
+    "Risoto de Cogumelos",
+]
+
+
+def _meal(position: int) -> Dict[str, Any]:
+    return {
+        "id": position + 1,
+        "name": MEAL_NAMES[position % len(MEAL_NAMES)],
+        "description": "Refeição equilibrada preparada com ingredientes frescos",
+        "ingredients": ["quinoa", "espinafre", "abacate"],
+        "tags": ["saudável", "rico em proteínas"],
+        "price": 29.9 + position,
+        "nutrition": {"calories": 450 + 10 * position, "protein": 30, "carbs": 40, "fat": 15},
+        "ai_explanation": "Combina com suas preferências e está dentro da faixa de calorias",
+    }
+
+
+def _count(pattern: str, prompt: str, default: int = 3) -> int:
+    match = re.search(pattern, prompt)
+    return int(match.group(1)) if match else default
+
+
+def classify(prompt: str) -> str:
+    """Identifica qual método do AIService gerou o prompt"""
+    if "informações nutricionais" in prompt:
+        return "nutrition"
+    if "explicação curta" in prompt:
+        return "explanations"
+    if "recomendações de refeições" in prompt:
+        return "recommendations"
+    if "opções de refeições personalizadas" in prompt:
+        return "menu"
+    if "rota de entrega" in prompt:
+        return "route_notes"
+    return "text"
+
+
+def default_payload(kind: str, prompt: str) -> str:
+    """Resposta padrão (texto gerado) para cada tipo de prompt"""
+    if kind == "nutrition":
+        return json.dumps({"calories": 520, "protein": 32.5, "carbs": 48.0, "fat": 18.2})
+    if kind == "explanations":
+        numbers = re.findall(r"^\s*(\d+)\. ", prompt, flags=re.MULTILINE)
+        return json.dumps({number: "Boa fonte de proteínas e dentro da sua meta calórica" for number in numbers})
+    if kind == "recommendations":
+        count = _count(r"Crie (\d+) recomendações", prompt)
+        return json.dumps([_meal(position) for position in range(count)], ensure_ascii=False)
+    if kind == "menu":
+        count = _count(r"gere (\d+) opções", prompt, default=4)
+        return json.dumps([_meal(position) for position in range(count)], ensure_ascii=False)
+    if kind == "route_notes":
+        return "Rota curta; comece pelos pedidos mais próximos da cozinha."
+    return "Resposta simulada do servidor local do benchmark."
+
+
+def create_app(latency_ms: float = 300,
+               jitter_ms: float = 100,
+               error_rate: float = 0.0,
+               error_status: int = 500,
+               payloads: Optional[Dict[str, Any]] = None,
+               seed: int = 42,
+               chunk_chars: int = 16) -> FastAPI:
+    """
+    Cria o app do servidor falso
+
+    Args:
+        latency_ms: Latência média de cada resposta
+        jitter_ms: Variação máxima (uniforme, para mais ou para menos)
+        error_rate: Fração das chamadas respondidas com error_status
+        error_status: Status HTTP das falhas simuladas (ex: 500 ou 429)
+        payloads: Respostas fixas por tipo de prompt (nutrition, recommendations,
+            explanations, menu, route_notes, text); valores não-texto viram JSON
+        seed: Semente do gerador aleatório (latências e erros reproduzíveis)
+        chunk_chars: Tamanho dos pedaços enviados em streaming
+    """
+    app = FastAPI(title="Fake Groq")
+    rng = random.Random(seed)
+    payloads = payloads or {}
+    stats = {"requests": 0, "errors": 0, "by_kind": {}}
+
+    def content_for(prompt: str) -> str:
+        kind = classify(prompt)
+        stats["by_kind"][kind] = stats["by_kind"].get(kind, 0) + 1
+        if kind in payloads:
+            value = payloads[kind]
+            return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        return default_payload(kind, prompt)
+
+    def usage(prompt: str, content: str) -> Dict[str, int]:
+        # Aproximação de ~4 caracteres por token
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        failed = rng.random() < error_rate
+        prompt = body["messages"][-1]["content"]
+        model = body.get("model", "llama3-8b-8192")
+
+        if failed:
+            stats["errors"] += 1
+            await asyncio.sleep(delay)
+            return JSONResponse(
+                status_code=error_status,
+                content={"error": {"message": "Falha simulada", "type": "fake_groq_error"}},
+            )
+
+        content = content_for(prompt)
+
+        if body.get("stream"):
+            async def events():
+                # A latência total é distribuída entre os pedaços
+                chunks = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)] or [""]
+                step = delay / len(chunks)
+                for chunk in chunks:
+                    await asyncio.sleep(step)
+                    data = {"choices": [{"index": 0, "delta": {"content": chunk}}], "model": model}
+                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                final = {"choices": [], "x_groq": {"usage": usage(prompt, content)}}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay)
+        return {
+            "id": f"chatcmpl-fake-{stats['requests']}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage(prompt, content),
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso da API do Groq para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--payloads", help="Arquivo JSON com respostas fixas por tipo de prompt")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    payloads = None
+    if args.payloads:
+        with open(args.payloads, encoding="utf-8") as handle:
+            payloads = json.load(handle)
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        payloads=payloads,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
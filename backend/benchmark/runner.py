@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import httpx
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import models
+from migrate import run_migrations
+from benchmark.scenarios import Scenario, INGREDIENTS, SEEDED_USERS, SEEDED_ORDERS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_database(database_url: str, meal_count: int, seed: int) -> None:
+    """Cria o banco do benchmark (refeições no formato legado, usuários e pedidos) e roda a migração"""
+    rng = random.Random(seed)
+    engine = create_engine(database_url)
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        for position in range(meal_count):
+            session.add(models.Meal(
+                name=f"Refeição {position + 1}",
+                description="Refeição semeada para o benchmark",
+                price=round(rng.uniform(20, 60), 2),
+                nutritional_info=json.dumps({
+                    "calories": rng.randint(250, 900),
+                    "protein": rng.randint(5, 45),
+                    "carbs": rng.randint(10, 90),
+                    "fat": rng.randint(3, 40),
+                }),
+                ingredients=json.dumps(rng.sample(INGREDIENTS, 4)),
+                is_available=True,
+            ))
+        for position in range(SEEDED_USERS):
+            session.add(models.User(
+                email=f"usuario{position + 1}@benchmark.local",
+                name=f"Usuário {position + 1}",
+                is_active=True,
+            ))
+        session.flush()
+        # Pedidos já gravados, consultados pelo cenário orders_status
+        for position in range(SEEDED_ORDERS):
+            session.add(models.Order(
+                user_id=position % SEEDED_USERS + 1,
+                status="pending",
+                total_price=round(rng.uniform(20, 120), 2),
+                delivery_address=f"Rua {position}, {rng.randint(1, 999)}",
+                payment_method="pix",
+                payment_status="pending",
+                idempotency_key=f"bench-seed-{position + 1}",
+            ))
+        session.commit()
+    run_migrations(engine)
+    engine.dispose()
+
+
+def start_process(args: List[str], env: Dict[str, str], verbose: bool = False) -> subprocess.Popen:
+    # Sem verbose, a saída dos processos (ex: erros simulados do Groq) é descartada
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable] + args,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=output,
+        stderr=output,
+    )
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Processo encerrou antes de ficar pronto: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Tempo esgotado aguardando {url}")
+
+
+def stop_process(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def summarize(latencies: List[float], first_bytes: List[float], elapsed: float,
+              statuses: Dict[str, int], errors: int) -> Dict[str, Any]:
+    """Percentis em milissegundos e vazão da rodada"""
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": statuses,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+    if first_bytes:
+        firsts = np.array(first_bytes) * 1000
+        summary["ttfb_p50_ms"] = round(float(np.percentile(firsts, 50)), 2)
+        summary["ttfb_p95_ms"] = round(float(np.percentile(firsts, 95)), 2)
+    return summary
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, path: str, body: Any):
+    """Executa uma requisição e retorna (status, duração, tempo até o primeiro byte)"""
+    started = time.perf_counter()
+    if scenario.stream:
+        first_byte = None
+        async with client.stream(scenario.method, path, json=body) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        return response.status_code, time.perf_counter() - started, first_byte
+    response = await client.request(scenario.method, path, json=body)
+    return response.status_code, time.perf_counter() - started, None
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                    requests: int, warmup: int, seed: int) -> Dict[str, Any]:
+    """Dispara requests chamadas ao cenário com concurrency clientes simultâneos"""
+    rng = random.Random(seed)
+    calls = [
+        (scenario.path(index), scenario.body(index, rng) if scenario.body else None)
+        for index in range(warmup + requests)
+    ]
+
+    for path, body in calls[:warmup]:
+        try:
+            await send(client, scenario, path, body)
+        except httpx.HTTPError:
+            pass
+
+    pending = iter(calls[warmup:])
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for path, body in pending:
+            try:
+                status_code, duration, first_byte = await send(client, scenario, path, body)
+            except httpx.HTTPError as e:
+                errors += 1
+                statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+                continue
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+            # Só respostas 2xx entram nas latências (um 422 rápido não é uma amostra válida)
+            if not 200 <= status_code < 300:
+                errors += 1
+                continue
+            latencies.append(duration)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, first_bytes, elapsed, statuses, errors)
+
+
+async def run_scenarios(base_url: str, scenarios: List[Scenario], concurrency_levels: List[int],
+                        requests: int, warmup: int, seed: int, timeout: float) -> List[Dict[str, Any]]:
+    results = []
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for scenario in scenarios:
+            for concurrency in concurrency_levels:
+                summary = await run_level(client, scenario, concurrency, requests, warmup, seed)
+                result = {
+                    "scenario": scenario.name,
+                    "concurrency": concurrency,
+                    "uses_llm": scenario.uses_llm,
+                    **summary,
+                }
+                results.append(result)
+                print(
+                    f"{scenario.name:<20} c={concurrency:<4} {summary['rps']:>9.1f} req/s  "
+                    f"p50 {summary['p50_ms']:>8.1f}  p95 {summary['p95_ms']:>8.1f}  "
+                    f"p99 {summary['p99_ms']:>8.1f} ms  erros {summary['errors']}"
+                )
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> List[Dict[str, Any]]:
+    """Variação percentual de p95 e req/s em relação a um resultado anterior"""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    previous = {(item["scenario"], item["concurrency"]): item for item in baseline.get("results", [])}
+
+    def change(current, before):
+        return round((current - before) / before * 100, 1) if before else None
+
+    deltas = []
+    for item in results:
+        before = previous.get((item["scenario"], item["concurrency"]))
+        if before is None:
+            continue
+        delta = {
+            "scenario": item["scenario"],
+            "concurrency": item["concurrency"],
+            "p95_change_pct": change(item["p95_ms"], before["p95_ms"]),
+            "rps_change_pct": change(item["rps"], before["rps"]),
+        }
+        deltas.append(delta)
+        print(
+            f"{delta['scenario']:<20} c={delta['concurrency']:<4} "
+            f"p95 {delta['p95_change_pct']}%  req/s {delta['rps_change_pct']}%"
+        )
+    return deltas
+
+
+def metadata(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+    }
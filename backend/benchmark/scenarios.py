@@ -0,0 +1,184 @@
+import uuid
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+# Região de São Paulo usada para gerar pontos de entrega
+BASE_LAT, BASE_LNG = -23.5505, -46.6333
+
+CUISINES = ["brasileira", "mediterrânea", "japonesa", "italiana", "mexicana"]
+PROTEINS = ["frango", "tofu", "salmao", "grao_de_bico", "lentilha"]
+RESTRICTIONS = [[], ["vegano"], ["sem_gluten"], ["vegetariano"], ["sem_lactose"]]
+INGREDIENTS = ["frango", "quinoa", "abacate", "espinafre", "batata_doce", "salmao", "tofu", "lentilha"]
+# Usuários e pedidos criados por seed_database (pedidos com chave "bench-seed-{n}")
+SEEDED_USERS = 50
+SEEDED_ORDERS = 200
+MENU_PREFERENCES = [
+    "Comida vegana rica em proteínas",
+    "Pratos leves para o jantar, sem glúten",
+    "Refeições low carb com frango ou peixe",
+    "Culinária mediterrânea com bastante legume",
+]
+
+
+class Scenario:
+    """
+    Uma chamada a um endpoint da API
+
+    body recebe o índice da requisição e um gerador aleatório com semente
+    fixa, de modo que a mesma sequência de payloads se repete a cada execução.
+    """
+
+    def __init__(self, name: str, method: str, path: Callable[[int], str],
+                 body: Optional[Callable[[int, random.Random], Any]] = None,
+                 stream: bool = False, uses_llm: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.stream = stream
+        self.uses_llm = uses_llm
+
+
+def _points(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "address": f"Rua {position}, {rng.randint(1, 999)}",
+            "lat": BASE_LAT + rng.uniform(-0.08, 0.08),
+            "lng": BASE_LNG + rng.uniform(-0.08, 0.08),
+            "order_id": position + 1,
+            "customer_name": f"Cliente {position + 1}",
+        }
+        for position in range(count)
+    ]
+
+
+def _recommendation(index: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "preferences": {
+            "cuisine_type": CUISINES[index % len(CUISINES)],
+            "meal_type": "almoço",
+            "spice_level": index % 6,
+            "preferred_protein": [PROTEINS[index % len(PROTEINS)]],
+        },
+        "dietary_restrictions": RESTRICTIONS[index % len(RESTRICTIONS)],
+        "calories_range": [300, 600 + 50 * (index % 4)],
+    }
+
+
+def _nutrition(index: int, rng: random.Random) -> List[str]:
+    ingredients = rng.sample(INGREDIENTS, 3)
+    # Um a cada quatro pedidos tem um ingrediente fora da tabela (vai ao LLM)
+    if index % 4 == 0:
+        ingredients.append(f"ingrediente exótico {index % 10}")
+    return ingredients
+
+
+def _nutrition_batch(index: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "recipes": [
+            {name: rng.randint(50, 250) for name in rng.sample(INGREDIENTS, 4)}
+            for _ in range(200)
+        ]
+    }
+
+
+def _menu(stream: bool):
+    def body(index: int, rng: random.Random) -> Dict[str, Any]:
+        return {
+            "preferences": MENU_PREFERENCES[index % len(MENU_PREFERENCES)],
+            "item_count": 4,
+            "stream": stream,
+        }
+    return body
+
+
+def _groq_test(stream: bool):
+    def body(index: int, rng: random.Random) -> Dict[str, Any]:
+        return {"prompt": f"Sugira um lanche saudável ({index % 20})", "max_tokens": 100, "stream": stream}
+    return body
+
+
+def _route(index: int, rng: random.Random) -> Dict[str, Any]:
+    return {"starting_point": {"lat": BASE_LAT, "lng": BASE_LNG}, "delivery_points": _points(rng, 25)}
+
+
+def _fleet(index: int, rng: random.Random) -> Dict[str, Any]:
+    couriers = [
+        {
+            "courier_id": f"c{position}",
+            "lat": BASE_LAT + rng.uniform(-0.02, 0.02),
+            "lng": BASE_LNG + rng.uniform(-0.02, 0.02),
+            "capacity": 12,
+        }
+        for position in range(5)
+    ]
+    return {"couriers": couriers, "orders": _points(rng, 50)}
+
+
+def _order(meal_count: int):
+    def body(index: int, rng: random.Random) -> Dict[str, Any]:
+        return {
+            "user_id": index % SEEDED_USERS + 1,
+            "delivery_address": f"Rua {index}, {rng.randint(1, 999)}",
+            "items": [
+                {"meal_id": rng.randint(1, meal_count), "quantity": rng.randint(1, 3)}
+                for _ in range(rng.randint(1, 4))
+            ],
+            # Chave nova a cada chamada: mede a gravação, não o atalho de reenvio
+            "idempotency_key": f"bench-{uuid.uuid4().hex}",
+        }
+    return body
+
+
+def _order_bulk(meal_count: int):
+    order = _order(meal_count)
+
+    def body(index: int, rng: random.Random) -> Dict[str, Any]:
+        return {"orders": [order(index * 100 + position, rng) for position in range(100)]}
+    return body
+
+
+def _pix(index: int, rng: random.Random) -> Dict[str, Any]:
+    return {"order_id": index + 1, "amount": round(rng.uniform(20, 120), 2), "description": "Pedido DeliverIA"}
+
+
+def _cashback(index: int, rng: random.Random) -> Dict[str, Any]:
+    return {"user_id": index % 50 + 1, "order_id": index + 1, "amount": round(rng.uniform(20, 120), 2)}
+
+
+def build_scenarios(cache_mode: str = "bypass", meal_count: int = 200) -> List[Scenario]:
+    """
+    Cenários cobrindo todos os endpoints de backend/main.py
+
+    Os pedidos usam os usuários e as refeições semeados por seed_database.
+
+    Args:
+        cache_mode: Modo de cache enviado aos endpoints com LLM ("bypass" mede o
+            caminho até o Groq; "use" mede o efeito do cache)
+        meal_count: Número de refeições semeadas no banco do benchmark
+    """
+    cache = f"?cache={cache_mode}"
+    return [
+        Scenario("root", "GET", lambda i: "/"),
+        Scenario("ready", "GET", lambda i: "/ready"),
+        Scenario("recommendations", "POST", lambda i: f"/api/recommendations{cache}", _recommendation, uses_llm=True),
+        Scenario("groq_test", "POST", lambda i: "/api/groq/test", _groq_test(False), uses_llm=True),
+        Scenario("groq_test_stream", "POST", lambda i: "/api/groq/test", _groq_test(True), stream=True, uses_llm=True),
+        Scenario("menu_custom", "POST", lambda i: f"/api/menu/custom{cache}", _menu(False), uses_llm=True),
+        Scenario("menu_custom_stream", "POST", lambda i: f"/api/menu/custom{cache}", _menu(True), stream=True, uses_llm=True),
+        Scenario("nutrition_analyze", "POST", lambda i: f"/api/nutrition/analyze{cache}", _nutrition, uses_llm=True),
+        Scenario("nutrition_batch", "POST", lambda i: "/api/nutrition/analyze-batch", _nutrition_batch),
+        Scenario("optimize_route", "POST", lambda i: "/api/delivery/optimize-route", _route),
+        Scenario("optimize_fleet", "POST", lambda i: "/api/delivery/optimize-fleet", _fleet),
+        Scenario("ai_stats", "GET", lambda i: "/api/ai/stats"),
+        Scenario("metrics", "GET", lambda i: "/metrics"),
+        Scenario("ai_cache_clear", "DELETE", lambda i: "/api/ai/cache?endpoint=route_notes"),
+        Scenario("meals_list", "GET", lambda i: f"/api/meals?limit=50&after_id={(i * 50) % meal_count}"),
+        Scenario("meals_detail", "GET", lambda i: f"/api/meals/{i % meal_count + 1}"),
+        Scenario("orders_create", "POST", lambda i: "/api/orders", _order(meal_count)),
+        Scenario("orders_bulk", "POST", lambda i: "/api/orders/bulk", _order_bulk(meal_count)),
+        Scenario("orders_status", "GET", lambda i: f"/api/orders/status/bench-seed-{i % SEEDED_ORDERS + 1}"),
+        Scenario("orders_queue", "GET", lambda i: "/api/orders/queue"),
+        Scenario("payment_pix", "POST", lambda i: "/api/payment/pix", _pix),
+        Scenario("loyalty_cashback", "POST", lambda i: "/api/loyalty/cashback", _cashback),
+    ]
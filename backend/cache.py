@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional
+
+# Modos de uso do cache por requisição:
+# - use: lê do cache e grava respostas novas
+# - bypass: ignora o cache completamente
+# - refresh: ignora o valor armazenado, mas grava a nova resposta
+CacheMode = Literal["use", "bypass", "refresh"]
+CACHE_USE = "use"
+CACHE_BYPASS = "bypass"
+CACHE_REFRESH = "refresh"
+
+
+def normalize_text(value: str) -> str:
+    """Normaliza texto livre (minúsculas e espaços colapsados)"""
+    return " ".join(str(value).strip().lower().split())
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Converte um payload em uma forma canônica para gerar chaves de cache
+
+    Dicionários têm as chaves ordenadas, strings são normalizadas e conjuntos
+    (set/frozenset) viram listas ordenadas. Listas mantêm a ordem, então quem
+    chama deve passar um set quando a ordem não importa (ex: ingredientes).
+    """
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (set, frozenset)):
+        items = [canonicalize(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, ensure_ascii=False))
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def make_cache_key(endpoint: str, payload: Any, model: str, temperature: float) -> str:
+    """Gera a chave de cache a partir do endpoint, payload, modelo e temperatura"""
+    canonical = json.dumps(
+        {
+            "endpoint": endpoint,
+            "model": model,
+            "temperature": round(float(temperature), 4),
+            "payload": canonicalize(payload),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{endpoint}:{digest}"
+
+
+class TTLCache:
+    """Cache LRU em memória com expiração por entrada"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_prefix(self, prefix: str = ""):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheTier:
+    """
+    Camada persistente do cache em SQLite (sobrevive a reinícios)
+
+    O mesmo arquivo pode ser aberto por vários processos (workers do uvicorn):
+    em modo WAL as leituras não bloqueiam a escrita de outro worker, então uma
+    resposta do Groq gravada por um processo atende os demais. Erros do SQLite
+    (ex: banco ocupado além do busy_timeout) são tratados como falta no cache.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 2000):
+        self.path = path
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # Chamadas em andamento (um worker chama o Groq, os outros aguardam o resultado)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache_leases ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # Invalidações recentes, aplicadas pelos outros workers na sua camada em memória
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache_invalidations ("
+            "prefix TEXT PRIMARY KEY, invalidated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = (), commit: bool = False) -> Optional[sqlite3.Cursor]:
+        with self._lock:
+            try:
+                cursor = self._conn.execute(sql, params)
+                if commit:
+                    self._conn.commit()
+                return cursor
+            except sqlite3.Error as e:
+                print(f"Erro no cache SQLite: {str(e)}")
+                return None
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Retorna (valor, ttl restante) ou None se ausente/expirado"""
+        cursor = self._execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,))
+        row = cursor.fetchone() if cursor is not None else None
+        if row is None:
+            return None
+        value, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        return value, remaining
+
+    def set(self, key: str, value: str, ttl: float):
+        self._execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+            commit=True,
+        )
+
+    def claim(self, key: str, seconds: float) -> bool:
+        """
+        Reserva a chave para este processo chamar o Groq
+
+        Returns:
+            False se outro worker já tiver uma reserva válida para a chave
+        """
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO llm_cache_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE llm_cache_leases.expires_at <= ?",
+            (key, self.owner, now + seconds, now),
+            commit=True,
+        )
+        # Sem acesso ao SQLite, segue sem coordenação
+        return cursor is None or cursor.rowcount == 1
+
+    def is_claimed(self, key: str) -> bool:
+        cursor = self._execute(
+            "SELECT 1 FROM llm_cache_leases WHERE key = ? AND expires_at > ?", (key, time.time())
+        )
+        return cursor is not None and cursor.fetchone() is not None
+
+    def release(self, key: str):
+        self._execute(
+            "DELETE FROM llm_cache_leases WHERE key = ? AND owner = ?", (key, self.owner), commit=True
+        )
+
+    def delete_prefix(self, prefix: str = ""):
+        now = time.time()
+        self._execute("DELETE FROM llm_cache WHERE key LIKE ?", (prefix + "%",))
+        self._execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self._execute("DELETE FROM llm_cache_leases WHERE expires_at <= ?", (now,))
+        self._execute(
+            "INSERT OR REPLACE INTO llm_cache_invalidations (prefix, invalidated_at) VALUES (?, ?)",
+            (prefix, now),
+            commit=True,
+        )
+
+    def invalidations_since(self, since: float) -> List[tuple]:
+        """Prefixos invalidados (por qualquer worker) depois de since"""
+        cursor = self._execute(
+            "SELECT prefix, invalidated_at FROM llm_cache_invalidations WHERE invalidated_at > ?", (since,)
+        )
+        return cursor.fetchall() if cursor is not None else []
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Cache de respostas dos endpoints que dependem do LLM
+
+    Usa um LRU com TTL em memória e, opcionalmente, uma camada SQLite.
+    Os valores são guardados serializados em JSON, então cada leitura devolve
+    uma cópia independente que pode ser modificada por quem chamou.
+
+    As operações na camada SQLite (que podem esperar pelo busy_timeout quando
+    vários workers escrevem) rodam em uma thread, fora do event loop; acertos
+    na camada em memória não saem do loop.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 default_ttl: float = 3600,
+                 sqlite_path: Optional[str] = None,
+                 endpoint_ttls: Optional[Dict[str, float]] = None,
+                 bypass_endpoints: Optional[set] = None,
+                 lease_seconds: float = 30,
+                 sync_interval: float = 1.0):
+        self.default_ttl = default_ttl
+        self.endpoint_ttls = endpoint_ttls or {}
+        self.bypass_endpoints = bypass_endpoints or set()
+        self.memory = TTLCache(max_entries)
+        self.persistent = SQLiteCacheTier(sqlite_path) if sqlite_path else None
+        # Tempo máximo que um worker aguarda a chamada em andamento em outro worker
+        self.lease_seconds = lease_seconds
+        # Intervalo entre verificações de invalidações feitas por outros workers
+        self.sync_interval = sync_interval
+        self._synced_at = time.monotonic()
+        self._invalidations_seen = time.time()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Cria o cache a partir das variáveis de ambiente AI_CACHE_*"""
+        endpoint_ttls = {}
+        for name in ("nutrition", "recommendations", "menu"):
+            ttl = os.getenv(f"AI_CACHE_TTL_{name.upper()}")
+            if ttl:
+                endpoint_ttls[name] = float(ttl)
+        bypass = os.getenv("AI_CACHE_BYPASS_ENDPOINTS", "")
+        return cls(
+            max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024")),
+            default_ttl=float(os.getenv("AI_CACHE_TTL_SECONDS", "3600")),
+            sqlite_path=os.getenv("AI_CACHE_SQLITE_PATH") or None,
+            endpoint_ttls=endpoint_ttls,
+            bypass_endpoints={e.strip() for e in bypass.split(",") if e.strip()},
+            lease_seconds=float(os.getenv("AI_CACHE_LEASE_SECONDS", "30")),
+            sync_interval=float(os.getenv("AI_CACHE_SYNC_INTERVAL", "1")),
+        )
+
+    def _count(self, endpoint: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(
+                endpoint, {"hits": 0, "misses": 0, "persistent_hits": 0, "peer_hits": 0, "stores": 0, "bypassed": 0}
+            )
+            counters[counter] += 1
+
+    def resolve_mode(self, endpoint: str, mode: str) -> str:
+        """Aplica o bypass configurado por endpoint sobre o modo da requisição"""
+        if endpoint in self.bypass_endpoints:
+            return CACHE_BYPASS
+        return mode
+
+    async def _sync_invalidations(self):
+        """Aplica na camada em memória as invalidações feitas por outros workers"""
+        if self.persistent is None or time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        invalidations = await asyncio.to_thread(self.persistent.invalidations_since, self._invalidations_seen)
+        for prefix, invalidated_at in invalidations:
+            self.memory.delete_prefix(prefix)
+            self._invalidations_seen = max(self._invalidations_seen, invalidated_at)
+
+    async def get(self, endpoint: str, key: str) -> Optional[Any]:
+        await self._sync_invalidations()
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            entry = await asyncio.to_thread(self.persistent.get, key)
+            if entry is not None:
+                value, remaining = entry
+                # Promove a entrada para a camada em memória
+                self.memory.set(key, value, remaining)
+                self._count(endpoint, "persistent_hits")
+        if value is None:
+            self._count(endpoint, "misses")
+            return None
+        self._count(endpoint, "hits")
+        return json.loads(value)
+
+    async def set(self, endpoint: str, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = ttl or self.endpoint_ttls.get(endpoint, self.default_ttl)
+        serialized = json.dumps(value, ensure_ascii=False)
+        self.memory.set(key, serialized, ttl)
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.set, key, serialized, ttl)
+        self._count(endpoint, "stores")
+
+    async def claim(self, key: str) -> bool:
+        """Reserva a chamada ao LLM para este worker (sempre True sem a camada SQLite)"""
+        if self.persistent is None:
+            return True
+        return await asyncio.to_thread(self.persistent.claim, key, self.lease_seconds)
+
+    async def release(self, key: str):
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.release, key)
+
+    async def wait_for_peer(self, endpoint: str, key: str, poll_interval: float = 0.05) -> Optional[Any]:
+        """
+        Aguarda a resposta que outro worker está buscando no LLM
+
+        Returns:
+            O valor gravado pelo outro worker, ou None se a reserva terminar
+            (ou expirar) sem resultado no cache
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+            entry = await asyncio.to_thread(self.persistent.get, key)
+            if entry is not None:
+                value, remaining = entry
+                self.memory.set(key, value, remaining)
+                self._count(endpoint, "peer_hits")
+                return json.loads(value)
+            if not await asyncio.to_thread(self.persistent.is_claimed, key):
+                return None
+            poll_interval = min(poll_interval * 2, 0.5)
+        return None
+
+    def record_bypass(self, endpoint: str):
+        self._count(endpoint, "bypassed")
+
+    async def invalidate(self, endpoint: Optional[str] = None):
+        """Remove as entradas de um endpoint (ou todas)"""
+        prefix = f"{endpoint}:" if endpoint else ""
+        self.memory.delete_prefix(prefix)
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.delete_prefix, prefix)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {name: dict(counters) for name, counters in self._counters.items()}
+        for counters in endpoints.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return {
+            "memory_entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "persistent": self.persistent.path if self.persistent else None,
+            "endpoints": endpoints,
+        }
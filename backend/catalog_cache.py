@@ -0,0 +1,138 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from cache import TTLCache
+
+
+class CatalogCache:
+    """
+    Cache de leitura do catálogo de refeições com contador de versão
+
+    As respostas já serializadas ficam em memória, indexadas pela versão do
+    catálogo lida no início da requisição. Qualquer escrita em uma refeição
+    incrementa a versão, o que invalida todas as entradas de uma vez. O ETag
+    é o hash do corpo da resposta, então continua válido entre reinícios e
+    entre workers enquanto o conteúdo não mudar. A versão também avança a
+    cada ttl_seconds, limitando o tempo de desatualização quando o banco é
+    alterado por outro processo.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self._entries = TTLCache(max_entries)
+        self._lock = threading.Lock()
+        self._version = 1
+        self._version_started = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._listeners: List[Callable[[], None]] = []
+
+    @classmethod
+    def from_env(cls) -> "CatalogCache":
+        return cls(
+            ttl_seconds=float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "2048")),
+        )
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            if time.monotonic() - self._version_started >= self.ttl_seconds:
+                self._version += 1
+                self._version_started = time.monotonic()
+            return self._version
+
+    def subscribe(self, listener: Callable[[], None]):
+        """Registra uma função chamada a cada escrita no catálogo (não na troca de versão pelo TTL)"""
+        self._listeners.append(listener)
+
+    def bump(self):
+        """Invalida o catálogo em cache (chamado após escritas em refeições)"""
+        with self._lock:
+            self._version += 1
+            self._version_started = time.monotonic()
+        for listener in self._listeners:
+            listener()
+
+    @staticmethod
+    def etag(body: bytes, headers: Optional[Dict[str, str]] = None) -> str:
+        """ETag forte da representação (hash do corpo serializado e dos cabeçalhos, ex: X-Next-Cursor)"""
+        digest = hashlib.sha1(body)
+        for name, value in sorted((headers or {}).items()):
+            digest.update(f"\n{name}:{value}".encode("utf-8"))
+        return f'"{digest.hexdigest()[:20]}"'
+
+    def matches(self, if_none_match: Optional[str], etag: str) -> bool:
+        """Verifica o cabeçalho If-None-Match contra o ETag atual"""
+        if not if_none_match:
+            return False
+        candidates = [value.strip() for value in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            with self._lock:
+                self.not_modified += 1
+            return True
+        return False
+
+    def get(self, key: str, version: int) -> Optional[Tuple[bytes, Dict[str, str], str]]:
+        """Corpo, cabeçalhos e ETag da representação em cache"""
+        entry = self._entries.get(f"{version}:{key}")
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key: str, version: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> str:
+        """Guarda a representação e retorna o seu ETag"""
+        etag = self.etag(body, headers)
+        self._entries.set(f"{version}:{key}", (body, headers or {}, etag), self.ttl_seconds)
+        return etag
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+def invalidate_on_write(catalog: CatalogCache, model) -> None:
+    """
+    Registra eventos do SQLAlchemy que incrementam a versão do catálogo
+    sempre que uma instância de model é criada, alterada ou removida
+    """
+    @event.listens_for(Session, "after_flush")
+    def _track_flush(session, flush_context):
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(instance, model):
+                session.info["catalog_changed"] = True
+                break
+
+    @event.listens_for(Session, "after_commit")
+    def _bump_on_commit(session):
+        if session.info.pop("catalog_changed", False):
+            catalog.bump()
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard_on_rollback(session):
+        session.info.pop("catalog_changed", None)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _track_bulk(orm_execute_state):
+        # INSERT/UPDATE/DELETE em massa (insert(Meal), query.update...) não passam pelo flush
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None and mapper.class_ is model:
+                orm_execute_state.session.info["catalog_changed"] = True
+
+
+# Instância única compartilhada pelos endpoints do catálogo
+meal_catalog = CatalogCache.from_env()
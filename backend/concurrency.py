@@ -0,0 +1,57 @@
+import copy
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes idênticas em uma única execução
+
+    Enquanto uma chamada com determinada chave está em andamento, novas chamadas
+    com a mesma chave aguardam o mesmo resultado em vez de repetir o trabalho.
+    Cada chamador recebe sua própria cópia do resultado, para que possa modificá-lo.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key: str, producer: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa producer uma única vez para todas as chamadas simultâneas com a chave
+
+        Args:
+            key: Chave canônica da chamada
+            producer: Corrotina sem argumentos que produz o resultado
+
+        Returns:
+            Cópia do resultado do producer
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(producer())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+
+        # shield: se um dos chamadores for cancelado, os demais continuam aguardando
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marca a exceção como lida: todos os chamadores podem ter desistido antes
+        # (orçamento de latência), e a falha já foi tratada por quem aguardava
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.executions,
+            "saved_calls": self.calls - self.executions,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,167 @@
+import os
+import csv
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from name_index import fold_name
+from nutrition_matrix import NutritionMatrix, NUTRIENTS
+
+# Nomes de coluna aceitos no CSV (comparados sem acentos e em minúsculas)
+COLUMN_ALIASES = {
+    "name": ("name", "nome", "alimento", "descricao", "descricao do alimento", "food", "description"),
+    "calories": ("calories", "calorias", "energia", "energia kcal", "energia (kcal)", "kcal", "energy kcal"),
+    "protein": ("protein", "proteina", "proteina g", "proteina (g)", "proteinas"),
+    "carbs": ("carbs", "carboidrato", "carboidratos", "carboidrato g", "carboidrato (g)", "carbohydrate"),
+    "fat": ("fat", "gordura", "gorduras", "lipideos", "lipideos g", "lipideos (g)", "lipidios", "total fat"),
+}
+
+# Marcadores de ausência ou traço usados em tabelas de composição (ex: TACO)
+EMPTY_VALUES = {"", "na", "nd", "tr", "*", "-"}
+
+
+def _column_map(header: List[str]) -> Dict[str, int]:
+    folded = [fold_name(column).replace("_", " ") for column in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for position, column in enumerate(folded):
+            if column in aliases:
+                columns[field] = position
+                break
+    missing = [field for field in ("name",) + NUTRIENTS if field not in columns]
+    if missing:
+        raise ValueError(f"Colunas ausentes na tabela de alimentos: {', '.join(missing)}")
+    return columns
+
+
+def _parse_value(raw: str) -> float:
+    value = raw.strip().lower()
+    if value in EMPTY_VALUES:
+        return 0.0
+    return float(value.replace(",", "."))
+
+
+def parse_food_csv(csv_path: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Lê uma tabela de composição de alimentos em CSV (valores por 100 g)
+
+    Aceita separador "," ou ";" e vírgula decimal. Linhas sem nome ou com
+    valores inválidos são ignoradas.
+
+    Returns:
+        Nomes dos alimentos e matriz float32 (alimentos x nutrientes)
+    """
+    with open(csv_path, newline="", encoding="utf-8-sig") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        delimiter = ";" if sample.count(";") > sample.count(",") else ","
+        reader = csv.reader(handle, delimiter=delimiter)
+        columns = _column_map(next(reader))
+
+        names: List[str] = []
+        rows: List[List[float]] = []
+        for line in reader:
+            try:
+                name = line[columns["name"]].strip()
+                values = [_parse_value(line[columns[nutrient]]) for nutrient in NUTRIENTS]
+            except (IndexError, ValueError):
+                continue
+            if name:
+                names.append(name)
+                rows.append(values)
+
+    return names, np.array(rows, dtype=np.float32).reshape(len(rows), len(NUTRIENTS))
+
+
+def _cache_paths(csv_path: str, cache_dir: Optional[str]) -> Tuple[str, str]:
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    directory = cache_dir or os.path.dirname(os.path.abspath(csv_path))
+    return os.path.join(directory, f"{base}.values.npy"), os.path.join(directory, f"{base}.names.json")
+
+
+def _build_table(csv_path: str, extra: Dict[str, Dict[str, float]]) -> Tuple[List[str], np.ndarray]:
+    names, values = parse_food_csv(csv_path)
+    known = {fold_name(name) for name in names}
+    added = [name for name in extra if fold_name(name) not in known]
+    if added:
+        rows = np.array(
+            [[float(extra[name].get(nutrient, 0) or 0) for nutrient in NUTRIENTS] for name in added],
+            dtype=np.float32,
+        ).reshape(len(added), len(NUTRIENTS))
+        names = names + added
+        values = np.concatenate([values, rows])
+    return names, values
+
+
+def _read_names(names_path: str) -> Optional[Dict]:
+    try:
+        with open(names_path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def load_food_table(csv_path: str,
+                    cache_dir: Optional[str] = None,
+                    extra: Optional[Dict[str, Dict[str, float]]] = None,
+                    match_threshold: float = 0.7) -> NutritionMatrix:
+    """
+    Carrega a tabela de alimentos como NutritionMatrix
+
+    Na primeira carga (ou quando o CSV ou os ingredientes extras mudam) os
+    valores são gravados em um arquivo .npy float32 ao lado do CSV; as cargas
+    seguintes o abrem mapeado em memória, sem reler o CSV, e os processos
+    compartilham as mesmas páginas.
+
+    Args:
+        csv_path: Caminho do CSV com nome, calorias, proteína, carboidratos e gordura
+        cache_dir: Diretório dos arquivos .npy/.json (padrão: o do CSV)
+        extra: Ingredientes adicionais (ex: os dados mock) que não estejam na tabela
+        match_threshold: Similaridade mínima para resolver nomes aproximados
+
+    Returns:
+        Matriz de nutrientes com índice de nomes
+    """
+    extra = extra or {}
+    values_path, names_path = _cache_paths(csv_path, cache_dir)
+    stored = _read_names(names_path)
+    fresh = (
+        stored is not None
+        and stored.get("extra") == sorted(extra)
+        and os.path.exists(values_path)
+        and os.path.getmtime(values_path) >= os.path.getmtime(csv_path)
+    )
+    if not fresh:
+        names, values = _build_table(csv_path, extra)
+        stored = {"extra": sorted(extra), "names": names}
+        # Grava em arquivos temporários e troca atomicamente (vários workers podem carregar juntos)
+        suffix = f".{os.getpid()}.tmp"
+        np.save(values_path + suffix + ".npy", values)
+        with open(names_path + suffix, "w", encoding="utf-8") as handle:
+            json.dump(stored, handle, ensure_ascii=False)
+        os.replace(names_path + suffix, names_path)
+        os.replace(values_path + suffix + ".npy", values_path)
+
+    values = np.load(values_path, mmap_mode="r")
+    return NutritionMatrix(stored["names"], values, match_threshold)
+
+
+def nutrition_matrix_from_env(ingredients_db: Dict[str, Dict[str, float]]) -> NutritionMatrix:
+    """
+    Matriz de nutrientes configurada por ambiente
+
+    Usa FOOD_TABLE_CSV quando definido (acrescido de ingredients_db) e,
+    caso contrário ou em erro de leitura, apenas ingredients_db.
+    """
+    threshold = float(os.getenv("FOOD_MATCH_THRESHOLD", "0.7"))
+    csv_path = os.getenv("FOOD_TABLE_CSV")
+    if csv_path:
+        try:
+            return load_food_table(
+                csv_path,
+                cache_dir=os.getenv("FOOD_TABLE_CACHE_DIR"),
+                extra=ingredients_db,
+                match_threshold=threshold,
+            )
+        except Exception as e:
+            print(f"Erro ao carregar tabela de alimentos {csv_path}: {str(e)}")
+    return NutritionMatrix.from_dict(ingredients_db, match_threshold=threshold)
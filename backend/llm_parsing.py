@@ -0,0 +1,151 @@
+import json
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel, ValidationError
+from metrics import llm_json_failures, llm_invalid_items
+
+
+def extract_json(text: str, opening: str = "{", endpoint: str = "unknown") -> Optional[Any]:
+    """
+    Extrai o primeiro valor JSON (objeto ou array) do texto gerado pelo LLM
+
+    Considera o trecho entre o primeiro caractere de abertura e o último de
+    fechamento correspondente. Falhas são contabilizadas nas métricas.
+
+    Args:
+        text: Resposta do LLM
+        opening: "{" para objetos ou "[" para arrays
+        endpoint: Nome lógico usado nas métricas
+
+    Returns:
+        O valor interpretado, ou None se não houver JSON válido
+    """
+    closing = "}" if opening == "{" else "]"
+    start = text.find(opening)
+    end = text.rfind(closing) + 1
+    if start >= 0 and end > start:
+        try:
+            return json.loads(text[start:end])
+        except ValueError:
+            pass
+    llm_json_failures.inc(endpoint=endpoint)
+    return None
+
+
+class JSONArrayStream:
+    """
+    Extrai incrementalmente os objetos de um array JSON gerado pelo LLM
+
+    O texto pode chegar em pedaços arbitrários (tokens do streaming). Cada objeto
+    de nível superior do primeiro array é devolvido assim que seu "}" chega,
+    sem esperar o fim da resposta. Texto antes do "[" é ignorado.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Objetos completos que não eram JSON válido
+        self.failures = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consome um pedaço de texto e retorna os objetos completados por ele"""
+        objects = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Entre objetos do array: só interessam "{" e o "]" final
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == "]":
+                    self._finished = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads("".join(self._buffer))
+                        if isinstance(value, dict):
+                            objects.append(value)
+                    except ValueError:
+                        self.failures += 1
+                    self._buffer = []
+        return objects
+
+
+def _validate(schema: Type[BaseModel], data: Any) -> Dict[str, Any]:
+    # Compatível com Pydantic 1 e 2
+    if hasattr(schema, "model_validate"):
+        return schema.model_validate(data).model_dump()
+    return schema.parse_obj(data).dict()
+
+
+def validate_object(data: Any, schema: Type[BaseModel], endpoint: str = "unknown") -> Optional[Dict[str, Any]]:
+    """Valida um objeto já extraído; retorna None (e conta nas métricas) se for inválido"""
+    if data is None:
+        return None
+    try:
+        return _validate(schema, data)
+    except ValidationError:
+        llm_invalid_items.inc(endpoint=endpoint)
+        return None
+
+
+def salvage_items(text: str, schema: Type[BaseModel], endpoint: str = "unknown") -> List[Dict[str, Any]]:
+    """
+    Recupera os itens válidos de um array JSON gerado pelo LLM
+
+    Cada objeto de nível superior é extraído e validado isoladamente: um item
+    malformado ou fora do esquema é descartado sem perder os demais, e texto
+    antes ou depois do array (ou um array truncado) não invalida a resposta.
+
+    Args:
+        text: Resposta do LLM
+        schema: Modelo Pydantic de cada item
+        endpoint: Nome lógico usado nas métricas
+
+    Returns:
+        Itens válidos, normalizados pelo esquema, na ordem em que apareceram
+    """
+    parser = JSONArrayStream()
+    objects = parser.feed(text)
+    if parser.failures:
+        llm_json_failures.inc(parser.failures, endpoint=endpoint)
+    if not objects and not parser.failures:
+        # Nenhum objeto encontrado: resposta sem array
+        llm_json_failures.inc(endpoint=endpoint)
+
+    items = []
+    for value in objects:
+        item = validate_object(value, schema, endpoint)
+        if item is not None:
+            items.append(item)
+    return items
@@ -0,0 +1,36 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+# Esquemas das respostas do LLM. Campos numéricos aceitam texto ("450") e são
+# convertidos; campos extras são descartados.
+
+
+class NutritionFacts(BaseModel):
+    calories: float = Field(..., ge=0)
+    protein: float = Field(0, ge=0)
+    carbs: float = Field(0, ge=0)
+    fat: float = Field(0, ge=0)
+
+
+class MealSuggestion(BaseModel):
+    """Refeição sugerida em /api/recommendations"""
+    id: Optional[int] = None
+    name: str = Field(..., min_length=1)
+    description: str = ""
+    ingredients: List[str] = []
+    tags: List[str] = []
+    nutrition: NutritionFacts
+    ai_explanation: Optional[str] = None
+    price: Optional[float] = Field(None, ge=0)
+    image: Optional[str] = None
+
+
+class MenuItem(BaseModel):
+    """Item de cardápio personalizado em /api/menu/custom"""
+    id: Optional[int] = None
+    name: str = Field(..., min_length=1)
+    description: str = ""
+    price: float = Field(..., gt=0)
+    tags: List[str] = []
+    nutrition: Optional[NutritionFacts] = None
+    image: Optional[str] = None
@@ -1,28 +1,88 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, Depends, HTTPException, status, Body, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Union
 from pydantic import BaseModel, Field
 import os
+import json
 import models
-from database import get_db, engine
-from ai_service import ai_service
+from datetime import datetime
+from contextlib import asynccontextmanager
+from database import get_async_db, engine, async_engine, AsyncSessionLocal
+from migrate import run_migrations
+from ai_service import get_ai_service, close_ai_service
+from readiness import Readiness, warm_up
+from scheduler import QueueDeadlineExceeded
+from cache import CacheMode
+from catalog_cache import meal_catalog, invalidate_on_write
+from order_queue import OrderWriteBehind, OrderValidationError, OrderQueueFull
+from metrics import REGISTRY, CONTENT_TYPE, http_request_duration, instrument_engine
 import random
+import time
+import uuid
+import asyncio
 
-# Carregar variáveis de ambiente
-load_dotenv()
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# Verificar se a chave de API do Groq está configurada
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    print("Aviso: Chave de API do Groq não encontrada no .env. Usando chave padrão.")
+# As variáveis do .env são carregadas uma única vez, em database.py
 
-# Criar as tabelas no banco de dados
-models.Base.metadata.create_all(bind=engine)
+# Tempo de cada consulta ao banco nas métricas
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
 
-app = FastAPI(title="DeliverIA API")
+# Escritas em refeições invalidam o cache do catálogo
+invalidate_on_write(meal_catalog, models.Meal)
+
+# Estado do aquecimento exposto em /ready
+readiness = Readiness.from_env()
+
+# Pedidos são confirmados ao entrar na fila e gravados em lotes
+order_queue = OrderWriteBehind.from_env(async_engine, meal_catalog)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Verificar se a chave de API do Groq está configurada
+    if not os.getenv("GROQ_API_KEY"):
+        print("Aviso: Chave de API do Groq não encontrada no .env. Usando chave padrão.")
+    
+    # O esquema é criado por um passo explícito (python migrate.py ou run.py);
+    # AUTO_MIGRATE=true mantém o comportamento antigo de migrar a cada startup
+    if os.getenv("AUTO_MIGRATE", "false").lower() == "true":
+        await asyncio.to_thread(run_migrations, engine)
+    
+    # Aquecimento em segundo plano: o servidor já aceita requisições e /ready
+    # só responde 200 quando banco, AIService e pool do Groq estiverem prontos
+    warm_up_task = asyncio.create_task(warm_up(readiness, async_engine, engine))
+    precompute_task = asyncio.create_task(precompute_recommendations())
+    yield
+    
+    warm_up_task.cancel()
+    precompute_task.cancel()
+    # Gravar os pedidos ainda na fila antes de fechar os pools do banco
+    await order_queue.close(timeout=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    # Fechar o pool de conexões com a API do Groq e os pools do banco
+    await close_ai_service()
+    await async_engine.dispose()
+    engine.dispose()
+
+async def precompute_recommendations():
+    """Worker que pré-calcula as recomendações mais pedidas nos períodos ociosos"""
+    # Mesma instância construída pelo aquecimento (fora do event loop)
+    try:
+        service = await asyncio.to_thread(get_ai_service)
+    except Exception as e:
+        print(f"Erro ao iniciar o pré-cálculo de recomendações: {str(e)}")
+        return
+    # Escritas em refeições descartam as recomendações já calculadas
+    meal_catalog.subscribe(service.precomputer.invalidate)
+    await service.precomputer.run(service.precompute_recommendations, AsyncSessionLocal)
+
+app = FastAPI(title="DeliverIA API", lifespan=lifespan)
 
 # Configuração CORS
 app.add_middleware(
@@ -33,6 +93,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Mede a latência de cada requisição pela rota (template), não pela URL"""
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code)
+        )
+
 # Modelos Pydantic
 class UserPreferences(BaseModel):
     cuisine_type: str = Field(..., description="Tipo de cozinha preferida")
@@ -53,27 +131,140 @@ class DeliveryPoint(BaseModel):
     order_id: int
     customer_name: str
 
+class StartingPoint(BaseModel):
+    lat: float
+    lng: float
+
 class RouteOptimizationRequest(BaseModel):
-    starting_point: Dict[str, float] = Field(..., description="Coordenadas do ponto de partida {lat, lng}")
+    starting_point: Optional[StartingPoint] = Field(None, description="Ponto de partida (padrão: primeiro ponto de entrega)")
     delivery_points: List[DeliveryPoint]
+    departure_time: Optional[datetime] = Field(None, description="Horário de saída do entregador (padrão: agora)")
+    annotate: bool = Field(False, description="Pedir ao Groq observações sobre a rota calculada")
+
+class Courier(BaseModel):
+    courier_id: str
+    lat: float = Field(..., description="Latitude do ponto de partida (cozinha)")
+    lng: float = Field(..., description="Longitude do ponto de partida (cozinha)")
+    capacity: int = Field(..., gt=0, description="Capacidade máxima (soma de size dos pedidos)")
+    kitchen_id: Optional[str] = Field(None, description="Cozinha à qual o entregador está vinculado")
+    available_at: Optional[datetime] = Field(None, description="Horário em que o entregador fica disponível")
+
+class FleetOrder(BaseModel):
+    order_id: int
+    address: str
+    lat: float
+    lng: float
+    customer_name: str
+    size: int = Field(1, gt=0, description="Espaço ocupado no baú do entregador")
+    kitchen_id: Optional[str] = Field(None, description="Cozinha que prepara o pedido")
+    ready_at: Optional[datetime] = Field(None, description="Horário em que o pedido fica pronto")
+    window_start: Optional[datetime] = Field(None, description="Início da janela de entrega prometida")
+    window_end: Optional[datetime] = Field(None, description="Fim da janela de entrega prometida")
+
+class FleetRoutingRequest(BaseModel):
+    couriers: List[Courier]
+    orders: List[FleetOrder]
+    departure_time: Optional[datetime] = Field(None, description="Horário de referência (padrão: agora)")
+    time_budget_ms: Optional[float] = Field(None, gt=0, le=30000, description="Tempo máximo de processamento")
+
+class NutritionBatchRequest(BaseModel):
+    recipes: List[Union[Dict[str, float], List[str]]] = Field(
+        ...,
+        description="Receitas como lista de ingredientes (100 g cada) ou mapa ingrediente -> gramas"
+    )
 
 # Adicionar modelos para o teste da API do Groq
 class GroqTestRequest(BaseModel):
     prompt: str = Field(..., description="Texto para enviar à API do Groq")
     model: str = Field("llama3-8b-8192", description="Modelo do Groq a ser usado")
     max_tokens: int = Field(1000, description="Número máximo de tokens na resposta")
+    stream: bool = Field(False, description="Transmitir os tokens via Server-Sent Events")
+
+class OrderItemRequest(BaseModel):
+    meal_id: int
+    quantity: int = Field(1, gt=0, description="Quantidade")
+    customization: Optional[Dict[str, Any]] = Field(None, description="Personalizações do item")
+
+class OrderCreateRequest(BaseModel):
+    user_id: int
+    delivery_address: str
+    payment_method: str = Field("pix", description="pix, credit_card, etc")
+    items: List[OrderItemRequest]
+    idempotency_key: Optional[str] = Field(None, description="Chave para reenvio seguro (ou cabeçalho Idempotency-Key)")
+
+class OrderBulkRequest(BaseModel):
+    orders: List[OrderCreateRequest]
 
 class CustomMenuRequest(BaseModel):
     preferences: str = Field(..., description="Preferências alimentares do usuário")
     item_count: int = Field(4, description="Número de itens a serem gerados")
+    stream: bool = Field(False, description="Transmitir cada item via Server-Sent Events assim que gerado")
+
+def _json_bytes(content: Any) -> bytes:
+    """Serializa para JSON com orjson quando disponível"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+def _sse_event(event: str, data: Any) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _enrich_menu_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Garante que o item de cardápio tenha todos os campos usados pela UI"""
+    # Garantir que cada item tenha todos os campos necessários
+    if "tags" not in item or not item["tags"]:
+        item["tags"] = ["Personalizado"]
+    
+    # Garantir que cada refeição tenha um preço apropriado
+    if not item.get("price"):
+        item["price"] = round(25 + random.random() * 20, 2)
+    
+    # Garantir que cada refeição tenha informações nutricionais completas
+    if "nutrition" not in item or not isinstance(item["nutrition"], dict):
+        item["nutrition"] = {
+            "calories": random.randint(300, 600),
+            "protein": random.randint(15, 35),
+            "carbs": random.randint(20, 50),
+            "fat": random.randint(5, 20)
+        }
+    
+    # Adicionar imagem de placeholder se necessário
+    if not item.get("image"):
+        img_query = item["name"].lower().replace(" ", "-")
+        item["image"] = f"https://source.unsplash.com/random/800x600/?food-{img_query}"
+    return item
 
 @app.get("/")
 async def root():
     return {"message": "Bem-vindo à API do DeliverIA"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 quando banco, AIService e pool do Groq estão aquecidos, 503 antes disso
+    """
+    report = readiness.report()
+    status_code = status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content=report)
+
 # Endpoints de recomendação de IA
 @app.post("/api/recommendations", response_model=List[Dict[str, Any]])
-async def get_meal_recommendations(request: MealRecommendationRequest):
+async def get_meal_recommendations(
+    request: MealRecommendationRequest,
+    cache: CacheMode = Query("use", description="Controle do cache: use, bypass ou refresh"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Gera recomendações de refeições personalizadas usando IA
     """
@@ -82,10 +273,12 @@ async def get_meal_recommendations(request: MealRecommendationRequest):
         preferences_dict = request.preferences.dict()
         
         # Chamar o serviço de IA
-        recommendations = ai_service.get_meal_recommendations(
+        recommendations = await get_ai_service().get_meal_recommendations(
             preferences=preferences_dict,
             restrictions=request.dietary_restrictions,
-            calories_range=request.calories_range
+            calories_range=request.calories_range,
+            cache_mode=cache,
+            db=db
         )
         
         return recommendations
@@ -102,16 +295,37 @@ async def test_groq_api(request: GroqTestRequest):
     Testa a API do Groq com um prompt fornecido
     """
     try:
-        if not ai_service.groq_client:
+        service = get_ai_service()
+        groq_client = service.groq_client
+        # Chamadas de teste entram na fila do agendador como segundo plano
+        priority = service.priorities["groq_test"]
+        if not groq_client:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cliente Groq não está configurado"
             )
         
-        response = ai_service.groq_client.generate_text(
+        if request.stream:
+            async def token_events():
+                try:
+                    async for token in groq_client.astream_text(
+                        prompt=request.prompt,
+                        model=request.model,
+                        max_tokens=request.max_tokens,
+                        priority=priority
+                    ):
+                        yield _sse_event("token", {"text": token})
+                    yield _sse_event("done", {})
+                except Exception as e:
+                    yield _sse_event("error", {"detail": f"Erro ao chamar a API do Groq: {str(e)}"})
+            
+            return _sse_response(token_events())
+        
+        response = await groq_client.agenerate_text(
             prompt=request.prompt,
             model=request.model,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            priority=priority
         )
         
         if not response:
@@ -123,6 +337,11 @@ async def test_groq_api(request: GroqTestRequest):
         return {"response": response}
     except HTTPException:
         raise
+    except QueueDeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -131,14 +350,33 @@ async def test_groq_api(request: GroqTestRequest):
 
 # Endpoint para gerar cardápio personalizado
 @app.post("/api/menu/custom")
-async def generate_custom_menu(request: CustomMenuRequest):
+async def generate_custom_menu(
+    request: CustomMenuRequest,
+    cache: CacheMode = Query("use", description="Controle do cache: use, bypass ou refresh")
+):
     """
     Gera um cardápio personalizado com base nas preferências do usuário
     """
+    if request.stream:
+        async def menu_events():
+            try:
+                async for item in get_ai_service().stream_custom_menu(
+                    user_preferences=request.preferences,
+                    item_count=request.item_count,
+                    cache_mode=cache
+                ):
+                    yield _sse_event("item", _enrich_menu_item(item))
+                yield _sse_event("done", {})
+            except Exception as e:
+                yield _sse_event("error", {"detail": f"Erro ao gerar cardápio personalizado: {str(e)}"})
+        
+        return _sse_response(menu_events())
+    
     try:
-        menu_items = ai_service.generate_custom_menu(
+        menu_items = await get_ai_service().generate_custom_menu(
             user_preferences=request.preferences,
-            item_count=request.item_count
+            item_count=request.item_count,
+            cache_mode=cache
         )
         
         if not menu_items:
@@ -149,27 +387,7 @@ async def generate_custom_menu(request: CustomMenuRequest):
         
         # Enriquecer os itens com alguns metadados adicionais para melhorar a UI
         for item in menu_items:
-            # Garantir que cada item tenha todos os campos necessários
-            if "tags" not in item or not item["tags"]:
-                item["tags"] = ["Personalizado"]
-            
-            # Garantir que cada refeição tenha um preço apropriado
-            if not item.get("price"):
-                item["price"] = round(25 + random.random() * 20, 2)
-            
-            # Garantir que cada refeição tenha informações nutricionais completas
-            if "nutrition" not in item or not isinstance(item["nutrition"], dict):
-                item["nutrition"] = {
-                    "calories": random.randint(300, 600),
-                    "protein": random.randint(15, 35),
-                    "carbs": random.randint(20, 50),
-                    "fat": random.randint(5, 20)
-                }
-            
-            # Adicionar imagem de placeholder se necessário
-            if not item.get("image"):
-                img_query = item["name"].lower().replace(" ", "-")
-                item["image"] = f"https://source.unsplash.com/random/800x600/?food-{img_query}"
+            _enrich_menu_item(item)
         
         return menu_items
     except Exception as e:
@@ -179,12 +397,15 @@ async def generate_custom_menu(request: CustomMenuRequest):
         )
 
 @app.post("/api/nutrition/analyze")
-async def analyze_nutritional_data(ingredients: List[str] = Body(...)):
+async def analyze_nutritional_data(
+    ingredients: List[str] = Body(...),
+    cache: CacheMode = Query("use", description="Controle do cache: use, bypass ou refresh")
+):
     """
     Analisa os dados nutricionais de uma lista de ingredientes
     """
     try:
-        nutrition_data = ai_service.analyze_nutritional_data(ingredients)
+        nutrition_data = await get_ai_service().analyze_nutritional_data(ingredients, cache_mode=cache)
         return nutrition_data
     except Exception as e:
         raise HTTPException(
@@ -192,19 +413,36 @@ async def analyze_nutritional_data(ingredients: List[str] = Body(...)):
             detail=f"Erro ao analisar dados nutricionais: {str(e)}"
         )
 
+@app.post("/api/nutrition/analyze-batch")
+async def analyze_nutrition_batch(request: NutritionBatchRequest):
+    """
+    Analisa os dados nutricionais de várias receitas em uma única chamada
+    """
+    try:
+        results = await get_ai_service().analyze_nutrition_batch(request.recipes)
+        return {"results": results, "count": len(results)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao analisar lote de receitas: {str(e)}"
+        )
+
 @app.post("/api/delivery/optimize-route")
 async def optimize_delivery_route(request: RouteOptimizationRequest):
     """
     Otimiza a rota de entrega para múltiplos pontos
     """
     try:
-        optimized_route = ai_service.optimize_delivery_route(
-            request.delivery_points
+        result = await get_ai_service().optimize_delivery_route(
+            [point.dict() for point in request.delivery_points],
+            starting_point=request.starting_point.dict() if request.starting_point else None,
+            departure_time=request.departure_time,
+            annotate=request.annotate
         )
         
         return {
             "starting_point": request.starting_point,
-            "optimized_route": optimized_route
+            **result
         }
     except Exception as e:
         raise HTTPException(
@@ -212,24 +450,195 @@ async def optimize_delivery_route(request: RouteOptimizationRequest):
             detail=f"Erro ao otimizar rota: {str(e)}"
         )
 
+@app.post("/api/delivery/optimize-fleet")
+async def optimize_fleet_routes(request: FleetRoutingRequest):
+    """
+    Distribui os pedidos entre vários entregadores respeitando capacidade e janelas de entrega
+    """
+    try:
+        return await get_ai_service().optimize_fleet_routes(
+            couriers=[courier.dict() for courier in request.couriers],
+            orders=[order.dict() for order in request.orders],
+            departure_time=request.departure_time,
+            time_budget_ms=request.time_budget_ms
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao otimizar rotas da frota: {str(e)}"
+        )
+
+# Monitoramento do serviço de IA
+@app.get("/api/ai/stats")
+async def get_ai_stats():
+    """
+    Retorna estatísticas do serviço de IA (cache, etc)
+    """
+    return {**get_ai_service().stats(), "catalog_cache": meal_catalog.stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Métricas no formato de exposição do Prometheus
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.delete("/api/ai/cache")
+async def clear_ai_cache(endpoint: Optional[str] = Query(None, description="Endpoint a limpar (nutrition, recommendations, menu)")):
+    """
+    Limpa o cache de respostas do LLM
+    """
+    await get_ai_service().invalidate_cache(endpoint)
+    return {"status": "cleared", "endpoint": endpoint}
+
 # Endpoints CRUD básicos
+# Campos que podem ser projetados na listagem de refeições
+MEAL_FIELDS = [column.name for column in models.Meal.__table__.columns]
+
 @app.get("/api/meals")
-async def get_meals(db: Session = Depends(get_db)):
+async def get_meals(
+    after_id: Optional[int] = Query(None, description="Cursor: retorna refeições com id maior que este"),
+    limit: int = Query(50, ge=1, le=200, description="Número máximo de refeições"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por vírgula (ex: id,name,price)"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Retorna todas as refeições disponíveis
+    Retorna as refeições disponíveis com paginação por cursor (keyset)
+    
+    O próximo cursor vem no cabeçalho X-Next-Cursor (ausente na última página).
+    As respostas são servidas do cache do catálogo e suportam ETag/If-None-Match.
     """
-    meals = db.query(models.Meal).filter(models.Meal.is_available == True).all()
-    return meals
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in MEAL_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos inválidos: {', '.join(unknown)}"
+            )
+        # O id é sempre necessário para o cursor
+        if "id" not in selected:
+            selected.insert(0, "id")
+    else:
+        selected = MEAL_FIELDS
+    
+    # Validação de cache antes de qualquer acesso ao banco
+    version = meal_catalog.version
+    cache_key = f"meals:{after_id}:{limit}:{','.join(selected)}"
+    cached = meal_catalog.get(cache_key, version)
+    if cached is not None:
+        body, headers, etag = cached
+        if meal_catalog.matches(if_none_match, etag):
+            return _not_modified(etag)
+        return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag})
+    
+    query = select(*[getattr(models.Meal, field) for field in selected]).where(
+        models.Meal.is_available == True
+    )
+    if after_id is not None:
+        query = query.where(models.Meal.id > after_id)
+    rows = (await db.execute(query.order_by(models.Meal.id).limit(limit + 1))).all()
+    
+    meals = [dict(row._mapping) for row in rows[:limit]]
+    headers = {}
+    if len(rows) > limit:
+        headers["X-Next-Cursor"] = str(meals[-1]["id"])
+    
+    body = _json_bytes(meals)
+    etag = meal_catalog.set(cache_key, version, body, headers)
+    if meal_catalog.matches(if_none_match, etag):
+        return _not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag})
 
 @app.get("/api/meals/{meal_id}")
-async def get_meal(meal_id: int, db: Session = Depends(get_db)):
+async def get_meal(meal_id: int, if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
     """
-    Retorna detalhes de uma refeição específica
+    Retorna detalhes de uma refeição específica (com cache e ETag)
     """
-    meal = db.query(models.Meal).filter(models.Meal.id == meal_id).first()
+    version = meal_catalog.version
+    cache_key = f"meal:{meal_id}"
+    cached = meal_catalog.get(cache_key, version)
+    if cached is not None:
+        body, _, etag = cached
+        if meal_catalog.matches(if_none_match, etag):
+            return _not_modified(etag)
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    
+    meal = await db.get(models.Meal, meal_id)
     if not meal:
         raise HTTPException(status_code=404, detail="Refeição não encontrada")
-    return meal
+    
+    body = _json_bytes({field: getattr(meal, field) for field in MEAL_FIELDS})
+    etag = meal_catalog.set(cache_key, version, body)
+    if meal_catalog.matches(if_none_match, etag):
+        return _not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+# Pedidos
+@app.post("/api/orders", status_code=status.HTTP_202_ACCEPTED)
+async def create_order(request: OrderCreateRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    Valida o pedido e o confirma assim que entra na fila de gravação
+    
+    O order_id é preenchido após a gravação (consultar /api/orders/status/{idempotency_key}).
+    """
+    key = request.idempotency_key or idempotency_key or uuid.uuid4().hex
+    try:
+        return await order_queue.submit(key, request.dict())
+    except OrderValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except OrderQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+
+@app.post("/api/orders/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def import_orders(request: OrderBulkRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    Importa pedidos em massa pela mesma fila de gravação
+    
+    Pedidos sem chave própria usam "{Idempotency-Key}:{posição}", o que torna o
+    reenvio do lote inteiro seguro. Pedidos inválidos são listados em rejected
+    sem impedir os demais.
+    """
+    max_orders = int(os.getenv("ORDER_BULK_MAX_ORDERS", "5000"))
+    if len(request.orders) > max_orders:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo de {max_orders} pedidos por importação"
+        )
+    
+    accepted = []
+    rejected = []
+    for position, order in enumerate(request.orders):
+        if order.idempotency_key:
+            key = order.idempotency_key
+        elif idempotency_key:
+            key = f"{idempotency_key}:{position}"
+        else:
+            key = uuid.uuid4().hex
+        try:
+            accepted.append(await order_queue.submit(key, order.dict()))
+        except (OrderValidationError, OrderQueueFull) as e:
+            rejected.append({"index": position, "idempotency_key": key, "detail": str(e)})
+    
+    return {"accepted": accepted, "rejected": rejected}
+
+@app.get("/api/orders/status/{idempotency_key}")
+async def get_order_status(idempotency_key: str):
+    """
+    Situação do pedido pela chave de idempotência (queued, stored ou failed)
+    """
+    ack = await order_queue.status(idempotency_key)
+    if ack is None:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    return ack
+
+@app.get("/api/orders/queue")
+async def get_order_queue_stats():
+    """
+    Estatísticas da fila de gravação de pedidos
+    """
+    return order_queue.stats()
 
 # Pagamento com PIX (simulação)
 @app.post("/api/payment/pix")
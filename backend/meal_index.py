@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class MealIndex:
+    """
+    Índice do catálogo de refeições para o fallback de recomendações
+
+    Construído uma única vez no carregamento dos dados:
+    - máscara de bits por refeição com as restrições alimentares que ela viola
+    - calorias ordenadas para consultas de faixa por busca binária
+    - índice invertido ingrediente -> refeições para pontuar preferências
+    """
+
+    def __init__(self, meals: List[Dict[str, Any]], dietary_restrictions: Dict[str, List[str]]):
+        self.meals = meals
+        size = len(meals)
+
+        # Um bit por restrição; várias palavras de 64 bits se houver muitas restrições
+        self.restriction_bits = {name: bit for bit, name in enumerate(dietary_restrictions)}
+        self._words = max(1, (len(self.restriction_bits) + 63) // 64)
+        self.masks = np.zeros((size, self._words), dtype=np.uint64)
+
+        forbidden_by_ingredient: Dict[str, List[int]] = {}
+        for name, ingredients in dietary_restrictions.items():
+            for ingredient in ingredients:
+                forbidden_by_ingredient.setdefault(ingredient, []).append(self.restriction_bits[name])
+
+        postings: Dict[str, List[int]] = {}
+        for position, meal in enumerate(meals):
+            for ingredient in set(meal.get("ingredients", [])):
+                postings.setdefault(ingredient, []).append(position)
+                for bit in forbidden_by_ingredient.get(ingredient, []):
+                    self.masks[position, bit // 64] |= np.uint64(1 << (bit % 64))
+
+        self.ingredient_index = {
+            ingredient: np.array(positions, dtype=np.int64)
+            for ingredient, positions in postings.items()
+        }
+
+        calories = np.array([meal["nutrition"]["calories"] for meal in meals], dtype=np.float64)
+        self.calorie_order = np.argsort(calories, kind="stable")
+        self.sorted_calories = calories[self.calorie_order]
+
+    def restriction_mask(self, restrictions: Sequence[str]) -> np.ndarray:
+        """Converte uma lista de restrições na máscara de bits (restrições desconhecidas são ignoradas)"""
+        mask = np.zeros(self._words, dtype=np.uint64)
+        for restriction in restrictions:
+            bit = self.restriction_bits.get(restriction)
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def candidates(self, restrictions: Sequence[str], calories_range: Sequence[float]) -> np.ndarray:
+        """Posições das refeições na faixa de calorias que respeitam as restrições, na ordem do catálogo"""
+        min_cal, max_cal = calories_range
+        low = np.searchsorted(self.sorted_calories, min_cal, side="left")
+        high = np.searchsorted(self.sorted_calories, max_cal, side="right")
+        positions = np.sort(self.calorie_order[low:high])
+
+        mask = self.restriction_mask(restrictions)
+        if mask.any():
+            allowed = ~(self.masks[positions] & mask).any(axis=1)
+            positions = positions[allowed]
+        return positions
+
+    def recommend(self,
+                  restrictions: Sequence[str],
+                  calories_range: Sequence[float],
+                  preferred_ingredients: Optional[Sequence[str]] = None,
+                  limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Seleciona as refeições recomendadas
+
+        Args:
+            restrictions: Restrições alimentares do usuário
+            calories_range: Faixa de calorias [min, max]
+            preferred_ingredients: Ingredientes preferidos (ex: proteínas) para ordenar por relevância
+            limit: Número máximo de refeições
+
+        Returns:
+            Cópias das refeições selecionadas; com preferências, cada uma traz relevance_score
+        """
+        positions = self.candidates(restrictions, calories_range)
+
+        if preferred_ingredients:
+            scores = np.zeros(len(self.meals), dtype=np.int64)
+            for ingredient in set(preferred_ingredients):
+                postings = self.ingredient_index.get(ingredient)
+                if postings is not None:
+                    scores[postings] += 1
+            candidate_scores = scores[positions]
+            # Ordenação estável: empates mantêm a ordem do catálogo
+            ranked = np.argsort(-candidate_scores, kind="stable")[:limit]
+            selected = positions[ranked]
+            meals = []
+            for position in selected:
+                meal = dict(self.meals[position])
+                meal["relevance_score"] = int(scores[position])
+                meals.append(meal)
+            return meals
+
+        return [dict(self.meals[position]) for position in positions[:limit]]
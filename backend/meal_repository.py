@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import select, func, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+import models
+from name_index import fold_name
+
+
+def normalize_ingredient(name: str) -> str:
+    """
+    Nome canônico de um ingrediente (sem acentos, minúsculas, "_" e pontuação viram espaço)
+
+    Usado tanto ao gravar o catálogo quanto nos parâmetros das consultas, para
+    que "Salmão" no banco e "salmao" no mapa de restrições coincidam.
+    """
+    return fold_name(name)
+
+
+def recommendation_query(calories_range: Sequence[float],
+                         excluded_ingredients: Sequence[str] = (),
+                         preferred_ingredients: Sequence[str] = (),
+                         limit: int = 3):
+    """
+    Monta a consulta de recomendação executada pelo banco
+
+    Usa os índices de (is_available, calories) e de meal_ingredients. Refeições
+    com ingredientes excluídos são descartadas via NOT EXISTS e a relevância é o
+    número de ingredientes preferidos presentes na refeição.
+    """
+    min_cal, max_cal = calories_range
+    query = (
+        select(models.Meal)
+        .where(models.Meal.is_available == True, models.Meal.calories.between(min_cal, max_cal))
+        .options(selectinload(models.Meal.ingredient_items))
+    )
+
+    if excluded_ingredients:
+        forbidden = (
+            exists()
+            .where(models.meal_ingredients.c.meal_id == models.Meal.id)
+            .where(models.meal_ingredients.c.ingredient_id == models.Ingredient.id)
+            .where(models.Ingredient.name.in_(list(excluded_ingredients)))
+        )
+        query = query.where(~forbidden)
+
+    if preferred_ingredients:
+        score = (
+            select(func.count())
+            .select_from(models.meal_ingredients.join(models.Ingredient))
+            .where(models.meal_ingredients.c.meal_id == models.Meal.id)
+            .where(models.Ingredient.name.in_(list(preferred_ingredients)))
+            .scalar_subquery()
+        )
+        query = query.add_columns(score.label("relevance_score")).order_by(score.desc(), models.Meal.id)
+    else:
+        query = query.order_by(models.Meal.id)
+
+    return query.limit(limit)
+
+
+def meal_to_recommendation(meal: models.Meal) -> Dict[str, Any]:
+    """Converte uma refeição do banco para o formato usado pelas recomendações"""
+    return {
+        "id": meal.id,
+        "name": meal.name,
+        "description": meal.description or "",
+        "price": meal.price,
+        "image": meal.image_url,
+        "ingredients": [ingredient.name for ingredient in meal.ingredient_items],
+        "tags": [],
+        "nutrition": {
+            "calories": meal.calories,
+            "protein": meal.protein,
+            "carbs": meal.carbs,
+            "fat": meal.fat,
+        },
+    }
+
+
+async def has_structured_catalog(db: AsyncSession) -> bool:
+    """Indica se há refeições disponíveis com as colunas de nutrição preenchidas"""
+    query = select(models.Meal.id).where(
+        models.Meal.is_available == True, models.Meal.calories.isnot(None)
+    ).limit(1)
+    return (await db.execute(query)).first() is not None
+
+
+async def find_recommended_meals(db: AsyncSession,
+                                 calories_range: Sequence[float],
+                                 excluded_ingredients: Sequence[str] = (),
+                                 preferred_ingredients: Optional[Sequence[str]] = None,
+                                 limit: int = 3) -> List[Dict[str, Any]]:
+    """Executa a consulta de recomendação e devolve as refeições como dicionários"""
+    preferred = [normalize_ingredient(name) for name in preferred_ingredients or []]
+    query = recommendation_query(
+        calories_range,
+        excluded_ingredients=[normalize_ingredient(name) for name in excluded_ingredients],
+        preferred_ingredients=preferred,
+        limit=limit,
+    )
+    meals = []
+    for row in (await db.execute(query)).all():
+        meal = meal_to_recommendation(row[0])
+        if preferred:
+            meal["relevance_score"] = int(row[1])
+        meals.append(meal)
+    return meals
@@ -0,0 +1,288 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import event
+
+# Formato de exposição texto do Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico por combinação de labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Valor instantâneo (pode subir e descer) por combinação de labels"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos (contagens cumulativas só na exposição)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: contagem por bucket (+Inf no fim), soma e total
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager que observa a duração do bloco em segundos"""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "deliveria_http_request_duration_seconds",
+    "Duração das requisições HTTP por rota (até o envio dos cabeçalhos)",
+    ("method", "route", "status"),
+))
+
+llm_request_duration = REGISTRY.register(Histogram(
+    "deliveria_llm_request_duration_seconds",
+    "Duração das chamadas à API do Groq",
+    ("model", "mode", "status"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0),
+))
+
+llm_tokens = REGISTRY.register(Counter(
+    "deliveria_llm_tokens_total",
+    "Tokens consumidos nas chamadas ao Groq (prompt e completion)",
+    ("model", "kind"),
+))
+
+llm_json_failures = REGISTRY.register(Counter(
+    "deliveria_llm_json_failures_total",
+    "Respostas do LLM das quais não foi possível extrair JSON válido",
+    ("endpoint",),
+))
+
+llm_invalid_items = REGISTRY.register(Counter(
+    "deliveria_llm_invalid_items_total",
+    "Itens gerados pelo LLM descartados por não seguirem o esquema esperado",
+    ("endpoint",),
+))
+
+llm_followups = REGISTRY.register(Counter(
+    "deliveria_llm_followup_requests_total",
+    "Pedidos complementares ao LLM apenas para os itens faltantes ou inválidos",
+    ("endpoint",),
+))
+
+llm_queue_wait = REGISTRY.register(Histogram(
+    "deliveria_llm_queue_wait_seconds",
+    "Tempo de espera na fila do agendador antes de chamar o Groq",
+    ("priority",),
+))
+
+llm_queue_depth = REGISTRY.register(Gauge(
+    "deliveria_llm_queue_depth",
+    "Chamadas ao Groq aguardando na fila do agendador",
+    ("priority",),
+))
+
+llm_queue_timeouts = REGISTRY.register(Counter(
+    "deliveria_llm_queue_timeouts_total",
+    "Chamadas descartadas (fallback) por estourar o prazo na fila do agendador",
+    ("priority",),
+))
+
+llm_rate_limited = REGISTRY.register(Counter(
+    "deliveria_llm_rate_limited_total",
+    "Respostas 429 do Groq (reduzem a taxa do agendador)",
+))
+
+llm_batch_size = REGISTRY.register(Histogram(
+    "deliveria_llm_batch_size",
+    "Itens de requisições diferentes agrupados em uma única chamada ao Groq",
+    ("endpoint",),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+))
+
+ai_outcomes = REGISTRY.register(Counter(
+    "deliveria_ai_outcomes_total",
+    "Resultado de cada chamada do AIService (local, llm, cache ou motivo do fallback)",
+    ("endpoint", "outcome"),
+))
+
+ai_fallbacks = REGISTRY.register(Counter(
+    "deliveria_ai_fallbacks_total",
+    "Chamadas do AIService atendidas pelo caminho de fallback",
+    ("endpoint",),
+))
+
+order_queue_depth = REGISTRY.register(Gauge(
+    "deliveria_order_queue_depth",
+    "Pedidos confirmados aguardando gravação no banco",
+))
+
+order_flush_duration = REGISTRY.register(Histogram(
+    "deliveria_order_flush_duration_seconds",
+    "Duração da gravação de cada lote de pedidos (uma transação)",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+))
+
+order_flush_batch_size = REGISTRY.register(Histogram(
+    "deliveria_order_flush_batch_size",
+    "Pedidos gravados em cada lote",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+))
+
+orders_written = REGISTRY.register(Counter(
+    "deliveria_orders_written_total",
+    "Pedidos processados pela fila de gravação (stored, duplicate ou failed)",
+    ("outcome",),
+))
+
+db_query_duration = REGISTRY.register(Histogram(
+    "deliveria_db_query_duration_seconds",
+    "Duração das consultas ao banco por tipo de comando",
+    ("engine", "operation"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+))
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Mede o tempo de cada comando executado pelo engine (síncrono) do SQLAlchemy"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(time.perf_counter() - started, engine=name, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from metrics import llm_batch_size
+
+
+class MicroBatcher:
+    """
+    Junta itens enviados por requisições concorrentes em um único lote
+
+    O primeiro item abre uma janela de max_wait segundos; tudo que chegar nesse
+    intervalo (até max_items) é processado por uma única chamada ao handler.
+    Cada chamador recebe apenas o resultado do seu item, ou None quando o lote
+    falhar ou não trouxer resposta para ele (o chamador usa o fallback).
+    """
+
+    def __init__(self,
+                 handler: Callable[[List[Any]], Awaitable[List[Optional[Any]]]],
+                 name: str,
+                 max_wait: float = 0.01,
+                 max_items: int = 16):
+        self.handler = handler
+        self.name = name
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # O event loop guarda só uma referência fraca às tasks; sem esta, um
+        # lote em andamento pode ser coletado pelo garbage collector
+        self._tasks: Set[asyncio.Task] = set()
+        self.items = 0
+        self.batches = 0
+        self.missing = 0
+
+    async def submit(self, item: Any) -> Optional[Any]:
+        """
+        Adiciona um item ao próximo lote e aguarda o seu resultado
+
+        Args:
+            item: Entrada do handler
+
+        Returns:
+            Resultado do item ou None
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self.items += 1
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        # Chamadores cancelados enquanto aguardavam a janela não entram no lote
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        llm_batch_size.observe(len(batch), endpoint=self.name)
+
+        results: List[Optional[Any]] = []
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            print(f"Erro ao processar lote de {self.name}: {str(e)}")
+        finally:
+            # Resolve todos os chamadores, inclusive quando o lote é cancelado
+            for position, (_, future) in enumerate(batch):
+                result = results[position] if position < len(results) else None
+                if result is None:
+                    self.missing += 1
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "missing": self.missing,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_items": self.max_items,
+        }
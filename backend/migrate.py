@@ -0,0 +1,231 @@
+import json
+from typing import Any, Dict, List
+from sqlalchemy import inspect, text, select, or_, exists
+from sqlalchemy.orm import Session
+import models
+from database import engine
+from meal_repository import normalize_ingredient
+from cache import normalize_text
+
+# Colunas adicionadas a tabelas já existentes (create_all não altera tabelas)
+ADDED_COLUMNS = {
+    "meals": {
+        "calories": "FLOAT",
+        "protein": "FLOAT",
+        "carbs": "FLOAT",
+        "fat": "FLOAT",
+    },
+    "orders": {
+        "idempotency_key": "VARCHAR",
+    },
+}
+
+NUTRITION_FIELDS = ("calories", "protein", "carbs", "fat")
+
+
+def _load_json(value: Any, default: Any) -> Any:
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return default
+
+
+def _to_float(value: Any):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ingredient_names(raw: Any) -> List[str]:
+    """Aceita lista de nomes, lista de objetos com "name" ou texto separado por vírgulas"""
+    data = _load_json(raw, raw)
+    if isinstance(data, str):
+        data = data.split(",")
+    names = []
+    for item in data or []:
+        if isinstance(item, dict):
+            item = item.get("name")
+        if item:
+            name = normalize_ingredient(item)
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+def _add_missing_columns(connection):
+    inspector = inspect(connection)
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, ddl_type in columns.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+
+def _create_missing_indexes(connection):
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def normalize_ingredient_names(session: Session) -> int:
+    """
+    Regrava os nomes de ingredientes na forma de normalize_ingredient
+
+    Nomes gravados antes da remoção de acentos ("salmão", "batata_doce") são
+    renomeados; se a forma canônica já existir, as refeições passam a apontar
+    para o ingrediente existente e o duplicado é removido.
+
+    Returns:
+        Número de ingredientes renomeados ou mesclados
+    """
+    ingredients = session.scalars(select(models.Ingredient).order_by(models.Ingredient.id)).all()
+    by_name = {ingredient.name: ingredient for ingredient in ingredients}
+    changed = 0
+    for ingredient in ingredients:
+        name = normalize_ingredient(ingredient.name)
+        if name == ingredient.name:
+            continue
+        target = by_name.get(name)
+        if target is None:
+            by_name.pop(ingredient.name, None)
+            ingredient.name = name
+            by_name[name] = ingredient
+        else:
+            links = models.meal_ingredients
+            already_linked = select(links.c.meal_id).where(links.c.ingredient_id == target.id)
+            session.execute(
+                links.delete()
+                .where(links.c.ingredient_id == ingredient.id)
+                .where(links.c.meal_id.in_(already_linked))
+            )
+            session.execute(
+                links.update()
+                .where(links.c.ingredient_id == ingredient.id)
+                .values(ingredient_id=target.id)
+            )
+            by_name.pop(ingredient.name, None)
+            session.delete(ingredient)
+        changed += 1
+        # Grava cada troca antes da próxima (o nome é único)
+        session.flush()
+    session.commit()
+    return changed
+
+
+def backfill_meals(session: Session, batch_size: int = 500) -> int:
+    """
+    Preenche as colunas de nutrição e a tabela meal_ingredients a partir dos
+    campos JSON legados, em lotes por id
+
+    Returns:
+        Número de refeições atualizadas
+    """
+    has_ingredients = exists().where(models.meal_ingredients.c.meal_id == models.Meal.id)
+    pending = or_(
+        (models.Meal.calories.is_(None)) & (models.Meal.nutritional_info.isnot(None)),
+        (models.Meal.ingredients.isnot(None)) & ~has_ingredients,
+    )
+    ingredients_by_name = {
+        ingredient.name: ingredient
+        for ingredient in session.scalars(select(models.Ingredient))
+    }
+
+    updated = 0
+    last_id = 0
+    while True:
+        meals = session.scalars(
+            select(models.Meal)
+            .where(pending, models.Meal.id > last_id)
+            .order_by(models.Meal.id)
+            .limit(batch_size)
+        ).all()
+        if not meals:
+            break
+
+        for meal in meals:
+            nutrition = _load_json(meal.nutritional_info, {})
+            if isinstance(nutrition, dict):
+                for field in NUTRITION_FIELDS:
+                    if getattr(meal, field) is None:
+                        setattr(meal, field, _to_float(nutrition.get(field)))
+
+            if not meal.ingredient_items:
+                for name in _ingredient_names(meal.ingredients):
+                    ingredient = ingredients_by_name.get(name)
+                    if ingredient is None:
+                        ingredient = models.Ingredient(name=name)
+                        session.add(ingredient)
+                        ingredients_by_name[name] = ingredient
+                    meal.ingredient_items.append(ingredient)
+            updated += 1
+
+        last_id = meals[-1].id
+        session.commit()
+    return updated
+
+
+def backfill_user_restrictions(session: Session, batch_size: int = 500) -> int:
+    """
+    Preenche user_dietary_restrictions a partir de User.dietary_restrictions (JSON)
+
+    Returns:
+        Número de usuários atualizados
+    """
+    has_restrictions = exists().where(models.UserDietaryRestriction.user_id == models.User.id)
+    updated = 0
+    last_id = 0
+    while True:
+        users = session.scalars(
+            select(models.User)
+            .where(models.User.dietary_restrictions.isnot(None), ~has_restrictions, models.User.id > last_id)
+            .order_by(models.User.id)
+            .limit(batch_size)
+        ).all()
+        if not users:
+            break
+
+        for user in users:
+            restrictions = _load_json(user.dietary_restrictions, [])
+            if isinstance(restrictions, str):
+                restrictions = restrictions.split(",")
+            # Identificadores de restrição ("sem_gluten") mantêm o "_"
+            for restriction in {normalize_text(r) for r in restrictions or [] if r}:
+                user.restrictions.append(models.UserDietaryRestriction(restriction=restriction))
+            updated += 1
+
+        last_id = users[-1].id
+        session.commit()
+    return updated
+
+
+def run_migrations(bind=engine) -> Dict[str, int]:
+    """
+    Cria/atualiza o esquema e preenche as colunas estruturadas
+
+    Idempotente: pode ser executado a cada deploy. OrderItem.customization
+    passou a ser do tipo JSON, que no SQLite e no Postgres lê os mesmos
+    textos JSON já armazenados, então não precisa de conversão.
+    """
+    models.Base.metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        _add_missing_columns(connection)
+        _create_missing_indexes(connection)
+
+    with Session(bind=bind) as session:
+        normalize_ingredient_names(session)
+        return {
+            "meals": backfill_meals(session),
+            "users": backfill_user_restrictions(session),
+        }
+
+
+if __name__ == "__main__":
+    result = run_migrations()
+    print(f"Migração concluída: {result['meals']} refeições e {result['users']} usuários atualizados")
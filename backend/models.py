@@ -1,9 +1,17 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Index, Table, JSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+from database import Base
 
-Base = declarative_base()
+# Associação refeição <-> ingrediente
+meal_ingredients = Table(
+    "meal_ingredients",
+    Base.metadata,
+    Column("meal_id", Integer, ForeignKey("meals.id", ondelete="CASCADE"), primary_key=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id", ondelete="CASCADE"), primary_key=True),
+    # Busca de refeições por ingrediente (ex: excluir refeições com frango)
+    Index("ix_meal_ingredients_ingredient_meal", "ingredient_id", "meal_id"),
+)
 
 class User(Base):
     __tablename__ = "users"
@@ -13,24 +21,53 @@ class User(Base):
     hashed_password = Column(String)
     name = Column(String)
     is_active = Column(Boolean, default=True)
-    dietary_restrictions = Column(String)  # JSON string com restrições
+    dietary_restrictions = Column(String)  # JSON string com restrições (legado, ver restrictions)
     preferences = Column(String)  # JSON string com preferências
 
     orders = relationship("Order", back_populates="user")
+    restrictions = relationship("UserDietaryRestriction", back_populates="user", cascade="all, delete-orphan")
+
+class UserDietaryRestriction(Base):
+    __tablename__ = "user_dietary_restrictions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    restriction = Column(String, primary_key=True, index=True)  # vegano, sem_gluten, etc
+
+    user = relationship("User", back_populates="restrictions")
+
+class Ingredient(Base):
+    __tablename__ = "ingredients"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)  # nome normalizado (minúsculas)
+
+    meals = relationship("Meal", secondary=meal_ingredients, back_populates="ingredient_items")
 
 class Meal(Base):
     __tablename__ = "meals"
+    __table_args__ = (
+        # Listagem paginada de refeições disponíveis (WHERE is_available ORDER BY id)
+        Index("ix_meals_available_id", "is_available", "id"),
+        # Filtros de recomendação por faixa de calorias e proteína
+        Index("ix_meals_available_calories", "is_available", "calories"),
+        Index("ix_meals_available_protein", "is_available", "protein"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String)
     price = Column(Float)
-    nutritional_info = Column(String)  # JSON string com informações nutricionais
-    ingredients = Column(String)  # JSON string com ingredientes
+    nutritional_info = Column(String)  # JSON string com informações nutricionais (legado)
+    ingredients = Column(String)  # JSON string com ingredientes (legado, ver ingredient_items)
     image_url = Column(String)
     is_available = Column(Boolean, default=True)
+    calories = Column(Float)
+    protein = Column(Float)
+    carbs = Column(Float)
+    fat = Column(Float)
 
     order_items = relationship("OrderItem", back_populates="meal")
+    ingredient_items = relationship("Ingredient", secondary=meal_ingredients, back_populates="meals")
 
 class Order(Base):
     __tablename__ = "orders"
@@ -43,6 +80,7 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     payment_method = Column(String)  # pix, credit_card, etc
     payment_status = Column(String)  # pending, paid, failed
+    idempotency_key = Column(String, unique=True, index=True)  # chave enviada pelo cliente na criação
 
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
@@ -55,7 +93,16 @@ class OrderItem(Base):
     meal_id = Column(Integer, ForeignKey("meals.id"))
     quantity = Column(Integer)
     price = Column(Float)
-    customization = Column(String)  # JSON string com personalizações
+    customization = Column(JSON)  # personalizações
 
     order = relationship("Order", back_populates="items")
-    meal = relationship("Meal", back_populates="order_items") 
\ No newline at end of file
+    meal = relationship("Meal", back_populates="order_items") 
+
+# Recomendações pré-calculadas para as tuplas de preferências mais pedidas (ver precompute.py)
+class RecommendationSnapshot(Base):
+    __tablename__ = "recommendation_snapshots"
+
+    key = Column(String, primary_key=True)  # hash da tupla normalizada
+    params = Column(JSON)  # preferências, restrições, faixa de calorias e limite normalizados
+    recommendations = Column(JSON)
+    computed_at = Column(Float, index=True)  # time.time() do cálculo
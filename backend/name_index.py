@@ -0,0 +1,128 @@
+import re
+import unicodedata
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def fold_name(name: str) -> str:
+    """
+    Forma canônica de um nome de alimento para comparação
+
+    Remove acentos, usa minúsculas e troca pontuação, "_" e espaços repetidos
+    por um único espaço ("Grão-de-bico" e "grao_de_bico" viram "grao de bico").
+    """
+    decomposed = unicodedata.normalize("NFKD", str(name))
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", without_accents.lower()).split())
+
+
+def name_keys(name: str) -> List[str]:
+    """
+    Chaves indexadas para um nome
+
+    Tabelas de composição descrevem o alimento como "Feijão, carioca, cozido";
+    além do nome completo, o termo principal (antes da primeira vírgula) também
+    é indexado para que "feijão" seja resolvido.
+    """
+    keys = [fold_name(name)]
+    head = fold_name(str(name).split(",", 1)[0])
+    if head and head not in keys:
+        keys.append(head)
+    return [key for key in keys if key]
+
+
+def trigrams(folded: str) -> List[str]:
+    """Trigramas do nome com preenchimento nas bordas (prefixos pesam mais)"""
+    padded = f"  {folded} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class TrigramIndex:
+    """
+    Índice de nomes para resolução aproximada
+
+    Chaves idênticas após fold_name são resolvidas por dicionário. As demais
+    são comparadas pelo coeficiente de Dice entre os conjuntos de trigramas,
+    contando as interseções de todas as chaves de uma vez sobre as listas
+    invertidas trigrama -> chaves. Se nenhuma passar do limiar, procura o
+    maior trecho de palavras do nome que seja uma chave exata ("peito de
+    frango" -> "frango").
+    """
+
+    def __init__(self, names: Sequence[str], threshold: float = 0.7, memo_size: int = 10000):
+        self.threshold = threshold
+        self.memo_size = memo_size
+        self._memo: Dict[str, Optional[int]] = {}
+        self.exact: Dict[str, int] = {}
+
+        owners: List[int] = []
+        sizes: List[int] = []
+        lengths: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        for position, name in enumerate(names):
+            for key in name_keys(name):
+                # Em chaves duplicadas prevalece a primeira ocorrência
+                self.exact.setdefault(key, position)
+                entry = len(owners)
+                grams = trigrams(key)
+                owners.append(position)
+                sizes.append(len(grams))
+                lengths.append(len(key))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(entry)
+
+        self.owners = np.array(owners, dtype=np.int32)
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self.lengths = np.array(lengths, dtype=np.int32)
+        self.postings = {gram: np.array(entries, dtype=np.int32) for gram, entries in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+    def match(self, name: str) -> Tuple[Optional[int], float]:
+        """
+        Encontra o nome mais parecido
+
+        Returns:
+            Posição do melhor candidato (None se abaixo do limiar) e sua similaridade
+        """
+        folded = fold_name(name)
+        position = self.exact.get(folded)
+        if position is not None:
+            return position, 1.0
+        if not folded or not len(self):
+            return None, 0.0
+
+        grams = trigrams(folded)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return None, 0.0
+
+        shared = np.bincount(np.concatenate(lists), minlength=len(self))
+        scores = 2.0 * shared / (len(grams) + self.sizes)
+        best = float(scores.max())
+        if best < self.threshold:
+            return self._match_phrase(folded), best
+        # Empate: prefere a chave mais curta (a mais genérica)
+        tied = np.flatnonzero(scores == best)
+        entry = tied[np.argmin(self.lengths[tied])]
+        return int(self.owners[entry]), best
+
+    def _match_phrase(self, folded: str) -> Optional[int]:
+        words = folded.split()
+        for size in range(len(words) - 1, 0, -1):
+            for start in range(len(words) - size + 1):
+                position = self.exact.get(" ".join(words[start:start + size]))
+                if position is not None:
+                    return position
+        return None
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Posição do nome resolvido, com memória dos nomes já consultados"""
+        if name in self._memo:
+            return self._memo[name]
+        position, _ = self.match(name)
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[name] = position
+        return position
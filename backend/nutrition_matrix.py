@@ -0,0 +1,108 @@
+import numpy as np
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from name_index import TrigramIndex
+
+# Colunas da matriz, na ordem usada em todos os resultados
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+
+# Os valores da tabela de ingredientes são por porção de referência de 100 g
+REFERENCE_GRAMS = 100.0
+
+# Uma receita é uma lista de ingredientes (100 g cada) ou um mapa ingrediente -> gramas
+Recipe = Union[Sequence[str], Mapping[str, float]]
+
+
+class NutritionMatrix:
+    """
+    Tabela de ingredientes como matriz NumPy (ingredientes x nutrientes)
+
+    Cada receita de um lote vira um vetor esparso de quantidades (índice do
+    ingrediente, fator em relação a 100 g). Os totais do lote inteiro saem de
+    um único produto esparso-denso, sem laços em Python por nutriente.
+
+    Os nomes são resolvidos pelo TrigramIndex (sem acentos e por similaridade
+    de trigramas). values pode ser um array mapeado em memória (float32); os
+    totais são sempre calculados em float64.
+    """
+
+    def __init__(self, names: Sequence[str], values: np.ndarray, match_threshold: float = 0.7):
+        self.names = list(names)
+        self.values = values if isinstance(values, np.ndarray) else np.asarray(values, dtype=np.float64)
+        self.index = TrigramIndex(self.names, threshold=match_threshold)
+
+    @classmethod
+    def from_dict(cls, ingredients_db: Dict[str, Dict[str, float]], match_threshold: float = 0.7) -> "NutritionMatrix":
+        names = list(ingredients_db)
+        values = np.array(
+            [[float(ingredients_db[name].get(nutrient, 0) or 0) for nutrient in NUTRIENTS] for name in names],
+            dtype=np.float64,
+        ).reshape(len(names), len(NUTRIENTS))
+        return cls(names, values, match_threshold)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Posição do ingrediente na tabela (None se não houver nome parecido o suficiente)"""
+        return self.index.resolve(name)
+
+    def unresolved(self, names: Sequence[str]) -> List[str]:
+        """Ingredientes que não puderam ser resolvidos localmente"""
+        return [name for name in names if self.resolve(name) is None]
+
+    def _quantity_vectors(self, recipes: Sequence[Recipe]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[List[str]]]:
+        """Converte as receitas em coordenadas (receita, ingrediente, fator) e ingredientes desconhecidos"""
+        rows: List[int] = []
+        columns: List[int] = []
+        factors: List[float] = []
+        unknown: List[List[str]] = []
+
+        for row, recipe in enumerate(recipes):
+            missing = []
+            if isinstance(recipe, Mapping):
+                items = recipe.items()
+            else:
+                items = ((name, REFERENCE_GRAMS) for name in recipe)
+            for name, grams in items:
+                position = self.resolve(name)
+                if position is None:
+                    missing.append(name)
+                    continue
+                rows.append(row)
+                columns.append(position)
+                factors.append(float(grams) / REFERENCE_GRAMS)
+            unknown.append(missing)
+
+        return (
+            np.array(rows, dtype=np.int64),
+            np.array(columns, dtype=np.int64),
+            np.array(factors, dtype=np.float64),
+            unknown,
+        )
+
+    def totals(self, recipes: Sequence[Recipe]) -> Tuple[np.ndarray, List[List[str]]]:
+        """
+        Calcula os totais nutricionais de um lote de receitas
+
+        Args:
+            recipes: Receitas como lista de ingredientes (100 g cada) ou mapa ingrediente -> gramas
+
+        Returns:
+            Matriz (receitas x nutrientes) com os totais e, por receita, os ingredientes não encontrados
+        """
+        rows, columns, factors, unknown = self._quantity_vectors(recipes)
+        result = np.zeros((len(recipes), len(NUTRIENTS)), dtype=np.float64)
+        if rows.size:
+            # Produto esparso-denso: cada entrada contribui fator * linha do ingrediente
+            # e as contribuições são somadas por receita
+            np.add.at(result, rows, factors[:, None] * self.values[columns].astype(np.float64))
+        return result, unknown
+
+    def analyze(self, recipes: Sequence[Recipe]) -> List[Dict[str, Any]]:
+        """Totais do lote no formato de resposta da API (valores arredondados em 2 casas)"""
+        result, unknown = self.totals(recipes)
+        rounded = np.round(result, 2).tolist()
+        return [
+            {**dict(zip(NUTRIENTS, values)), "unknown_ingredients": missing}
+            for values, missing in zip(rounded, unknown)
+        ]
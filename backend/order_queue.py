@@ -0,0 +1,394 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+import models
+from cache import TTLCache
+from catalog_cache import CatalogCache
+from metrics import order_queue_depth, order_flush_duration, order_flush_batch_size, orders_written
+
+# Estados do pedido informados ao cliente
+QUEUED = "queued"
+STORED = "stored"
+FAILED = "failed"
+
+ORDERS = models.Order.__table__
+ORDER_ITEMS = models.OrderItem.__table__
+
+
+class OrderValidationError(Exception):
+    """Pedido recusado na validação (refeição inexistente, sem itens, etc)"""
+
+
+class OrderQueueFull(Exception):
+    """A fila de gravação atingiu o limite; o cliente deve tentar de novo depois"""
+
+
+class MealPrices:
+    """
+    Preços das refeições disponíveis, mantidos em memória para validar pedidos
+
+    Recarregados quando a versão do catálogo muda (escrita em refeições neste
+    processo ou expiração do TTL do catálogo).
+    """
+
+    def __init__(self, catalog: CatalogCache):
+        self.catalog = catalog
+        self._prices: Dict[int, float] = {}
+        self._version: Optional[int] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self, engine: AsyncEngine) -> Dict[int, float]:
+        version = self.catalog.version
+        if version == self._version:
+            return self._prices
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if version != self._version:
+                query = select(models.Meal.id, models.Meal.price).where(models.Meal.is_available == True)
+                async with engine.connect() as connection:
+                    rows = (await connection.execute(query)).all()
+                self._prices = {meal_id: price or 0.0 for meal_id, price in rows}
+                self._version = version
+        return self._prices
+
+
+class UserIds:
+    """
+    Ids dos usuários ativos, mantidos em memória para validar pedidos
+
+    O conjunto é recarregado a cada ttl_seconds; um id fora dele é conferido
+    no banco (usuário cadastrado depois da última carga) antes de recusar o pedido.
+    """
+
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self._ids: set = set()
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _reload(self, engine: AsyncEngine):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return
+            query = select(models.User.id).where(models.User.is_active.isnot(False))
+            async with engine.connect() as connection:
+                self._ids = set((await connection.execute(query)).scalars().all())
+            self._loaded_at = time.monotonic()
+
+    async def exists(self, engine: AsyncEngine, user_id: int) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl_seconds:
+            await self._reload(engine)
+        if user_id in self._ids:
+            return True
+        query = select(models.User.id).where(models.User.id == user_id, models.User.is_active.isnot(False))
+        async with engine.connect() as connection:
+            found = (await connection.execute(query)).first() is not None
+        if found:
+            self._ids.add(user_id)
+        return found
+
+
+def build_order(order: Dict[str, Any], prices: Dict[int, float], key: str) -> Dict[str, Any]:
+    """
+    Valida o pedido em memória e monta as linhas de orders e order_items
+
+    Args:
+        order: Pedido recebido (user_id, delivery_address, payment_method, items)
+        prices: Preço de cada refeição disponível
+        key: Chave de idempotência do pedido
+
+    Returns:
+        {"key", "order": linha de orders, "items": linhas de order_items sem order_id}
+
+    Raises:
+        OrderValidationError: Se o pedido não tiver itens ou citar refeição indisponível
+    """
+    items = order.get("items") or []
+    if not items:
+        raise OrderValidationError("O pedido precisa ter ao menos um item")
+
+    rows = []
+    total = 0.0
+    for item in items:
+        meal_id = item["meal_id"]
+        if meal_id not in prices:
+            raise OrderValidationError(f"Refeição {meal_id} não encontrada ou indisponível")
+        quantity = item.get("quantity") or 1
+        price = prices[meal_id]
+        total += price * quantity
+        rows.append({
+            "meal_id": meal_id,
+            "quantity": quantity,
+            "price": price,
+            "customization": item.get("customization"),
+        })
+
+    return {
+        "key": key,
+        "order": {
+            "user_id": order.get("user_id"),
+            "status": "pending",
+            "total_price": round(total, 2),
+            "delivery_address": order.get("delivery_address"),
+            "created_at": datetime.utcnow(),
+            "payment_method": order.get("payment_method"),
+            "payment_status": "pending",
+            "idempotency_key": key,
+        },
+        "items": rows,
+    }
+
+
+class OrderWriteBehind:
+    """
+    Fila de gravação (write-behind) dos pedidos
+
+    Os pedidos são validados em memória e confirmados ao cliente assim que
+    entram na fila, com a chave de idempotência. Uma task grava a fila em
+    lotes: até batch_size pedidos, ou o que chegar em flush_interval segundos,
+    com um INSERT em massa (executemany) em orders e outro em order_items, em
+    uma única transação por lote.
+
+    Reenvios com a mesma chave devolvem a confirmação original; chaves que já
+    estão no banco (ex: reenvio após reinício ou por outro worker) são
+    descartadas na gravação pelo índice único de orders.idempotency_key.
+    Pedidos ainda na fila se perdem se o processo morrer sem encerramento
+    gracioso; close() grava o que restar.
+    """
+
+    def __init__(self,
+                 engine: AsyncEngine,
+                 catalog: CatalogCache,
+                 batch_size: int = 500,
+                 flush_interval: float = 0.05,
+                 max_pending: int = 10000,
+                 max_retries: int = 5,
+                 ack_ttl: float = 86400):
+        self.engine = engine
+        self.prices = MealPrices(catalog)
+        self.users = UserIds(float(os.getenv("ORDER_USER_CACHE_TTL_SECONDS", "60")))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.ack_ttl = ack_ttl
+
+        self._acks = TTLCache(max(max_pending * 10, 1024))
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._pending = 0
+        self._closed = False
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.stored = 0
+        self.failed = 0
+        self.batches = 0
+
+    @classmethod
+    def from_env(cls, engine: AsyncEngine, catalog: CatalogCache) -> "OrderWriteBehind":
+        """Cria a fila a partir das variáveis ORDER_*"""
+        return cls(
+            engine,
+            catalog,
+            batch_size=int(os.getenv("ORDER_FLUSH_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("ORDER_FLUSH_INTERVAL_MS", "50")) / 1000,
+            max_pending=int(os.getenv("ORDER_QUEUE_MAX_SIZE", "10000")),
+            max_retries=int(os.getenv("ORDER_FLUSH_MAX_RETRIES", "5")),
+            ack_ttl=float(os.getenv("ORDER_IDEMPOTENCY_TTL_SECONDS", "86400")),
+        )
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._run())
+
+    async def submit(self, key: str, order: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Valida o pedido e o coloca na fila de gravação
+
+        Args:
+            key: Chave de idempotência
+            order: Pedido recebido
+
+        Returns:
+            Confirmação: idempotency_key, status, order_id (após a gravação) e total_price
+
+        Raises:
+            OrderValidationError: Pedido inválido
+            OrderQueueFull: Fila cheia ou em encerramento
+        """
+        ack = self._acks.get(key)
+        # Pedido cuja gravação falhou pode ser reenviado com a mesma chave
+        if ack is not None and ack["status"] != FAILED:
+            self.duplicates += 1
+            return dict(ack)
+        if self._closed or self._pending >= self.max_pending:
+            raise OrderQueueFull("Fila de pedidos cheia, tente novamente em instantes")
+
+        user_id = order.get("user_id")
+        if user_id is None or not await self.users.exists(self.engine, user_id):
+            raise OrderValidationError(f"Usuário {user_id} não encontrado ou inativo")
+        entry = build_order(order, await self.prices.get(self.engine), key)
+        ack = self._acks.get(key)
+        if ack is not None and ack["status"] != FAILED:
+            # Mesmo pedido aceito enquanto os preços eram carregados
+            self.duplicates += 1
+            return dict(ack)
+
+        ack = {"idempotency_key": key, "status": QUEUED, "order_id": None, "total_price": entry["order"]["total_price"]}
+        self._acks.set(key, ack, self.ack_ttl)
+        self._ensure_writer()
+        self._queue.put_nowait((entry, ack))
+        self._pending += 1
+        self.accepted += 1
+        order_queue_depth.set(self._pending)
+        return dict(ack)
+
+    async def status(self, key: str) -> Optional[Dict[str, Any]]:
+        """Confirmação de um pedido pela chave (consulta o banco se não estiver em memória)"""
+        ack = self._acks.get(key)
+        if ack is not None:
+            return dict(ack)
+        query = select(ORDERS.c.id, ORDERS.c.total_price).where(ORDERS.c.idempotency_key == key)
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(query)).first()
+        if row is None:
+            return None
+        return {"idempotency_key": key, "status": STORED, "order_id": row.id, "total_price": row.total_price}
+
+    async def _run(self):
+        """Junta os pedidos da fila em lotes e os grava"""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.batch_size - 1:
+                # Janela curta para o lote crescer no pico
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._write_with_retry(batch)
+            finally:
+                self._pending -= len(batch)
+                order_queue_depth.set(self._pending)
+                for _ in batch:
+                    queue.task_done()
+
+    async def _write_with_retry(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """
+        Grava o lote com novas tentativas em erros transitórios
+
+        Uma violação de restrição (IntegrityError) não se resolve repetindo o
+        lote: ele é dividido ao meio e cada metade é gravada separadamente, de
+        modo que apenas o pedido inválido termina como failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._write(batch)
+                return
+            except asyncio.CancelledError:
+                raise
+            except IntegrityError as e:
+                if len(batch) > 1:
+                    middle = len(batch) // 2
+                    await self._write_with_retry(batch[:middle])
+                    await self._write_with_retry(batch[middle:])
+                    return
+                print(f"Erro ao gravar pedido {batch[0][0]['key']} (tentativa {attempt + 1}): {str(e)}")
+                # Uma segunda tentativa encontra a chave se outro worker a gravou ao mesmo tempo
+                if attempt >= 1:
+                    break
+            except Exception as e:
+                print(f"Erro ao gravar lote de {len(batch)} pedidos (tentativa {attempt + 1}): {str(e)}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+
+        for _, ack in batch:
+            ack["status"] = FAILED
+        self.failed += len(batch)
+        orders_written.inc(len(batch), outcome=FAILED)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Grava o lote em uma transação: INSERT em massa de orders e depois de order_items"""
+        started = time.perf_counter()
+        # Uma entrada por chave (a mesma chave pode voltar à fila se a confirmação expirou)
+        entries: Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]] = {}
+        for entry, ack in batch:
+            if entry["key"] in entries:
+                entries[entry["key"]][1].append(ack)
+            else:
+                entries[entry["key"]] = (entry, [ack])
+        keys = list(entries)
+
+        async with self.engine.begin() as connection:
+            existing = await self._order_ids(connection, keys)
+            new = [entries[key][0] for key in keys if key not in existing]
+            if new:
+                await connection.execute(insert(ORDERS), [entry["order"] for entry in new])
+                ids = await self._order_ids(connection, [entry["key"] for entry in new])
+                item_rows = [
+                    {**item, "order_id": ids[entry["key"]]}
+                    for entry in new
+                    for item in entry["items"]
+                ]
+                if item_rows:
+                    await connection.execute(insert(ORDER_ITEMS), item_rows)
+                existing.update(ids)
+
+        for key, (entry, acks) in entries.items():
+            for ack in acks:
+                ack["status"] = STORED
+                ack["order_id"] = existing[key]
+        duplicates = len(keys) - len(new)
+        self.batches += 1
+        self.stored += len(new)
+        orders_written.inc(len(new), outcome=STORED)
+        if duplicates:
+            orders_written.inc(duplicates, outcome="duplicate")
+        order_flush_batch_size.observe(len(batch))
+        order_flush_duration.observe(time.perf_counter() - started)
+
+    async def _order_ids(self, connection, keys: List[str], chunk: int = 500) -> Dict[str, int]:
+        """Ids dos pedidos já gravados com essas chaves (em blocos, pelo limite de parâmetros do SQLite)"""
+        ids: Dict[str, int] = {}
+        for start in range(0, len(keys), chunk):
+            query = (
+                select(ORDERS.c.idempotency_key, ORDERS.c.id)
+                .where(ORDERS.c.idempotency_key.in_(keys[start:start + chunk]))
+            )
+            ids.update({key: order_id for key, order_id in (await connection.execute(query)).all()})
+        return ids
+
+    async def close(self, timeout: float = 30):
+        """Para de aceitar pedidos e grava o que estiver na fila"""
+        self._closed = True
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Aviso: {self._pending} pedidos não gravados no encerramento")
+        self._writer.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "stored": self.stored,
+            "failed": self.failed,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+        }
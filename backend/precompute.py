@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from cache import canonicalize
+
+
+def recommendation_key(preferences: Dict[str, Any],
+                       restrictions: Sequence[str],
+                       calories_range: Sequence[int],
+                       limit: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Normaliza a combinação de entradas das recomendações
+
+    Textos em minúsculas, proteínas e restrições sem repetição e em ordem
+    (a ordem escolhida na UI não muda a resposta).
+
+    Returns:
+        (chave da tupla, parâmetros normalizados para recalcular a resposta)
+    """
+    params = canonicalize({
+        "preferences": {
+            "cuisine_type": preferences.get("cuisine_type"),
+            "meal_type": preferences.get("meal_type"),
+            "spice_level": preferences.get("spice_level"),
+            "preferred_protein": set(preferences.get("preferred_protein") or []),
+        },
+        "restrictions": set(restrictions or []),
+        "calories_range": [int(value) for value in calories_range],
+        "limit": int(limit),
+    })
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest(), params
+
+
+class RecommendationPrecomputer:
+    """
+    Pré-cálculo das recomendações para as combinações de entradas mais pedidas
+
+    As entradas de get_meal_recommendations têm poucos valores possíveis, então
+    poucas tuplas concentram a maior parte do tráfego. Cada requisição conta
+    para a popularidade da sua tupla (com decaimento, para acompanhar o
+    tráfego recente). Quando o servidor fica ocioso, o worker recalcula as
+    tuplas mais pedidas e grava o resultado na tabela recommendation_snapshots;
+    a requisição passa a ser uma busca pela chave.
+
+    Uma escrita no catálogo invalida as linhas calculadas antes dela e dispara
+    o recálculo no próximo período ocioso. Alterações feitas por outro
+    processo ficam limitadas pelo TTL das linhas.
+    """
+
+    def __init__(self,
+                 top_n: int = 50,
+                 min_requests: int = 3,
+                 idle_seconds: float = 2.0,
+                 ttl: float = 900,
+                 decay_seconds: float = 600,
+                 retry_seconds: float = 60,
+                 max_tracked: int = 4096):
+        self.top_n = top_n
+        self.min_requests = min_requests
+        self.idle_seconds = idle_seconds
+        self.ttl = ttl
+        self.decay_seconds = decay_seconds
+        self.retry_seconds = retry_seconds
+        self.max_tracked = max_tracked
+
+        self._counts: Dict[str, float] = {}
+        self._params: Dict[str, Dict[str, Any]] = {}
+        # Chave -> time.time() do último cálculo feito por este processo
+        self._computed: Dict[str, float] = {}
+        # Chave -> time.time() a partir do qual uma tupla que falhou pode ser tentada de novo
+        self._retry_at: Dict[str, float] = {}
+        self._invalidated_at = 0.0
+        self._purge_pending = False
+        self._decayed_at = time.monotonic()
+        self._last_activity = time.monotonic()
+        self._active = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshed = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls) -> "RecommendationPrecomputer":
+        """Cria o pré-cálculo a partir das variáveis RECOMMENDATION_PRECOMPUTE_*"""
+        return cls(
+            top_n=int(os.getenv("RECOMMENDATION_PRECOMPUTE_TOP_N", "50")),
+            min_requests=int(os.getenv("RECOMMENDATION_PRECOMPUTE_MIN_REQUESTS", "3")),
+            idle_seconds=float(os.getenv("RECOMMENDATION_PRECOMPUTE_IDLE_SECONDS", "2")),
+            ttl=float(os.getenv("RECOMMENDATION_PRECOMPUTE_TTL_SECONDS", "900")),
+            decay_seconds=float(os.getenv("RECOMMENDATION_PRECOMPUTE_DECAY_SECONDS", "600")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_n > 0
+
+    @property
+    def quiet(self) -> bool:
+        """Nenhuma recomendação sendo calculada e nenhuma nos últimos idle_seconds"""
+        return self._active == 0 and time.monotonic() - self._last_activity >= self.idle_seconds
+
+    def record(self, key: str, params: Dict[str, Any]):
+        """Conta uma requisição para a popularidade da tupla"""
+        if key not in self._counts and len(self._counts) >= self.max_tracked:
+            # Descarta a tupla menos pedida
+            coldest = min(self._counts, key=self._counts.get)
+            self._counts.pop(coldest)
+            self._params.pop(coldest, None)
+            self._computed.pop(coldest, None)
+        self._counts[key] = self._counts.get(key, 0.0) + 1
+        self._params[key] = params
+
+    @contextmanager
+    def live(self):
+        """Marca uma recomendação calculada na hora (o worker não roda enquanto houver alguma)"""
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._last_activity = time.monotonic()
+
+    def invalidate(self):
+        """Descarta as linhas calculadas até agora (chamado quando o catálogo muda)"""
+        self._invalidated_at = time.time()
+        self._computed.clear()
+        self._purge_pending = True
+
+    def popular(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Tuplas mais pedidas, da mais popular para a menos"""
+        ranked = sorted(
+            (key for key, count in self._counts.items() if count >= self.min_requests),
+            key=self._counts.get,
+            reverse=True
+        )
+        return [(key, self._params[key]) for key in ranked[:self.top_n]]
+
+    def _decay(self):
+        if time.monotonic() - self._decayed_at < self.decay_seconds:
+            return
+        self._decayed_at = time.monotonic()
+        for key in list(self._counts):
+            self._counts[key] /= 2
+            if self._counts[key] < 0.5:
+                self._counts.pop(key)
+                self._params.pop(key, None)
+                self._computed.pop(key, None)
+                self._retry_at.pop(key, None)
+
+    async def lookup(self, db: AsyncSession, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Busca as recomendações pré-calculadas da tupla
+
+        Args:
+            db: Sessão assíncrona do banco
+            key: Chave gerada por recommendation_key
+
+        Returns:
+            Recomendações ou None (sem linha, linha expirada ou anterior à última
+            alteração do catálogo)
+        """
+        cutoff = max(time.time() - self.ttl, self._invalidated_at)
+        query = (
+            select(models.RecommendationSnapshot.recommendations)
+            .where(models.RecommendationSnapshot.key == key)
+            .where(models.RecommendationSnapshot.computed_at > cutoff)
+        )
+        try:
+            row = (await db.execute(query)).first()
+        except SQLAlchemyError as e:
+            # Tabela ainda não migrada: segue com o cálculo na hora
+            print(f"Erro ao ler recomendações pré-calculadas: {str(e)}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    async def store(self, db: AsyncSession, key: str, params: Dict[str, Any], recommendations: List[Dict[str, Any]]):
+        """Grava (ou substitui) as recomendações da tupla"""
+        computed_at = time.time()
+        await db.merge(models.RecommendationSnapshot(
+            key=key,
+            params=params,
+            recommendations=recommendations,
+            computed_at=computed_at
+        ))
+        await db.commit()
+        self._computed[key] = computed_at
+
+    async def purge(self, session_factory):
+        """Remove da tabela as linhas anteriores à última alteração do catálogo"""
+        self._purge_pending = False
+        async with session_factory() as db:
+            await db.execute(
+                delete(models.RecommendationSnapshot)
+                .where(models.RecommendationSnapshot.computed_at <= self._invalidated_at)
+            )
+            await db.commit()
+
+    async def refresh(self,
+                      compute: Callable[[AsyncSession, Dict[str, Any]], Awaitable[Optional[List[Dict[str, Any]]]]],
+                      session_factory) -> int:
+        """
+        Recalcula as tuplas populares sem linha recente, enquanto o servidor estiver ocioso
+
+        Args:
+            compute: Corrotina (sessão, parâmetros) -> recomendações, ou None quando
+                o resultado não deve ser gravado (ex: LLM indisponível)
+            session_factory: Fábrica de sessões assíncronas
+
+        Returns:
+            Número de tuplas gravadas
+        """
+        # Recalcula antes de a linha expirar para não haver intervalo sem ela
+        stale_before = time.time() - self.ttl * 0.8
+        refreshed = 0
+        for key, params in self.popular():
+            if not self.quiet:
+                break
+            if self._computed.get(key, 0.0) > stale_before or self._retry_at.get(key, 0.0) > time.time():
+                continue
+            async with session_factory() as db:
+                recommendations = await compute(db, params)
+                if recommendations is None:
+                    self.skipped += 1
+                    self._retry_at[key] = time.time() + self.retry_seconds
+                    continue
+                await self.store(db, key, params, recommendations)
+            refreshed += 1
+        self.refreshed += refreshed
+        return refreshed
+
+    async def run(self, compute, session_factory):
+        """Laço do worker: verifica a cada idle_seconds se há o que recalcular"""
+        while True:
+            await asyncio.sleep(self.idle_seconds)
+            if not self.enabled:
+                continue
+            self._decay()
+            if not self.quiet:
+                continue
+            try:
+                if self._purge_pending:
+                    await self.purge(session_factory)
+                await self.refresh(compute, session_factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro ao pré-calcular recomendações: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "tracked": len(self._counts),
+            "popular": len(self.popular()),
+            "computed": len(self._computed),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "ttl": self.ttl,
+        }
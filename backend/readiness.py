@@ -0,0 +1,114 @@
+import os
+import asyncio
+from typing import Any, Dict
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from ai_service import get_ai_service
+
+PENDING = "pending"
+READY = "ready"
+DISABLED = "disabled"
+
+
+class Readiness:
+    """
+    Estado do aquecimento feito no startup, exposto em /ready
+
+    Cada componente começa como "pending" e passa a "ready" quando aquecido;
+    falhas ficam registradas com um status próprio ("schema_missing",
+    "unreachable", "error") e são tentadas de novo até darem certo.
+    """
+
+    def __init__(self, require_groq: bool = True):
+        self.require_groq = require_groq
+        self.checks: Dict[str, str] = {"database": PENDING, "ai_service": PENDING, "groq": PENDING}
+
+    @classmethod
+    def from_env(cls) -> "Readiness":
+        return cls(require_groq=os.getenv("READY_REQUIRE_GROQ", "true").lower() == "true")
+
+    @property
+    def required(self):
+        return [name for name in self.checks if name != "groq" or self.require_groq]
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks[name] in (READY, DISABLED) for name in self.required)
+
+    def report(self) -> Dict[str, Any]:
+        return {"status": "ready" if self.ready else "starting", "checks": dict(self.checks)}
+
+
+def _has_schema(connection) -> bool:
+    return inspect(connection).has_table("meals")
+
+
+async def warm_database(async_engine: AsyncEngine, sync_engine: Engine, connections: int) -> str:
+    """
+    Verifica se o esquema foi criado (python migrate.py) e abre conexões nos pools
+
+    Args:
+        async_engine: Engine usado pelos endpoints async
+        sync_engine: Engine síncrono (sessões get_db)
+        connections: Conexões abertas em paralelo no pool async
+
+    Returns:
+        "ready" ou "schema_missing"
+    """
+    async with async_engine.connect() as connection:
+        if not await connection.run_sync(_has_schema):
+            return "schema_missing"
+
+    async def checkout():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    def checkout_sync():
+        with sync_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(checkout() for _ in range(max(1, connections))))
+    await asyncio.to_thread(checkout_sync)
+    return READY
+
+
+async def warm_up(readiness: Readiness, async_engine: AsyncEngine, sync_engine: Engine):
+    """
+    Aquece banco, AIService e pool do Groq em segundo plano
+
+    O servidor aceita requisições durante o aquecimento; /ready responde 503
+    até que os componentes obrigatórios estejam prontos.
+    """
+    db_connections = int(os.getenv("DB_WARM_CONNECTIONS", "4"))
+    groq_connections = int(os.getenv("GROQ_WARM_CONNECTIONS", "2"))
+    retry_seconds = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+    while True:
+        if readiness.checks["database"] != READY:
+            try:
+                readiness.checks["database"] = await warm_database(async_engine, sync_engine, db_connections)
+            except Exception as e:
+                print(f"Erro ao aquecer o banco de dados: {str(e)}")
+                readiness.checks["database"] = "error"
+
+        if readiness.checks["ai_service"] != READY:
+            try:
+                # Construção com dados mock e tabela de alimentos fora do event loop
+                await asyncio.to_thread(get_ai_service)
+                readiness.checks["ai_service"] = READY
+            except Exception as e:
+                print(f"Erro ao inicializar o serviço de IA: {str(e)}")
+                readiness.checks["ai_service"] = "error"
+
+        if readiness.checks["groq"] != READY and readiness.checks["ai_service"] == READY:
+            groq_client = get_ai_service().groq_client
+            if groq_client is None:
+                readiness.checks["groq"] = DISABLED
+            else:
+                warm = await groq_client.warm_up(groq_connections)
+                readiness.checks["groq"] = READY if warm else "unreachable"
+
+        if all(value in (READY, DISABLED) for value in readiness.checks.values()):
+            return
+        await asyncio.sleep(retry_seconds)
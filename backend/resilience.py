@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker para a API do Groq
+
+    Depois de falhas (ou respostas lentas) consecutivas, o circuito abre e as
+    chamadas são recusadas durante o período de espera, indo direto para o
+    fallback. Passado esse período, uma única chamada de teste é liberada
+    (meio aberto): se der certo o circuito fecha, senão volta a abrir.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 slow_call_seconds: float = 5.0,
+                 cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """Cria o circuit breaker a partir das variáveis de ambiente AI_BREAKER_*"""
+        return cls(
+            failure_threshold=int(os.getenv("AI_BREAKER_FAILURES", "5")),
+            slow_call_seconds=float(os.getenv("AI_BREAKER_SLOW_SECONDS", "5")),
+            cooldown_seconds=float(os.getenv("AI_BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+
+    def allow(self) -> bool:
+        """Indica se uma chamada ao upstream pode ser feita agora"""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency_seconds: float):
+        """Registra uma chamada concluída (respostas lentas contam como falha)"""
+        if latency_seconds > self.slow_call_seconds:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CIRCUIT_CLOSED
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.times_opened += 1
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release(self):
+        """Libera a chamada de teste sem resultado (ex: chamada cancelada)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == CIRCUIT_OPEN:
+                retry_in = round(max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": retry_in,
+                "successes": self.successes,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+def latency_budgets_from_env() -> Dict[str, float]:
+    """Lê o orçamento de latência (segundos) de cada endpoint do LLM"""
+    defaults = {
+        "nutrition": "2.0",
+        "recommendations": "4.0",
+        "menu": "8.0",
+        "explanations": os.getenv("AI_EXPLANATION_DEADLINE", "2.0"),
+        "route_notes": "2.0",
+    }
+    return {
+        endpoint: float(os.getenv(f"AI_LATENCY_BUDGET_{endpoint.upper()}", default))
+        for endpoint, default in defaults.items()
+    }
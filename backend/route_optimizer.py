@@ -0,0 +1,575 @@
+import os
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Sequence
+
+# Raio médio da Terra em km
+EARTH_RADIUS_KM = 6371.0088
+
+# Melhoria mínima (km) para aceitar um movimento da busca local
+_EPSILON = 1e-9
+
+
+def haversine_matrix(lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+    """
+    Calcula a matriz de distâncias (km) entre todos os pares de coordenadas
+
+    Args:
+        lats: Latitudes em graus
+        lngs: Longitudes em graus
+
+    Returns:
+        Matriz simétrica n x n com as distâncias em km
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _augment_with_sink(dist: np.ndarray, return_to_depot: bool) -> np.ndarray:
+    """
+    Adiciona um nó final fixo à matriz (índice n)
+
+    Em rotas abertas o nó final tem distância zero para todos, então o último
+    ponto da rota é livre. Em rotas fechadas ele é uma cópia do depósito.
+    """
+    n = dist.shape[0]
+    augmented = np.zeros((n + 1, n + 1), dtype=np.float64)
+    augmented[:n, :n] = dist
+    if return_to_depot:
+        augmented[:n, n] = dist[:, 0]
+        augmented[n, :n] = dist[0, :]
+    return augmented
+
+
+def nearest_neighbour_tour(dist: np.ndarray) -> np.ndarray:
+    """
+    Constrói uma rota inicial pelo vizinho mais próximo a partir do nó 0
+
+    A matriz deve conter o nó final fixo como último índice (ver _augment_with_sink).
+    Retorna o array [0, ..., n-1] com as paradas na ordem de visita.
+    """
+    size = dist.shape[0]
+    sink = size - 1
+    tour = np.empty(size, dtype=np.int64)
+    tour[0] = 0
+    tour[-1] = sink
+
+    visited = np.zeros(size, dtype=bool)
+    visited[0] = True
+    visited[sink] = True
+    current = 0
+    for position in range(1, size - 1):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        tour[position] = current
+    return tour
+
+
+def two_opt_pass(tour: np.ndarray, dist: np.ndarray, deadline: float) -> bool:
+    """
+    Executa uma passada de 2-opt (inversão de segmentos) sobre a rota
+
+    O primeiro e o último nó ficam fixos. Para cada aresta de saída, todas as
+    inversões possíveis são avaliadas de forma vetorizada e a melhor é aplicada.
+
+    Returns:
+        True se alguma melhoria foi aplicada
+    """
+    size = len(tour)
+    improved = False
+    for i in range(1, size - 2):
+        if time.perf_counter() > deadline:
+            break
+        # Inverter tour[i..j] troca as arestas (i-1, i) e (j, j+1)
+        a = tour[i - 1]
+        b = tour[i]
+        c = tour[i + 1:size - 1]
+        d = tour[i + 2:size]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        best = int(np.argmin(delta))
+        if delta[best] < -_EPSILON:
+            j = i + 1 + best
+            tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def or_opt_pass(tour: np.ndarray, dist: np.ndarray, deadline: float, max_segment: int = 3) -> bool:
+    """
+    Executa uma passada de Or-opt (realocação de segmentos de 1 a 3 paradas)
+
+    Cada segmento é removido e reinserido, na ordem original ou invertido, na
+    aresta que gera o menor custo. A avaliação das posições é vetorizada.
+
+    Returns:
+        True se alguma melhoria foi aplicada
+    """
+    improved = False
+    for length in range(1, max_segment + 1):
+        start = 1
+        while start + length < len(tour):
+            if time.perf_counter() > deadline:
+                return improved
+            end = start + length - 1
+            prev_node = tour[start - 1]
+            next_node = tour[end + 1]
+            first = tour[start]
+            last = tour[end]
+            removal_gain = dist[prev_node, first] + dist[last, next_node] - dist[prev_node, next_node]
+
+            # Rota sem o segmento e arestas candidatas para reinserção
+            rest = np.concatenate((tour[:start], tour[end + 1:]))
+            u = rest[:-1]
+            v = rest[1:]
+            base = dist[u, v]
+            forward = dist[u, first] + dist[last, v] - base
+            backward = dist[u, last] + dist[first, v] - base
+            # A posição original não é uma realocação
+            forward[start - 1] = np.inf
+            backward[start - 1] = np.inf
+
+            best_forward = int(np.argmin(forward))
+            best_backward = int(np.argmin(backward))
+            if forward[best_forward] <= backward[best_backward]:
+                position, cost, reverse = best_forward, forward[best_forward], False
+            else:
+                position, cost, reverse = best_backward, backward[best_backward], True
+
+            if cost - removal_gain < -_EPSILON:
+                segment = tour[start:end + 1].copy()
+                if reverse:
+                    segment = segment[::-1]
+                tour[:] = np.concatenate((rest[:position + 1], segment, rest[position + 1:]))
+                improved = True
+            else:
+                start += 1
+    return improved
+
+
+def optimize_tour(dist: np.ndarray, deadline: float) -> np.ndarray:
+    """
+    Otimiza a rota sobre uma matriz já aumentada com o nó final fixo
+
+    Args:
+        dist: Matriz com o depósito no índice 0 e o nó final no último índice
+        deadline: Instante (time.perf_counter) em que a busca local deve parar
+
+    Returns:
+        Array com a rota completa, do depósito ao nó final
+    """
+    tour = nearest_neighbour_tour(dist)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = two_opt_pass(tour, dist, deadline)
+        improved = or_opt_pass(tour, dist, deadline) or improved
+    return tour
+
+
+def solve_route(depot: Dict[str, float],
+                points: List[Dict[str, Any]],
+                return_to_depot: bool = False,
+                time_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Resolve o problema do caixeiro viajante a partir do depósito
+
+    Usa vizinho mais próximo como construção inicial e depois alterna 2-opt e
+    Or-opt até não haver melhoria ou até o orçamento de tempo acabar.
+
+    Args:
+        depot: Ponto de partida {lat, lng}
+        points: Pontos de entrega com "lat" e "lng"
+        return_to_depot: Se a rota deve terminar no depósito
+        time_budget_ms: Tempo máximo para a busca local
+
+    Returns:
+        Dicionário com "order" (índices de points na ordem de visita),
+        "legs_km" (distância de cada trecho) e "total_distance_km"
+    """
+    if not points:
+        return {"order": [], "legs_km": [], "total_distance_km": 0.0}
+
+    if time_budget_ms is None:
+        time_budget_ms = float(os.getenv("ROUTE_TIME_BUDGET_MS", "500"))
+    deadline = time.perf_counter() + time_budget_ms / 1000
+
+    lats = [depot["lat"]] + [p["lat"] for p in points]
+    lngs = [depot["lng"]] + [p["lng"] for p in points]
+    dist = _augment_with_sink(haversine_matrix(lats, lngs), return_to_depot)
+
+    tour = optimize_tour(dist, deadline)
+    legs = dist[tour[:-1], tour[1:]]
+    if not return_to_depot:
+        # O trecho até o nó final fictício tem custo zero
+        legs = legs[:-1]
+    return {
+        "order": [int(node) - 1 for node in tour[1:-1]],
+        "legs_km": [float(leg) for leg in legs],
+        "total_distance_km": float(legs.sum()),
+    }
+
+
+def build_schedule(points: List[Dict[str, Any]],
+                   solution: Dict[str, Any],
+                   departure: Optional[datetime] = None,
+                   speed_kmh: Optional[float] = None,
+                   service_minutes: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Monta a rota ordenada com horários estimados de chegada
+
+    Args:
+        points: Pontos de entrega originais
+        solution: Resultado de solve_route
+        departure: Horário de saída (padrão: agora)
+        speed_kmh: Velocidade média do entregador
+        service_minutes: Tempo de parada em cada entrega
+
+    Returns:
+        Lista ordenada de pontos com sequence, distance_km, travel_time_minutes,
+        elapsed_minutes (desde a saída) e estimated_arrival
+    """
+    if departure is None:
+        departure = datetime.now()
+    if speed_kmh is None:
+        speed_kmh = float(os.getenv("DELIVERY_AVG_SPEED_KMH", "25"))
+    if service_minutes is None:
+        service_minutes = float(os.getenv("DELIVERY_SERVICE_MINUTES", "3"))
+
+    route = []
+    elapsed = 0.0
+    for sequence, (index, leg_km) in enumerate(zip(solution["order"], solution["legs_km"]), start=1):
+        travel_minutes = leg_km / speed_kmh * 60
+        if sequence > 1:
+            elapsed += service_minutes
+        elapsed += travel_minutes
+        current_time = departure + timedelta(minutes=elapsed)
+
+        point = dict(points[index])
+        point["sequence"] = sequence
+        point["distance_km"] = round(leg_km, 3)
+        point["travel_time_minutes"] = round(travel_minutes, 1)
+        point["elapsed_minutes"] = round(elapsed, 1)
+        point["estimated_arrival"] = current_time.strftime("%H:%M")
+        route.append(point)
+    return route
+
+
+def _naive(value: datetime) -> datetime:
+    """Converte horários com fuso para o horário local sem fuso"""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _to_minutes(value: Optional[datetime], reference: datetime, default: float) -> float:
+    """Converte um horário em minutos relativos ao horário de referência"""
+    if value is None:
+        return default
+    return (_naive(value) - reference).total_seconds() / 60
+
+
+class _FleetContext:
+    """Dados compartilhados pelas etapas do roteamento de frota"""
+
+    def __init__(self, couriers, orders, departure, speed_kmh, service_minutes):
+        self.couriers = couriers
+        self.orders = orders
+        self.speed_kmh = speed_kmh
+        self.service_minutes = service_minutes
+        self.order_count = len(orders)
+
+        lats = [o["lat"] for o in orders] + [c["lat"] for c in couriers]
+        lngs = [o["lng"] for o in orders] + [c["lng"] for c in couriers]
+        self.dist = haversine_matrix(lats, lngs)
+
+        self.size = np.array([float(o.get("size") or 1) for o in orders])
+        self.ready = np.array([_to_minutes(o.get("ready_at"), departure, 0.0) for o in orders])
+        self.window_start = np.array([_to_minutes(o.get("window_start"), departure, -np.inf) for o in orders])
+        self.window_end = np.array([_to_minutes(o.get("window_end"), departure, np.inf) for o in orders])
+        self.available = np.array([max(0.0, _to_minutes(c.get("available_at"), departure, 0.0)) for c in couriers])
+        self.capacity = np.array([float(c.get("capacity") or np.inf) for c in couriers])
+
+    def start_node(self, courier: int) -> int:
+        return self.order_count + courier
+
+    def evaluate(self, courier: int, sequence: List[int]) -> Dict[str, Any]:
+        """
+        Simula a rota de um entregador respeitando preparo e janelas de entrega
+
+        O entregador sai quando está disponível e todos os pedidos da rota estão
+        prontos. Se chegar antes da janela, espera; se chegar depois, há atraso.
+        """
+        depart = self.available[courier]
+        if sequence:
+            depart = max(depart, float(self.ready[sequence].max()))
+
+        elapsed = depart
+        previous = self.start_node(courier)
+        stops = []
+        total_km = 0.0
+        lateness = 0.0
+        for node in sequence:
+            leg_km = float(self.dist[previous, node])
+            travel = leg_km / self.speed_kmh * 60
+            arrival = elapsed + travel
+            wait = max(0.0, self.window_start[node] - arrival)
+            arrival += wait
+            late = max(0.0, arrival - self.window_end[node])
+            stops.append({
+                "node": node,
+                "distance_km": leg_km,
+                "travel_minutes": travel,
+                "wait_minutes": wait,
+                "arrival": arrival,
+                "late_minutes": late,
+            })
+            total_km += leg_km
+            lateness += late
+            elapsed = arrival + self.service_minutes
+            previous = node
+        return {"depart": depart, "stops": stops, "total_km": total_km, "lateness": lateness}
+
+
+def _eligible_groups(ctx: _FleetContext) -> Dict[Any, List[int]]:
+    """Agrupa os entregadores por cozinha (ou ponto de partida)"""
+    groups: Dict[Any, List[int]] = {}
+    for index, courier in enumerate(ctx.couriers):
+        key = courier.get("kitchen_id")
+        if key is None:
+            key = (round(courier["lat"], 5), round(courier["lng"], 5))
+        groups.setdefault(key, []).append(index)
+    return groups
+
+
+def _sweep_clusters(ctx: _FleetContext, group: List[int], order_nodes: List[int]) -> Dict[int, List[int]]:
+    """
+    Divide os pedidos de uma cozinha entre seus entregadores (algoritmo de varredura)
+
+    Os pedidos são ordenados pelo ângulo em relação à cozinha e fatiados em
+    blocos contíguos, equilibrando a carga sem exceder a capacidade de cada um.
+    Pedidos que não couberem ficam no bloco -1.
+    """
+    center = ctx.couriers[group[0]]
+    angles = np.arctan2(
+        np.array([ctx.orders[n]["lat"] for n in order_nodes]) - center["lat"],
+        np.array([ctx.orders[n]["lng"] for n in order_nodes]) - center["lng"],
+    )
+    swept = [order_nodes[i] for i in np.argsort(angles, kind="stable")]
+
+    clusters: Dict[int, List[int]] = {courier: [] for courier in group}
+    clusters[-1] = []
+    remaining_size = float(ctx.size[swept].sum()) if swept else 0.0
+    position = 0
+    couriers = sorted(group, key=lambda c: ctx.available[c])
+    for remaining_couriers, courier in zip(range(len(couriers), 0, -1), couriers):
+        target = min(ctx.capacity[courier], np.ceil(remaining_size / remaining_couriers))
+        load = 0.0
+        while position < len(swept):
+            node = swept[position]
+            if load + ctx.size[node] > target and (load > 0 or ctx.size[node] > ctx.capacity[courier]):
+                break
+            clusters[courier].append(node)
+            load += ctx.size[node]
+            position += 1
+        remaining_size -= load
+    clusters[-1].extend(swept[position:])
+    return clusters
+
+
+def _sequence_cluster(ctx: _FleetContext, courier: int, nodes: List[int], deadline: float) -> List[int]:
+    """Ordena os pedidos de um entregador (TSP e, se houver atraso, prazo mais cedo primeiro)"""
+    if len(nodes) <= 1:
+        return list(nodes)
+    index = [ctx.start_node(courier)] + list(nodes)
+    dist = _augment_with_sink(ctx.dist[np.ix_(index, index)], return_to_depot=False)
+    tour = optimize_tour(dist, deadline)
+    sequence = [nodes[int(node) - 1] for node in tour[1:-1]]
+
+    evaluation = ctx.evaluate(courier, sequence)
+    if evaluation["lateness"] > 0:
+        by_deadline = sorted(nodes, key=lambda n: (ctx.window_end[n], ctx.window_start[n]))
+        if ctx.evaluate(courier, by_deadline)["lateness"] < evaluation["lateness"]:
+            return by_deadline
+    return sequence
+
+
+def _best_insertion(ctx: _FleetContext, node: int, routes: Dict[int, List[int]], candidates: List[int]):
+    """
+    Procura a inserção de um pedido nas rotas candidatas com capacidade livre
+
+    Prefere a que menos aumenta o atraso total da rota e, entre essas, a de
+    menor distância adicional. Sem inserção sem atraso, o pedido vai para a
+    posição de menor atraso em vez de ficar sem entregador.
+
+    Returns:
+        (atraso adicional, distância adicional, entregador, posição) ou None
+        se nenhum entregador tiver capacidade
+    """
+    best = None
+    for courier in candidates:
+        sequence = routes[courier]
+        if ctx.size[sequence].sum() + ctx.size[node] > ctx.capacity[courier]:
+            continue
+        base = ctx.evaluate(courier, sequence)
+        for position in range(len(sequence) + 1):
+            trial = sequence[:position] + [node] + sequence[position:]
+            evaluation = ctx.evaluate(courier, trial)
+            cost = (evaluation["lateness"] - base["lateness"], evaluation["total_km"] - base["total_km"])
+            if best is None or cost < best[:2]:
+                best = cost + (courier, position)
+    return best
+
+
+def solve_fleet(couriers: List[Dict[str, Any]],
+                orders: List[Dict[str, Any]],
+                departure: Optional[datetime] = None,
+                time_budget_ms: Optional[float] = None,
+                speed_kmh: Optional[float] = None,
+                service_minutes: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Distribui e sequencia pedidos entre vários entregadores (VRP com janelas)
+
+    Heurística em duas fases: os pedidos são agrupados por cozinha e divididos
+    entre os entregadores por varredura angular com limite de capacidade; cada
+    grupo é ordenado com o otimizador de rota. Em seguida, pedidos excedentes
+    e atrasados são realocados na posição de menor atraso (e menor distância)
+    enquanto houver orçamento de tempo. Um pedido só fica sem entregador por
+    falta de capacidade: sem posição no prazo, ele é entregue com atraso.
+
+    Args:
+        couriers: Entregadores com lat, lng, capacity e opcionalmente
+            kitchen_id e available_at
+        orders: Pedidos com order_id, lat, lng e opcionalmente size, kitchen_id,
+            ready_at (pedido pronto), window_start e window_end (janela prometida)
+        departure: Horário de referência (padrão: agora)
+        time_budget_ms: Tempo máximo de processamento
+        speed_kmh: Velocidade média dos entregadores
+        service_minutes: Tempo de parada em cada entrega
+
+    Returns:
+        Dicionário com as rotas por entregador, pedidos não atribuídos e
+        distância total
+    """
+    departure = _naive(departure or datetime.now())
+    if time_budget_ms is None:
+        time_budget_ms = float(os.getenv("FLEET_TIME_BUDGET_MS", "2000"))
+    if speed_kmh is None:
+        speed_kmh = float(os.getenv("DELIVERY_AVG_SPEED_KMH", "25"))
+    if service_minutes is None:
+        service_minutes = float(os.getenv("DELIVERY_SERVICE_MINUTES", "3"))
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000
+
+    unassigned = []
+    if not couriers:
+        unassigned = [{"order_id": o.get("order_id"), "reason": "no_courier"} for o in orders]
+        return {"routes": [], "unassigned": unassigned, "total_distance_km": 0.0}
+
+    ctx = _FleetContext(couriers, orders, departure, speed_kmh, service_minutes)
+    groups = _eligible_groups(ctx)
+    group_keys = list(groups)
+    group_starts = np.array([ctx.start_node(groups[key][0]) for key in group_keys])
+
+    # Fase 1: cada pedido vai para a sua cozinha ou para a mais próxima
+    eligible: Dict[int, List[int]] = {}
+    group_orders: Dict[Any, List[int]] = {key: [] for key in group_keys}
+    for node, order in enumerate(orders):
+        kitchen_id = order.get("kitchen_id")
+        if kitchen_id is not None:
+            if kitchen_id not in groups:
+                unassigned.append({"order_id": order.get("order_id"), "reason": "no_courier_for_kitchen"})
+                continue
+            key = kitchen_id
+        else:
+            key = group_keys[int(np.argmin(ctx.dist[node, group_starts]))]
+        eligible[node] = groups[key]
+        group_orders[key].append(node)
+
+    routes: Dict[int, List[int]] = {courier: [] for courier in range(len(couriers))}
+    pending: List[int] = []
+    for key, nodes in group_orders.items():
+        if not nodes:
+            continue
+        clusters = _sweep_clusters(ctx, groups[key], nodes)
+        pending.extend(clusters.pop(-1))
+        routes.update(clusters)
+
+    # Fase 2: sequenciamento de cada entregador (metade do orçamento)
+    active = [courier for courier, nodes in routes.items() if nodes]
+    routing_deadline = started + (deadline - started) / 2
+    for position, courier in enumerate(active):
+        share = (routing_deadline - time.perf_counter()) / (len(active) - position)
+        routes[courier] = _sequence_cluster(ctx, courier, routes[courier], time.perf_counter() + max(share, 0))
+
+    # Fase 3: realocação de pedidos excedentes e atrasados
+    while pending and time.perf_counter() < deadline:
+        node = pending.pop(0)
+        insertion = _best_insertion(ctx, node, routes, eligible[node])
+        if insertion is None:
+            unassigned.append({"order_id": orders[node].get("order_id"), "reason": "capacity"})
+        else:
+            _, _, courier, position = insertion
+            routes[courier].insert(position, node)
+
+    # Cada pedido atrasado é realocado uma vez; a rota de origem sempre comporta
+    # o pedido de volta, então a realocação nunca o deixa sem entregador
+    relocated = set()
+    while time.perf_counter() < deadline:
+        worst = None
+        for courier, sequence in routes.items():
+            for stop in ctx.evaluate(courier, sequence)["stops"]:
+                if stop["late_minutes"] <= 0 or stop["node"] in relocated:
+                    continue
+                if worst is None or stop["late_minutes"] > worst[0]:
+                    worst = (stop["late_minutes"], courier, stop["node"])
+        if worst is None:
+            break
+        _, courier, node = worst
+        relocated.add(node)
+        routes[courier].remove(node)
+        _, _, courier, position = _best_insertion(ctx, node, routes, eligible[node])
+        routes[courier].insert(position, node)
+
+    # Excedentes não examinados dentro do orçamento de tempo
+    for node in pending:
+        unassigned.append({"order_id": orders[node].get("order_id"), "reason": "capacity"})
+
+    # Montagem da resposta
+    result_routes = []
+    total_km = 0.0
+    for courier, sequence in routes.items():
+        if not sequence:
+            continue
+        evaluation = ctx.evaluate(courier, sequence)
+        stops = []
+        for position, stop in enumerate(evaluation["stops"], start=1):
+            point = dict(orders[stop["node"]])
+            point["sequence"] = position
+            point["distance_km"] = round(stop["distance_km"], 3)
+            point["travel_time_minutes"] = round(stop["travel_minutes"], 1)
+            point["wait_minutes"] = round(stop["wait_minutes"], 1)
+            point["elapsed_minutes"] = round(stop["arrival"], 1)
+            point["estimated_arrival"] = (departure + timedelta(minutes=stop["arrival"])).strftime("%H:%M")
+            point["late_minutes"] = round(stop["late_minutes"], 1)
+            stops.append(point)
+        total_km += evaluation["total_km"]
+        result_routes.append({
+            "courier_id": couriers[courier].get("courier_id", courier),
+            "load": float(ctx.size[sequence].sum()),
+            "capacity": couriers[courier].get("capacity"),
+            "departure": (departure + timedelta(minutes=evaluation["depart"])).strftime("%H:%M"),
+            "total_distance_km": round(evaluation["total_km"], 3),
+            "route": stops,
+        })
+
+    return {
+        "routes": result_routes,
+        "unassigned": unassigned,
+        "total_distance_km": round(total_km, 3),
+        "solve_time_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -1,22 +1,64 @@
 import uvicorn
 import os
+import argparse
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inicia a DeliverIA API")
+    parser.add_argument("--prod", action="store_true",
+                        default=os.getenv("APP_ENV", "development").lower() == "production",
+                        help="Modo produção: vários workers, sem reload (padrão com APP_ENV=production)")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1,
+                        help="Workers no modo produção (padrão: WEB_CONCURRENCY ou número de núcleos)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+
     # Verificar se a API do Groq está configurada
     if not os.getenv("GROQ_API_KEY"):
         print("\033[93mAtenção: Chave de API do Groq não configurada! Usando chave padrão.\033[0m")
     else:
         print("\033[92mAPI do Groq configurada com sucesso!\033[0m")
-    
-    # Iniciar o servidor
-    print("Iniciando servidor da DeliverIA API...")
-    uvicorn.run(
-        "main:app", 
-        host="0.0.0.0", 
-        port=8000,
-        reload=True
-    ) 
\ No newline at end of file
+
+    # Criar/atualizar o esquema uma vez, antes do servidor (e não a cada reload ou worker)
+    from migrate import run_migrations
+    result = run_migrations()
+    print(f"Migração concluída: {result['meals']} refeições e {result['users']} usuários atualizados")
+
+    if args.prod:
+        # Camada do cache compartilhada entre os workers: uma resposta do Groq
+        # obtida por um worker atende os demais (vazio desativa)
+        if "AI_CACHE_SQLITE_PATH" not in os.environ:
+            os.environ["AI_CACHE_SQLITE_PATH"] = "./llm_cache.db"
+        # Cada worker usa uma fração das cotas de requisições/tokens do Groq
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+        # SIGTERM/SIGINT encerram após concluir as requisições em andamento;
+        # SIGHUP reinicia os workers um a um sem derrubar o socket
+        print(f"Iniciando servidor da DeliverIA API em modo produção ({args.workers} workers)...")
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            reload=False,
+            timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+            timeout_keep_alive=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")),
+            log_level=os.getenv("LOG_LEVEL", "info")
+        )
+    else:
+        # Iniciar o servidor
+        print("Iniciando servidor da DeliverIA API...")
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True
+        )
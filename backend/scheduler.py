@@ -0,0 +1,302 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from metrics import llm_queue_wait, llm_queue_depth, llm_queue_timeouts, llm_rate_limited
+
+# Classes de prioridade (menor = atendida primeiro)
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Prioridade imposta às chamadas da task atual (ex: pré-cálculo em segundo plano)
+priority_override: ContextVar[Optional[int]] = ContextVar("priority_override", default=None)
+
+# Tempo de fila das chamadas feitas dentro de um QueueTimer (mesma task)
+queue_waits: ContextVar[Optional[List[float]]] = ContextVar("queue_waits", default=None)
+
+
+class QueueDeadlineExceeded(Exception):
+    """A chamada esperou na fila do agendador além do prazo da sua prioridade"""
+
+
+class QueueTimer:
+    """
+    Soma o tempo que as chamadas ao Groq feitas dentro do bloco passaram na fila
+
+    Usado para que a espera no agendador não conte como lentidão do Groq no
+    circuit breaker.
+    """
+
+    def __enter__(self) -> "QueueTimer":
+        self.waits: List[float] = []
+        self._previous = queue_waits.get()
+        queue_waits.set(self.waits)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # set em vez de reset: funciona mesmo se o bloco terminar em outro contexto
+        # (ex: async generator finalizado fora da task que o consumia)
+        queue_waits.set(self._previous)
+        return False
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.waits)
+
+
+class TokenBucket:
+    """Balde de fichas com capacidade de um minuto e reposição contínua (0 = sem limite)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, now: float, factor: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * factor)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, factor: float = 1.0) -> float:
+        """Segundos até haver amount fichas (pedidos maiores que a capacidade esperam o balde cheio)"""
+        if not self.enabled:
+            return 0.0
+        self._refill(now, factor)
+        missing = min(amount, self.capacity) - self.level
+        return missing / (self.rate * factor) if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        """Devolve fichas não usadas (amount negativo cobra o consumo acima do reservado)"""
+        if self.enabled:
+            self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        if self.enabled:
+            self.level = min(self.level, 0.0)
+
+
+class OutboundScheduler:
+    """
+    Agendador das chamadas ao Groq com limites de requisições e tokens por minuto
+
+    Cada chamada reserva uma requisição e uma estimativa de tokens (prompt +
+    max_tokens) antes de ser enviada; a diferença para o uso real é devolvida
+    ao balde quando a resposta chega. Quando os baldes estão vazios, as
+    chamadas esperam em uma fila por prioridade (interativas antes das de
+    segundo plano, FIFO dentro de cada classe). Quem passar do prazo de fila da
+    sua classe recebe QueueDeadlineExceeded e o AIService usa o fallback.
+
+    Um 429 do Groq pausa a fila pelo Retry-After e reduz a taxa de reposição
+    pela metade; cada resposta bem-sucedida recupera parte da taxa.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = 30,
+                 tokens_per_minute: float = 30000,
+                 queue_timeouts: Optional[Dict[int, float]] = None,
+                 min_rate_factor: float = 0.1,
+                 recovery_step: float = 0.05,
+                 default_retry_after: float = 1.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.queue_timeouts = queue_timeouts or {INTERACTIVE: 2.0, BACKGROUND: 10.0}
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+        self.default_retry_after = default_retry_after
+
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.granted = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_env(cls) -> "OutboundScheduler":
+        """
+        Cria o agendador a partir das variáveis GROQ_*_PER_MINUTE e GROQ_QUEUE_TIMEOUT_*
+
+        As cotas são da conta; com vários workers (WEB_CONCURRENCY) cada
+        processo fica com uma fração igual.
+        """
+        workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1") or 1))
+        return cls(
+            requests_per_minute=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")) / workers,
+            tokens_per_minute=float(os.getenv("GROQ_TOKENS_PER_MINUTE", "30000")) / workers,
+            queue_timeouts={
+                INTERACTIVE: float(os.getenv("GROQ_QUEUE_TIMEOUT_INTERACTIVE", "2")),
+                BACKGROUND: float(os.getenv("GROQ_QUEUE_TIMEOUT_BACKGROUND", "10")),
+            },
+        )
+
+    def _delay(self, tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now, self.rate_factor),
+            self.tokens.wait_time(tokens, now, self.rate_factor),
+        )
+
+    def _take(self, tokens: int):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.granted += 1
+
+    def _ensure_dispatcher(self, loop: asyncio.AbstractEventLoop):
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        """Libera o primeiro da fila assim que os baldes permitem"""
+        while True:
+            while self._waiters and self._waiters[0][3].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            priority, _, tokens, future = self._waiters[0]
+            delay = self._delay(tokens, time.monotonic())
+            if delay <= 0:
+                heapq.heappop(self._waiters)
+                self._take(tokens)
+                future.set_result(None)
+                continue
+
+            # Acorda antes se chegar alguém com prioridade maior ou a fila for liberada
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """
+        Reserva uma requisição e tokens, aguardando na fila se necessário
+
+        Args:
+            tokens: Estimativa de tokens da chamada (prompt + max_tokens)
+            priority: INTERACTIVE ou BACKGROUND
+
+        Returns:
+            Segundos de espera na fila
+
+        Raises:
+            QueueDeadlineExceeded: Se o prazo de fila da prioridade estourar
+        """
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        started = time.monotonic()
+
+        if self._waiters or self._delay(tokens, started) > 0:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            heapq.heappush(self._waiters, [priority, next(self._sequence), tokens, future])
+            self.queued += 1
+            llm_queue_depth.inc(priority=name)
+            self._ensure_dispatcher(loop)
+            self._notify()
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeouts.get(priority))
+            except asyncio.TimeoutError:
+                # Liberado no mesmo instante do prazo: segue com a reserva
+                if not future.done() or future.cancelled():
+                    future.cancel()
+                    self.timeouts += 1
+                    llm_queue_timeouts.inc(priority=name)
+                    raise QueueDeadlineExceeded(
+                        f"Chamada {name} aguardou mais de {self.queue_timeouts.get(priority)}s na fila do Groq"
+                    )
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # A reserva já tinha sido feita, mas não será usada
+                    self.requests.give_back(1)
+                    self.tokens.give_back(tokens)
+                else:
+                    future.cancel()
+                raise
+            finally:
+                llm_queue_depth.dec(priority=name)
+        else:
+            self._take(tokens)
+
+        waited = time.monotonic() - started
+        llm_queue_wait.observe(waited, priority=name)
+        waits = queue_waits.get()
+        if waits is not None:
+            waits.append(waited)
+        return waited
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Ajusta o balde de tokens pelo uso real informado pelo Groq"""
+        if used is not None:
+            self.tokens.give_back(reserved - used)
+            self._notify()
+
+    def record_success(self):
+        self.rate_factor = min(1.0, self.rate_factor + self.recovery_step)
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """Resposta 429: pausa a fila e reduz a taxa de reposição dos baldes"""
+        self.rate_limited += 1
+        llm_rate_limited.inc()
+        now = time.monotonic()
+        self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+        self.paused_until = max(self.paused_until, now + (retry_after or self.default_retry_after))
+        self.requests.drain()
+        self.tokens.drain()
+        self._notify()
+
+    def stats(self) -> Dict[str, Any]:
+        queued_now: Dict[str, int] = {}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued_now[name] = queued_now.get(name, 0) + 1
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "rate_factor": round(self.rate_factor, 3),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "queue_timeouts": {PRIORITY_NAMES[p]: t for p, t in self.queue_timeouts.items()},
+            "waiting": queued_now,
+            "granted": self.granted,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def priorities_from_env() -> Dict[str, int]:
+    """
+    Prioridade de cada endpoint do AIService
+
+    LLM_BACKGROUND_ENDPOINTS lista os endpoints de segundo plano (padrão:
+    menu, route_notes e groq_test, que pedem muitos tokens ou não bloqueiam o
+    usuário); os demais são interativos.
+    """
+    background = os.getenv("LLM_BACKGROUND_ENDPOINTS", "menu,route_notes,groq_test")
+    names = {name.strip() for name in background.split(",") if name.strip()}
+    endpoints = ("nutrition", "recommendations", "explanations", "menu", "route_notes", "groq_test")
+    return {endpoint: BACKGROUND if endpoint in names else INTERACTIVE for endpoint in endpoints}
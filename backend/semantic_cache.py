@@ -0,0 +1,246 @@
+import os
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from name_index import fold_name
+
+# Palavras que não ajudam a distinguir preferências ("quero algo vegano" ~ "vegano")
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas e ou de da do das dos em na no nas nos com "
+    "para pra por que quero queria gostaria algo alguma algum coisa coisas comida "
+    "comidas prato pratos refeicao refeicoes opcao opcoes tipo me eu meu minha "
+    "seja ser estar rico rica ricos ricas".split()
+)
+NEGATIONS = frozenset({"sem", "nao", "zero"})
+# Palavras de intensidade: a palavra seguinte recebe o prefixo da direção
+# ("mais carboidratos" -> "+carboidrat", "pouca proteína" -> "~protein")
+MORE = frozenset(
+    "mais muito muita muitos muitas bastante bem extra alto alta altos altas".split()
+)
+LESS = frozenset("menos pouco pouca poucos poucas baixo baixa baixos baixas".split())
+MARKERS = "-+~"
+
+
+def preference_tokens(text: str) -> List[str]:
+    """
+    Palavras sem acento, sem stopwords, sem plural e sem a vogal final
+
+    O corte simples de plural e gênero aproxima formas da mesma palavra
+    ("vegana"/"veganos" -> "vegan", "proteínas" -> "protein"). A palavra
+    seguinte a "sem"/"não" recebe o prefixo "-", para que "sem glúten" e
+    "com glúten" não fiquem parecidos; depois de uma palavra de intensidade,
+    recebe "+" (mais, muito) ou "~" (menos, pouco), para que "mais
+    carboidratos" e "menos carboidratos" também não fiquem.
+    """
+    tokens = []
+    marker = ""
+    for word in fold_name(text).split():
+        if word in NEGATIONS:
+            marker = "-"
+            continue
+        if word in MORE or word in LESS:
+            # A negação prevalece ("sem muito sal" exclui o sal)
+            if marker != "-":
+                marker = "+" if word in MORE else "~"
+            continue
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        if len(word) > 4 and word[-1] in "aeo":
+            word = word[:-1]
+        tokens.append(marker + word)
+        marker = ""
+    return tokens
+
+
+def qualified_tokens(text: str) -> FrozenSet[str]:
+    """Palavras negadas ou com intensidade ("sem amendoim", "pouco sal" -> {"-amendoim", "~sal"})"""
+    return frozenset(token for token in preference_tokens(text) if token[0] in MARKERS)
+
+
+def _feature_index(feature: str, dimensions: int) -> Tuple[int, float]:
+    # crc32 é estável entre processos (hash() do Python não é)
+    digest = zlib.crc32(feature.encode("utf-8"))
+    sign = 1.0 if digest & 1 else -1.0
+    return (digest >> 1) % dimensions, sign
+
+
+def preference_vector(text: str, dimensions: int = 2048) -> Optional[np.ndarray]:
+    """
+    Vetor normalizado de n-gramas com hashing
+
+    Cada palavra contribui com ela mesma e com seus trigramas de caracteres, o
+    que aproxima variações como "proteico" e "proteína". Retorna None quando o
+    texto não tem nenhuma palavra útil.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in preference_tokens(text):
+        # Palavras negadas ou com intensidade usam um espaço de features
+        # próprio (nem os trigramas coincidem)
+        marker, word = (token[0], token[1:]) if token[0] in MARKERS else ("", token)
+        padded = f" {word} "
+        features = [f"w:{token}"] + [marker + padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            position, sign = _feature_index(feature, dimensions)
+            vector[position] += sign
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        return None
+    return vector / norm
+
+
+class SemanticMenuCache:
+    """
+    Cache por similaridade de preferências em texto livre
+
+    Os vetores das preferências já atendidas ficam em uma matriz NumPy; a busca
+    é um produto matriz-vetor (similaridade do cosseno) seguido do top-k. Um
+    cardápio guardado serve a um pedido com similaridade acima do limiar e
+    item_count menor ou igual (a lista é cortada). As entradas expiram pelo
+    TTL e as menos usadas saem quando a matriz enche (LRU).
+
+    Exclusões ("sem amendoim", "sem glúten") e intensidades ("mais
+    carboidratos", "pouca proteína") são um filtro, não parte da similaridade:
+    uma entrada só é reaproveitada quando qualifica exatamente as mesmas
+    palavras que o pedido, para não servir um ingrediente proibido nem o
+    oposto do que foi pedido.
+
+    >>> cache = SemanticMenuCache(max_entries=8)
+    >>> pairs = [("mais carboidratos", "menos carboidratos"),
+    ...          ("vegano com muita proteína", "vegano com pouca proteína"),
+    ...          ("comida apimentada", "comida pouco apimentada"),
+    ...          ("vegano", "vegano sem glúten")]
+    >>> for stored, requested in pairs:
+    ...     cache.store(stored, [{"name": stored}])
+    ...     print(cache.lookup(requested, 1))
+    None
+    None
+    None
+    None
+    >>> cache.lookup("quero algo com muitas proteínas e vegano", 1)
+    [{'name': 'vegano com muita proteína'}]
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 threshold: float = 0.75,
+                 ttl: float = 3600,
+                 top_k: int = 3,
+                 dimensions: int = 2048):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.top_k = top_k
+        self.dimensions = dimensions
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        # Linha da matriz -> (preferências, palavras qualificadas, itens, expiração), em ordem de uso
+        self._entries: "OrderedDict[int, Tuple[str, FrozenSet[str], List[Dict[str, Any]], float]]" = OrderedDict()
+        self._rows: Dict[str, int] = {}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SemanticMenuCache":
+        """Cria o cache a partir das variáveis MENU_SEMANTIC_CACHE_*"""
+        return cls(
+            max_entries=int(os.getenv("MENU_SEMANTIC_CACHE_MAX_ENTRIES", "1024")),
+            threshold=float(os.getenv("MENU_SEMANTIC_CACHE_THRESHOLD", "0.75")),
+            ttl=float(os.getenv("AI_CACHE_TTL_MENU", os.getenv("AI_CACHE_TTL_SECONDS", "3600"))),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.threshold <= 1
+
+    def _release(self, row: int):
+        preferences, _, _, _ = self._entries.pop(row)
+        self._rows.pop(fold_name(preferences), None)
+        self._vectors[row] = 0
+        self._free.append(row)
+
+    def lookup(self, preferences: str, item_count: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Procura um cardápio gerado para preferências parecidas
+
+        Args:
+            preferences: Texto livre do pedido
+            item_count: Número de itens pedido
+
+        Returns:
+            Cópia dos primeiros item_count itens, ou None
+        """
+        if not self.enabled or not self._entries:
+            return None
+        query = preference_vector(preferences, self.dimensions)
+        if query is None:
+            return None
+        qualified = qualified_tokens(preferences)
+
+        with self._lock:
+            scores = self._vectors @ query
+            count = min(self.top_k, len(scores))
+            candidates = np.argpartition(scores, -count)[-count:]
+            now = time.time()
+            for row in candidates[np.argsort(scores[candidates])[::-1]]:
+                row = int(row)
+                if scores[row] < self.threshold:
+                    break
+                entry = self._entries.get(row)
+                if entry is None:
+                    continue
+                _, entry_qualified, items, expires_at = entry
+                if expires_at <= now:
+                    self._release(row)
+                    continue
+                if entry_qualified != qualified or len(items) < item_count:
+                    continue
+                self._entries.move_to_end(row)
+                self.hits += 1
+                return [dict(item) for item in items[:item_count]]
+            self.misses += 1
+        return None
+
+    def store(self, preferences: str, items: List[Dict[str, Any]]):
+        """Guarda o cardápio gerado para as preferências (substitui o anterior do mesmo texto)"""
+        if not self.enabled or not items:
+            return
+        vector = preference_vector(preferences, self.dimensions)
+        if vector is None:
+            return
+
+        with self._lock:
+            key = fold_name(preferences)
+            row = self._rows.get(key)
+            if row is None:
+                if not self._free:
+                    # Remove a entrada usada há mais tempo
+                    self._release(next(iter(self._entries)))
+                row = self._free.pop()
+                self._rows[key] = row
+            self._vectors[row] = vector
+            self._entries[row] = (
+                preferences, qualified_tokens(preferences), [dict(item) for item in items], time.time() + self.ttl
+            )
+            self._entries.move_to_end(row)
+
+    def clear(self):
+        with self._lock:
+            for row in list(self._entries):
+                self._release(row)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }